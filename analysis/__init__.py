@@ -0,0 +1,2 @@
+# file: analysis/__init__.py
+# Biarkan file ini kosong
\ No newline at end of file
@@ -0,0 +1,162 @@
+# file: analysis/align.py
+"""
+Penyejajaran beberapa seri waktu (mis. sistem-sistem lisimeter) ke satu grid waktu bersama,
+supaya selisih, rasio, dan korelasi antar seri bisa dihitung titik demi titik:
+
+    aligned = align({'Lisimeter_1': (t1, x1), 'Lisimeter_2': (t2, x2)}, step=60)
+    aligned.time                      # tengah tiap bin (detik, float)
+    aligned.values['Lisimeter_1']     # NaN = bin tanpa data (celah)
+    aligned.difference('Lisimeter_1', 'Lisimeter_2')
+
+Metode:
+    'mean'     rata-rata semua sampel di tiap bin [t0 + k*step, t0 + (k+1)*step), lewat
+               np.bincount (O(n), tanpa groupby/resample pandas)
+    'nearest'  sampel terdekat ke tengah bin bila jaraknya <= tolerance, lewat np.searchsorted
+
+Grid selalu kelipatan step (epoch), jadi bucket rollup 1m/1h/1d jatuh tepat satu per bin.
+"""
+
+import numpy as np
+from storage.rollup import TIER_WIDTH
+
+METHODS = ('mean', 'nearest')
+STEP_SAMPLES = 100_000  # pasangan sampel berurutan yang dipakai menaksir langkah sampling
+
+
+class AlignedSeries:
+    def __init__(self, time, values, step, counts=None):
+        self.time = time          # tengah bin (detik)
+        self.values = values      # {nama: array}, NaN di bin tanpa data
+        self.step = step
+        self.counts = counts or {}  # {nama: jumlah sampel per bin}, hanya untuk 'mean'
+
+    def __len__(self):
+        return len(self.time)
+
+    def mask(self, name):
+        """True di bin yang punya data untuk seri itu."""
+        return ~np.isnan(self.values[name])
+
+    def valid(self, *names):
+        """True di bin yang punya data untuk semua seri yang disebut (default: semua)."""
+        names = names or tuple(self.values)
+        valid = np.ones(len(self.time), dtype=bool)
+        for name in names:
+            valid &= self.mask(name)
+        return valid
+
+    def coverage(self, *names):
+        """Fraksi bin yang berisi data untuk semua seri yang disebut."""
+        return float(self.valid(*names).mean()) if len(self.time) else 0.0
+
+    def difference(self, a, b):
+        return self.values[a] - self.values[b]
+
+    def ratio(self, a, b):
+        """a / b; NaN bila b nol (atau salah satu kosong)."""
+        numerator, denominator = self.values[a], self.values[b]
+        result = np.full(len(self.time), np.nan)
+        np.divide(numerator, denominator, out=result, where=denominator != 0)
+        return result
+
+    def correlation(self, a, b):
+        """Koefisien korelasi Pearson di bin yang terisi keduanya (NaN bila < 3 bin)."""
+        valid = self.valid(a, b)
+        if valid.sum() < 3:
+            return float('nan')
+        x, y = self.values[a][valid], self.values[b][valid]
+        x = x - x.mean()
+        y = y - y.mean()
+        scale = np.sqrt((x * x).sum() * (y * y).sum())
+        return float((x * y).sum() / scale) if scale > 0 else float('nan')
+
+
+def sampling_step(t, samples=STEP_SAMPLES):
+    """Langkah median antar sampel berurutan (t urut naik). Untuk seri panjang cukup
+    diambil 'samples' pasangan berjarak rata, bukan median np.diff seluruh seri."""
+    t = np.asarray(t, dtype=np.float64)
+    if len(t) < 2:
+        return 0.0
+    index = np.arange(0, len(t) - 1, max(1, (len(t) - 1) // samples))
+    return float(np.median(t[index + 1] - t[index]))
+
+
+def bin_mean(t, x, start, step, bins):
+    """(rata-rata, jumlah) per bin untuk sampel (t, x); NaN di bin kosong. t tidak perlu urut."""
+    t = np.asarray(t, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    keep = ~np.isnan(x)
+    end = start + bins * step
+    if len(t) and (t.min() < start or t.max() >= end):
+        keep &= (t >= start) & (t < end)
+    if not keep.all():
+        t, x = t[keep], x[keep]
+    # t >= start, jadi pemotongan ke int sama dengan floor
+    index = ((t - start) * (1.0 / step)).astype(np.int64)
+    np.minimum(index, bins - 1, out=index)  # pembulatan float tepat di tepi akhir
+    counts = np.bincount(index, minlength=bins)
+    sums = np.bincount(index, x, minlength=bins)
+    means = np.full(bins, np.nan)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    return means, counts
+
+
+def nearest(t, x, points, tolerance):
+    """Nilai sampel terdekat ke tiap titik (t urut naik); NaN bila tidak ada sampel
+    dalam jarak tolerance."""
+    t = np.asarray(t, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    keep = ~np.isnan(x)
+    if not keep.all():
+        t, x = t[keep], x[keep]
+    result = np.full(len(points), np.nan)
+    if not len(t):
+        return result
+    right = np.clip(np.searchsorted(t, points), 0, len(t) - 1)
+    left = np.clip(right - 1, 0, len(t) - 1)
+    closest = np.where(np.abs(t[left] - points) <= np.abs(t[right] - points), left, right)
+    found = np.abs(t[closest] - points) <= tolerance
+    result[found] = x[closest[found]]
+    return result
+
+
+def align(series, step=None, method='mean', tolerance=None, start=None, end=None):
+    """Menyejajarkan {nama: (t, x)} (t dalam detik) ke grid bersama.
+
+    step default = langkah sampling median terbesar di antara seri (seri paling jarang
+    tetap mengisi hampir tiap bin). start/end default = rentang gabungan semua seri.
+    tolerance (khusus 'nearest') default = step / 2."""
+    if method not in METHODS:
+        raise ValueError(f"Metode penyejajaran tidak dikenal: {method}")
+    series = {name: (np.asarray(t, dtype=np.float64), x) for name, (t, x) in series.items()}
+    times = [t for t, _ in series.values() if len(t)]
+    if not times:
+        return AlignedSeries(np.empty(0), {name: np.empty(0) for name in series}, step or 0.0)
+    if step is None:
+        step = max(sampling_step(t) for t in times)
+    step = float(step) if step and step > 0 else 1.0
+    start = min(t[0] for t in times) if start is None else float(start)
+    end = max(t[-1] for t in times) if end is None else float(end)
+    first = np.floor(start / step) * step
+    bins = int((end - first) // step) + 1
+    centres = first + step * (np.arange(bins) + 0.5)
+
+    values, counts = {}, {}
+    for name, (t, x) in series.items():
+        if method == 'mean':
+            values[name], counts[name] = bin_mean(t, x, first, step, bins)
+        else:
+            values[name] = nearest(t, x, centres, step / 2 if tolerance is None else tolerance)
+    return AlignedSeries(centres, values, step, counts)
+
+
+def align_query(result, parameter, systems=None, step=None, method='mean', tolerance=None):
+    """align() untuk hasil storage.query.query(): satu parameter dari beberapa sistem.
+    Untuk hasil tier rollup, step default = lebar bucket tier itu."""
+    systems = list(result.series) if systems is None else [s for s in systems if s in result.series]
+    if step is None and result.tier in TIER_WIDTH:
+        step = TIER_WIDTH[result.tier] / 1000.0
+    series = {system_id: (result.series[system_id]['timestamp'].astype(np.int64) / 1000.0,
+                          result.series[system_id][parameter])
+              for system_id in systems}
+    return align(series, step, method, tolerance)
@@ -0,0 +1,314 @@
+# file: analysis/anomaly.py
+"""
+Deteksi anomali streaming per parameter, dijalankan pada blok yang masuk:
+
+    monitor = AnomalyMonitor.from_settings(settings.get('anomaly', {}))
+    events = monitor.process(system_id, block)   # list dict, biasanya kosong
+    monitor.active(system_id)                    # parameter yang sedang beralarm
+
+Tiga detektor, sejalan dengan profil gangguan hardware_simulator.py:
+
+    spike     z-skor robust: (x - median) / MAD dari spike_window sampel sebelumnya,
+              terhadap level dan terhadap tren lokal (keduanya harus melewati ambang), dan
+              sampel berikutnya harus kembali normal; bila tidak, itu lompatan level sekali
+              jadi yang dikoreksi dari seri (bukan spike, dan tidak sampai ke CUSUM drift)
+    drift     CUSUM dua sisi atas residu terhadap baseline EWMA lambat (baseline dibekukan
+              selama CUSUM sudah setengah jalan ke ambang, supaya tidak ikut bergeser)
+    periodic  spectral residual: log spektrum amplitudo (beda pertama, jendela Hann)
+              dikurangi median lokalnya; puncak sempit yang menonjol = gangguan periodik
+
+Semua detektor bekerja pada matriks (sampel x kanal) sekaligus: tidak ada loop Python per
+sampel maupun per kanal, jadi ratusan kanal dalam satu AnomalyDetector tetap murah.
+Kinerja diukur oleh anomaly_benchmark.py.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sample_block import NUMERIC_FIELDS
+from analysis.filters import exponential_recursion
+
+MAD_SCALE = 0.6745      # MAD / 0.6745 = simpangan baku untuk data normal
+RELATIVE_FLOOR = 1e-3   # skala minimum relatif terhadap nilai (kanal yang hampir konstan)
+Z_CLIP = 4.0            # batas |z| per sampel yang masuk CUSUM
+STEP_PASSES = 4         # batas hitung ulang blok setelah lompatan level dikoreksi
+
+
+class AnomalyDetector:
+    """Detektor untuk sekumpulan kanal yang disampling bersama (mis. semua parameter satu
+    sistem). update() menerima matriks (sampel x kanal) dan mengembalikan kejadian
+    (jenis, baris, kanal, skor). Kejadian drift/periodic hanya dipancarkan saat alarm
+    kanal itu mulai aktif; spike dipancarkan per sampel, satu sampel kemudian (baris -1 =
+    sampel terakhir blok sebelumnya)."""
+    def __init__(self, channels, spike_window=31, spike_z=6.0, winsor=3.0,
+                 baseline_span=500, variance_span=2000, warmup=300, cusum_k=2.0, cusum_h=8.0,
+                 spectral_window=64, spectral_neighbours=15, spectral_min_bin=3, periodic_score=3.0,
+                 periodic_release=0.75):
+        self.channels = int(channels)
+        self.spike_window = int(spike_window) | 1  # ganjil: median tepat satu elemen
+        self.spike_z = spike_z
+        self.winsor = winsor
+        self.alpha = 2.0 / (int(baseline_span) + 1)
+        self.variance_alpha = 2.0 / (int(variance_span) + 1)
+        self.warmup = int(warmup)
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.spectral_window = int(spectral_window)
+        self.spectral_neighbours = int(spectral_neighbours) | 1
+        self.spectral_min_bin = int(spectral_min_bin)
+        self.periodic_score = periodic_score
+        self.periodic_release = periodic_release  # alarm aktif padam di bawah score * release
+        self._taper = np.hanning(self.spectral_window)[:, None]
+        self.reset()
+
+    def reset(self):
+        shape = (self.channels,)
+        self.seen = 0
+        self._history = np.empty((0, self.channels))      # terkoreksi lompatan level (spike)
+        self._raw_history = np.empty((0, self.channels))  # mentah (periodic)
+        self._mean = np.zeros(shape)
+        self._var = np.zeros(shape)
+        self._warm = (0, np.zeros(shape), np.zeros(shape))  # (n, mean, M2) selama pemanasan
+        self._offset = np.zeros(shape)  # jumlah lompatan level yang sudah dikoreksi
+        self._pending = np.zeros((3,) + shape)  # (kekuatan, z, residu) sampel terakhir, belum diputuskan
+        self._cusum_high = np.zeros(shape)
+        self._cusum_low = np.zeros(shape)
+        self.drift_active = np.zeros(shape, dtype=bool)
+        self.periodic_active = np.zeros(shape, dtype=bool)
+        self.spectral_score = np.zeros(shape)
+
+    def update(self, values):
+        x = np.array(values, dtype=np.float64, ndmin=2)
+        rows = len(x)
+        if not rows:
+            return []
+        if self.seen == 0:
+            self._mean = np.nan_to_num(x[0])  # pengisi sampel kosong di blok pertama
+        missing = np.isnan(x)
+        if missing.any():
+            # sampel kosong diisi baseline: tidak memicu apa pun dan tidak menggeser statistik
+            x = np.where(missing, self._mean + self._offset, x)
+        raw = np.concatenate((self._raw_history, x))
+        extended = np.concatenate((self._history, x - self._offset))
+
+        events = []
+        robust = self._spike(extended, x, events)
+        self._drift(robust, events)
+        # periodic memakai seri mentah: osilasi besar yang baru mulai bisa lolos uji lompatan
+        # level, dan beda pertama sudah cukup meredam lompatan yang sebenarnya
+        self._periodic(raw, rows, events)
+
+        self._history = np.ascontiguousarray(extended[-self.spike_window:])
+        self._raw_history = np.ascontiguousarray(raw[-self.spectral_window:])
+        self.seen += rows
+        return events
+
+    def _spike(self, extended, x, events):
+        """z-skor robust tiap sampel terhadap spike_window sampel sebelumnya, dihitung dua kali:
+        terhadap median jendela, dan terhadap jendela yang dibuang trennya (kemiringan = beda
+        median paruh akhir dan paruh awal). Pencilan = kedua z melewati ambang, jadi lereng
+        sinyal yang curam tidak dianggap pencilan.
+
+        Pencilan baru diputuskan setelah sampel berikutnya datang (sampel terakhir blok ditunda
+        ke blok berikutnya, kejadiannya berbaris -1): bila sampel berikutnya kembali normal
+        (|z| <= winsor) itu spike; bila masih menyimpang ke arah yang sama itu lompatan level
+        sekali jadi (mis. reset counter, penggantian sensor). Lompatan level tidak dilaporkan,
+        tetapi besarnya (rata-rata dua sampel pertamanya terhadap median jendela) dikurangkan
+        dari sampel itu dan seterusnya (self._offset) lalu blok dihitung ulang, sehingga
+        jendela spike dan CUSUM drift melihat seri yang menyambung: drift hanya bereaksi pada
+        pergeseran yang terus bertambah. 'extended' diperbaiki di tempat. Mengembalikan blok
+        terkoreksi yang sudah di-winsorize (dipakai baseline drift, supaya spike tidak ikut
+        masuk)."""
+        window = self.spike_window
+        offset = len(extended) - len(x)  # baris pertama blok di 'extended'
+        first = max(0, window - offset)  # baris blok pertama yang sudah punya jendela lengkap
+        if first >= len(x):
+            self._pending = np.zeros((3, self.channels))
+            return extended[offset:].copy()
+        for attempt in range(STEP_PASSES):
+            expected, scale, z, strength, jump = self._robust_z(extended, offset + first)
+            current = extended[offset + first:]
+            # baris sebelumnya yang masih tertunda dinilai bersama baris pertama blok ini
+            strength = np.concatenate((self._pending[0][None], strength))
+            z = np.concatenate((self._pending[1][None], z))
+            residual = np.concatenate((self._pending[2][None], jump))
+            outlier = np.abs(strength[:-1]) > self.spike_z
+            persists = strength[1:] * np.sign(strength[:-1]) > self.winsor
+            steps = outlier & persists
+            if not steps.any() or attempt == STEP_PASSES - 1:
+                break
+            channels = np.nonzero(steps.any(axis=0))[0]
+            rows = steps[:, channels].argmax(axis=0)  # lompatan paling awal per kanal
+            shift = 0.5 * (residual[rows, channels] + residual[rows + 1, channels])
+            start = offset + first - 1 + rows  # baris 'extended' tempat level berubah
+            after = np.arange(len(extended))[:, None] >= start[None]
+            extended[:, channels] -= after * shift
+            self._offset[channels] += shift
+            # sampel tertunda yang ternyata awal lompatan sudah terkoreksi: bukan pencilan lagi
+            self._pending[:, channels[rows == 0]] = 0.0
+
+        rows, channels = np.nonzero(outlier & ~persists)
+        events.extend(('spike', int(row) + first - 1, int(channel), float(z[row, channel]))
+                      for row, channel in zip(rows, channels))
+        self._pending = np.stack((strength[-1], z[-1], residual[-1]))
+        robust = extended[offset:].copy()
+        robust[first:] = np.clip(current, expected - self.winsor * scale, expected + self.winsor * scale)
+        return robust
+
+    def _robust_z(self, extended, start):
+        """(nilai harapan, skala, z terhadap tren, kekuatan pencilan bertanda, selisih terhadap
+        median jendela) untuk baris extended[start:], masing-masing terhadap spike_window sampel
+        sebelumnya. Kekuatan = z terkecil dari z-tren dan z-level bila keduanya searah, selain
+        itu 0. Besar lompatan level diukur dari median jendela, bukan dari tren: tren lokal yang
+        diperpanjang melewati lompatan membuat koreksinya kebesaran."""
+        window = self.spike_window
+        windows = sliding_window_view(extended[:-1], window, axis=0)[start - window:]
+        half = window // 2
+        level = np.partition(windows, half, axis=-1)[..., half]
+        spread = np.partition(np.abs(windows - level[..., None]), half, axis=-1)[..., half]
+        early = np.partition(windows[..., :half], half // 2, axis=-1)[..., half // 2]
+        late = np.partition(windows[..., -half:], half // 2, axis=-1)[..., half // 2]
+        slope = (late - early) / (window - half)
+        positions = np.arange(window) - half
+        detrended = windows - slope[..., None] * positions
+        median = np.partition(detrended, half, axis=-1)[..., half]
+        mad = np.partition(np.abs(detrended - median[..., None]), half, axis=-1)[..., half]
+        expected = median + slope * (window - half)
+        scale = np.maximum(mad / MAD_SCALE, RELATIVE_FLOOR * np.abs(expected) + 1e-12)
+        current = extended[start:]
+        z = (current - expected) / scale
+        level_z = (current - level) / np.maximum(spread / MAD_SCALE, RELATIVE_FLOOR * np.abs(level) + 1e-12)
+        strength = np.where(z * level_z > 0, np.sign(z) * np.minimum(np.abs(z), np.abs(level_z)), 0.0)
+        return expected, scale, z, strength, current - level
+
+    def _drift(self, x, events):
+        """CUSUM dua sisi atas z = (x - baseline) / simpangan baseline. Baseline EWMA dan
+        varians eksponensialnya dihitung untuk seluruh blok sekaligus (exponential_recursion);
+        kanal yang CUSUM-nya > h/2 di awal blok tidak memperbarui baseline. Selama warmup
+        sampel pertama baseline = rata-rata & varians kumulatif (EWMA lambat belum stabil)."""
+        alpha, beta = self.alpha, 1.0 - self.alpha
+        variance_alpha = self.variance_alpha
+        frozen = np.maximum(self._cusum_high, self._cusum_low) > 0.5 * self.cusum_h
+        means = exponential_recursion(alpha * x, beta, self._mean)
+        previous_means = np.concatenate((self._mean[None], means[:-1]))
+        deviations = x - previous_means
+        # varians = rata-rata eksponensial residu^2 dengan memori lebih panjang dari baseline,
+        # supaya siklus alami yang lambat ikut terwakili dan drift tidak cepat 'dimaafkan'
+        variances = exponential_recursion(variance_alpha * deviations ** 2, 1.0 - variance_alpha, self._var)
+        previous_vars = np.concatenate((self._var[None], variances[:-1]))
+        previous_means = np.where(frozen, self._mean, previous_means)
+        previous_vars = np.where(frozen, self._var, previous_vars)
+
+        scale = np.maximum(np.sqrt(previous_vars), RELATIVE_FLOOR * np.abs(previous_means) + 1e-12)
+        z = np.clip((x - previous_means) / scale, -Z_CLIP, Z_CLIP)
+        # belum cukup sampel untuk baseline: CUSUM belum berjalan
+        z[self.seen + np.arange(len(x)) < self.warmup] = 0.0
+        high = _cusum(z - self.cusum_k, self._cusum_high)
+        low = _cusum(-z - self.cusum_k, self._cusum_low)
+        statistic = np.maximum(high, low)
+        active = statistic > self.cusum_h
+        started = active & ~np.concatenate((self.drift_active[None], active[:-1]))
+        rows, channels = np.nonzero(started)
+        events.extend(('drift', int(row), int(channel),
+                       float(np.copysign(statistic[row, channel], high[row, channel] - low[row, channel])))
+                      for row, channel in zip(rows, channels))
+
+        if self.seen < self.warmup:
+            count, mean, m2 = self._warm
+            block_mean = x.mean(axis=0)
+            delta = block_mean - mean
+            total = count + len(x)
+            mean = mean + delta * len(x) / total
+            m2 = m2 + ((x - block_mean) ** 2).sum(axis=0) + delta ** 2 * count * len(x) / total
+            self._warm = (total, mean, m2)
+        if self.seen + len(x) <= self.warmup:
+            self._mean, self._var = self._warm[1], self._warm[2] / self._warm[0]
+        else:
+            self._mean = np.where(frozen, self._mean, means[-1])
+            self._var = np.where(frozen, self._var, variances[-1])
+        self._cusum_high, self._cusum_low = high[-1], low[-1]
+        self.drift_active = active[-1]
+
+    def _periodic(self, extended, rows, events):
+        """Spectral residual pada spectral_window sampel terakhir, sekali per blok: rfft
+        semua kanal sekaligus, residu = log|X| - median log|X| di spectral_neighbours bin
+        sekitarnya (median, bukan rata-rata, supaya lobus puncak itu sendiri tidak menaikkan
+        acuannya). Skor = residu terbesar di atas spectral_min_bin (tren lambat diabaikan)."""
+        window = self.spectral_window
+        if len(extended) <= window:
+            return
+        # beda pertama: lompatan level dan tren lambat tidak membocorkan energi ke semua bin
+        segment = np.diff(extended[-window - 1:], axis=0)
+        segment = (segment - segment.mean(axis=0)) * self._taper
+        log_amplitude = np.log(np.abs(np.fft.rfft(segment, axis=0)) + 1e-12)
+        reference = _moving_median(log_amplitude, self.spectral_neighbours)
+        score = (log_amplitude - reference)[self.spectral_min_bin:].max(axis=0)
+        threshold = np.where(self.periodic_active, self.periodic_score * self.periodic_release,
+                             self.periodic_score)
+        active = score > threshold
+        for channel in np.nonzero(active & ~self.periodic_active)[0]:
+            events.append(('periodic', rows - 1, int(channel), float(score[channel])))
+        self.spectral_score = score
+        self.periodic_active = active
+
+
+def _cusum(increments, initial):
+    """S_k = max(0, S_(k-1) + u_k) untuk semua baris sekaligus: dengan C = cumsum(u),
+    S_k = C_k - min(-S_(-1), min_(j<=k) C_j)."""
+    sums = np.cumsum(increments, axis=0)
+    return sums - np.minimum(np.minimum.accumulate(sums, axis=0), -initial)
+
+
+def _moving_median(values, width):
+    """Median bergerak terpusat (width ganjil) sepanjang sumbu 0, tepi diperpanjang."""
+    half = width // 2
+    padded = np.pad(values, ((half, half), (0, 0)), mode='edge')
+    windows = sliding_window_view(padded, width, axis=0)
+    return np.partition(windows, half, axis=-1)[..., half]
+
+
+class AnomalyMonitor:
+    """Satu AnomalyDetector per sistem, kanal = parameter numerik blok sampel.
+    Dipakai dari thread GUI (jalur process_incoming_batch), seperti LiveStats."""
+    def __init__(self, fields=NUMERIC_FIELDS, **options):
+        self.fields = tuple(fields)
+        self.options = options
+        self._detectors = {}
+        self._spikes = {}  # parameter dengan spike di blok terakhir, per sistem
+        self._last = {}    # (timestamp, nilai) sampel terakhir blok sebelumnya, per sistem
+
+    @classmethod
+    def from_settings(cls, options):
+        """Membuat AnomalyMonitor dari settings['anomaly'] (kunci = argumen AnomalyDetector)."""
+        return cls(**{name: value for name, value in options.items() if name != 'enabled'})
+
+    def process(self, system_id, block):
+        """Menjalankan semua detektor untuk satu blok. Mengembalikan list kejadian
+        {'system_id', 'parameter', 'kind', 'timestamp', 'value', 'score'}."""
+        if not len(block['timestamp']):
+            return []
+        detector = self._detectors.get(system_id)
+        if detector is None:
+            detector = self._detectors[system_id] = AnomalyDetector(len(self.fields), **self.options)
+        values = np.column_stack([block[name] for name in self.fields])
+        timestamps = block['timestamp']
+        # baris -1: spike di sampel terakhir blok sebelumnya (baru bisa diputuskan sekarang)
+        previous = self._last.get(system_id, (timestamps[0], values[0]))
+        events = [{
+            'system_id': system_id,
+            'parameter': self.fields[channel],
+            'kind': kind,
+            'timestamp': timestamps[row] if row >= 0 else previous[0],
+            'value': float(values[row, channel] if row >= 0 else previous[1][channel]),
+            'score': score,
+        } for kind, row, channel, score in detector.update(values)]
+        self._last[system_id] = (timestamps[-1], values[-1])
+        self._spikes[system_id] = {event['parameter'] for event in events if event['kind'] == 'spike'}
+        return events
+
+    def active(self, system_id):
+        """Parameter yang sedang beralarm: drift/periodic aktif, atau spike di blok terakhir."""
+        detector = self._detectors.get(system_id)
+        if detector is None:
+            return set()
+        channels = np.nonzero(detector.drift_active | detector.periodic_active)[0]
+        return {self.fields[channel] for channel in channels} | self._spikes.get(system_id, set())
@@ -0,0 +1,153 @@
+# file: analysis/filters.py
+"""
+Filter sinyal tervektorisasi untuk tab analisis. Semua filter punya bentuk yang sama
+
+    filter(t, x, window) -> (t, x)
+
+sehingga bisa dirangkai (apply_chain). t = waktu (detik, float), x = nilai float64.
+Filter jendela mengembalikan hanya titik yang jendelanya lengkap, dengan t disejajarkan
+ke ujung jendela (moving average, EWMA, median) atau ke tengahnya (Savitzky-Golay).
+
+    moving_average  O(n) lewat cumsum
+    ewma            O(n), rekursi dipecah per potongan lalu dihitung dalam bentuk tertutup
+                    (exponential_recursion)
+    rolling_median  jendela geser (view tanpa salin) + np.partition per potongan baris
+    savitzky_golay  koefisien kuadrat terkecil polinomial orde SAVGOL_ORDER + np.convolve
+    decimate        rata-rata per blok 'window' sampel (anti-alias sederhana) lalu turun sampel
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SAVGOL_ORDER = 2
+MEDIAN_CHUNK_VALUES = 1 << 18  # elemen (baris x window) per potongan median, muat di cache CPU
+
+
+def _prepare(t, x):
+    return np.asarray(t, dtype=np.float64), np.asarray(x, dtype=np.float64)
+
+
+def moving_average(t, x, window):
+    """Rata-rata bergerak trailing. Dihitung terhadap rata-rata global agar cumsum
+    jutaan titik tidak kehilangan presisi."""
+    t, x = _prepare(t, x)
+    window = int(window)
+    if window < 1 or len(x) < window:
+        return t[:0], x[:0]
+    offset = x.mean()
+    sums = np.cumsum(np.concatenate(([0.0], x - offset)))
+    return t[window - 1:], (sums[window:] - sums[:-window]) / window + offset
+
+
+def exponential_recursion(inputs, beta, initial=0.0):
+    """y_k = beta * y_(k-1) + inputs_k dengan y_(-1) = initial, tanpa loop per sampel.
+    Sumbu 0 adalah waktu; inputs 2-D (waktu x kanal) menjalankan semua kanal sekaligus,
+    dengan initial skalar atau satu nilai per kanal.
+
+    Untuk satu potongan y_k = beta^k (beta * y_(-1) + sum_j beta^-j inputs_j), dengan
+    potongan yang cukup pendek supaya beta^-j tidak overflow. Jadi tiap potongan cukup
+    satu cumsum. Dipakai EWMA di sini dan akumulator online (analysis.online)."""
+    inputs = np.asarray(inputs, dtype=np.float64)
+    result = np.empty_like(inputs)
+    if not len(inputs):
+        return result
+    if beta <= 0:
+        result[:] = inputs
+        return result
+    chunk = int(max(1, min(len(inputs), 600.0 / -np.log(beta))))
+    powers = (beta ** np.arange(chunk)).reshape((chunk,) + (1,) * (inputs.ndim - 1))
+    inverse = 1.0 / powers
+    previous = np.asarray(initial, dtype=np.float64)
+    for start in range(0, len(inputs), chunk):
+        part = inputs[start:start + chunk]
+        m = len(part)
+        sums = np.cumsum(part * inverse[:m], axis=0)
+        result[start:start + m] = powers[:m] * (beta * previous + sums)
+        previous = result[start + m - 1]
+    return result
+
+
+def ewma(t, x, window):
+    """EWMA dengan span = window (alpha = 2 / (window + 1)), y0 = x0; sama dengan
+    pandas ewm(span=window, adjust=False).mean()."""
+    t, x = _prepare(t, x)
+    if not len(x):
+        return t, x
+    alpha = 2.0 / (int(window) + 1)
+    if alpha >= 1:
+        return t, x.copy()
+    return t, exponential_recursion(alpha * x, 1.0 - alpha, x[0])
+
+
+def rolling_median(t, x, window):
+    """Median bergerak trailing. Tanpa loop per baris: jendela diambil sebagai view
+    (sliding_window_view) lalu np.partition per potongan (lebih cepat dari np.median
+    yang mengurutkan salinan penuh), jadi memori tetap terbatas."""
+    t, x = _prepare(t, x)
+    window = int(window)
+    if window < 1 or len(x) < window:
+        return t[:0], x[:0]
+    windows = sliding_window_view(x, window)
+    rows = max(1, MEDIAN_CHUNK_VALUES // window)
+    middle = window // 2
+    result = np.empty(len(windows))
+    for start in range(0, len(windows), rows):
+        part = np.partition(windows[start:start + rows], middle, axis=1)
+        if window % 2:
+            result[start:start + rows] = part[:, middle]
+        else:
+            # partisi dengan dua kth jauh lebih lambat; nilai tengah bawah = maksimum sisi kiri
+            result[start:start + rows] = 0.5 * (part[:, middle] + part[:, :middle].max(axis=1))
+    return t[window - 1:], result
+
+
+def savgol_coefficients(window, order=SAVGOL_ORDER):
+    """Koefisien konvolusi Savitzky-Golay (penghalus, turunan ke-0) untuk jendela ganjil."""
+    half = window // 2
+    powers = np.arange(-half, half + 1, dtype=np.float64)[:, None] ** np.arange(order + 1)
+    return np.linalg.pinv(powers)[0]
+
+
+def savitzky_golay(t, x, window, order=SAVGOL_ORDER):
+    """Penghalus Savitzky-Golay: polinomial orde 'order' dicocokkan pada tiap jendela.
+    Jendela genap dinaikkan ke ganjil berikutnya; t disejajarkan ke tengah jendela."""
+    t, x = _prepare(t, x)
+    window = int(window) | 1
+    order = min(order, window - 1)
+    if len(x) < window:
+        return t[:0], x[:0]
+    half = window // 2
+    smoothed = np.convolve(x, savgol_coefficients(window, order)[::-1], mode='valid')
+    return t[half:len(t) - half], smoothed
+
+
+def decimate(t, x, window):
+    """Turun sampel dengan faktor 'window': rata-rata tiap blok (waktu = rata-rata blok).
+    Sisa sampel di ujung yang tidak memenuhi satu blok dibuang."""
+    t, x = _prepare(t, x)
+    factor = max(1, int(window))
+    blocks = len(x) // factor
+    if factor == 1:
+        return t, x
+    t = t[:blocks * factor].reshape(blocks, factor).mean(axis=1)
+    x = x[:blocks * factor].reshape(blocks, factor).mean(axis=1)
+    return t, x
+
+
+FILTERS = {
+    'moving_average': moving_average,
+    'ewma': ewma,
+    'rolling_median': rolling_median,
+    'savitzky_golay': savitzky_golay,
+    'decimate': decimate,
+}
+
+
+def apply_chain(t, x, steps, check=None):
+    """Menerapkan rangkaian filter [(nama, window), ...] berurutan. check (opsional)
+    dipanggil di antara langkah, mis. job.check untuk pembatalan."""
+    for name, window in steps:
+        if check is not None:
+            check()
+        t, x = FILTERS[name](t, x, window)
+    return t, x
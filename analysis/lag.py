@@ -0,0 +1,209 @@
+# file: analysis/lag.py
+"""
+Estimasi lag antar seri yang sudah disejajarkan (analysis.align) lewat korelasi silang FFT,
+mis. berapa lama perubahan moisture di Lisimeter_1 baru terlihat di Lisimeter_2, atau
+seberapa jauh EC tertinggal dari moisture:
+
+    aligned = align({'A': (t1, x1), 'B': (t2, x2)}, step=60)
+    result = estimate_lags(aligned, ['A'], ['B'], max_lag_s=6 * 3600)
+    result['lag_s'][0, 0], result['r'][0, 0], result['confidence'][0, 0]
+
+Lag positif berarti seri kolom (y) mengikuti seri baris (x): y(t + lag) ~ x(t).
+
+Semua kanal dihitung dalam satu lintasan (lagged_products): data dipotong per blok, tiap
+blok di-rfft sekali, lalu spektrum silang semua pasangan kanal dijumlahkan dengan satu
+matmul per frekuensi. Karena jendela lag dibatasi (|lag| <= max_lag), panjang FFT cukup
+blok + 2*max_lag, bukan panjang seri, jadi data berbulan-bulan tetap O(n log blok).
+"""
+
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from analysis.spectral import next_fast_len
+
+LAG_BLOCK = 4096                 # panjang blok minimum (sampel)
+CHUNK_VALUES = 1 << 22           # elemen spektrum (blok x kanal x frekuensi) per potongan
+MAX_LAG_BINS = 2000              # jendela lag dipetakan ke paling banyak sekian langkah grid
+MIN_PAIRS = 10                   # lag dengan pasangan sampel lebih sedikit diabaikan
+
+
+def lagged_products(series, max_lag, check=None):
+    """P[k, i, j] = sum_t z_i(t) z_j(t + k - max_lag) untuk series (C x n, satu baris per
+    kanal, tanpa NaN), k = 0..2*max_lag. Korelasi linear (bukan sirkular): blok x dipadatkan
+    nol ke panjang FFT = blok + 2*max_lag, dan segmen y yang sesuai diambil max_lag sampel
+    di kiri-kanannya."""
+    channels, n = series.shape
+    size = next_fast_len(max(LAG_BLOCK, 4 * max_lag) + 2 * max_lag)
+    block = size - 2 * max_lag
+    blocks = -(-n // block)
+    # kanal di sumbu 0 supaya tiap FFT membaca memori berurutan
+    padded = np.zeros((channels, blocks * block + 2 * max_lag))
+    padded[:, max_lag:max_lag + n] = series
+
+    x_blocks = padded[:, max_lag:max_lag + blocks * block].reshape(channels, blocks, block)
+    y_segments = sliding_window_view(padded, size, axis=1)[:, ::block]
+    frequencies = size // 2 + 1
+    chunk = max(1, CHUNK_VALUES // (channels * frequencies))
+    total = np.zeros((frequencies, channels, channels), dtype=np.complex128)
+    for start in range(0, blocks, chunk):
+        if check is not None:
+            check()
+        x = np.fft.rfft(x_blocks[:, start:start + chunk], size, axis=2)  # (C, b, f)
+        y = np.fft.rfft(y_segments[:, start:start + chunk], axis=2)      # (C, b, f)
+        total += np.conj(x).transpose(2, 0, 1) @ y.transpose(2, 1, 0)    # (f, C, C)
+    return np.fft.irfft(total, size, axis=0)[:2 * max_lag + 1]
+
+
+def _centre(data):
+    """data (n x C, NaN = kosong) -> (C x n rata-rata dibuang dan NaN = 0, mask NaN, jumlah terisi)."""
+    centred = np.array(np.asarray(data, dtype=np.float64).T, order='C')
+    channels, n = centred.shape
+    missing = np.isnan(centred)
+    centred[missing] = 0.0
+    counts = n - missing.sum(axis=1)
+    means = np.divide(centred.sum(axis=1), counts, out=np.zeros(channels), where=counts > 0)
+    centred -= means[:, None]
+    centred[missing] = 0.0
+    return centred, missing, counts
+
+
+def acf_overlap(data, check=None):
+    """B[i, j] = sum rho_i(k) rho_j(k) atas SEMUA lag k = -(n-1)..n-1 (ACF bias, rata-rata
+    dibuang), faktor inflasi varians Bartlett untuk korelasi silang kanal i dan j.
+
+    Lewat Parseval: dengan padding >= 2n - 1, sum_k a_i(k) a_j(k) = sum_f |X_i|^2 |X_j|^2 / N,
+    jadi cukup satu rFFT penuh per kanal lalu satu perkalian matriks spektrum daya."""
+    centred = _centre(data)[0]
+    channels, n = centred.shape
+    size = next_fast_len(2 * n - 1)
+    weights = np.full(size // 2 + 1, 2.0)
+    weights[0] = 1.0
+    if size % 2 == 0:
+        weights[-1] = 1.0  # frekuensi Nyquist hanya sekali di spektrum penuh
+    power = np.empty((channels, size // 2 + 1), dtype=np.float32)  # float32: hemat memori seri panjang
+    energy = np.empty(channels)
+    for channel in range(channels):
+        if check is not None:
+            check()
+        spectrum = np.fft.rfft(centred[channel], size)
+        spectrum = spectrum.real ** 2 + spectrum.imag ** 2
+        energy[channel] = np.dot(centred[channel], centred[channel])
+        power[channel] = spectrum
+    gram = np.zeros((channels, channels))
+    step = max(1, CHUNK_VALUES // channels)
+    for start in range(0, power.shape[1], step):
+        part = power[:, start:start + step].astype(np.float64)
+        gram += (part * weights[start:start + step]) @ part.T
+    gram /= size
+    scale = np.outer(energy, energy)
+    overlap = np.full(gram.shape, np.nan)
+    np.divide(gram, scale, out=overlap, where=scale > 0)
+    return overlap
+
+
+def correlation_matrix(data, max_lag, check=None):
+    """Korelasi silang ternormalisasi semua pasangan kolom data (n x C, NaN = kosong).
+
+    Mengembalikan (lags, r, pairs), r dan pairs berbentuk (C, C, 2*max_lag + 1):
+    r[i, j, k] = korelasi x_i(t) dengan x_j(t + lags[k]) (rata-rata kolom dibuang),
+    pairs = jumlah pasangan sampel yang terisi keduanya di lag itu. Lag dengan pasangan
+    kurang dari MIN_PAIRS bernilai NaN."""
+    centred, missing, counts = _centre(data)
+    channels, n = centred.shape
+    complete = not missing.any()
+    max_lag = max(0, min(int(max_lag), n - 1))
+    lags = np.arange(-max_lag, max_lag + 1)
+    scale = np.sqrt(np.divide(np.einsum('ij,ij->i', centred, centred), counts,
+                              out=np.zeros(channels), where=counts > 0))
+
+    products = lagged_products(centred, max_lag, check)
+    if complete:
+        pairs = np.broadcast_to((n - np.abs(lags))[:, None, None], products.shape).copy()
+    else:
+        pairs = np.rint(lagged_products((~missing).astype(np.float64), max_lag, check))
+
+    r = np.full(products.shape, np.nan)
+    denominator = pairs * scale[:, None] * scale[None, :]
+    np.divide(products, denominator, out=r, where=(pairs >= MIN_PAIRS) & (denominator > 0))
+    np.clip(r, -1.0, 1.0, out=r)  # rata-rata/skala global, seri tak stasioner bisa sedikit lewat 1
+    return lags, r.transpose(1, 2, 0), pairs.transpose(1, 2, 0)
+
+
+def peak_lag(lags, r):
+    """Lag puncak |r| per pasangan (sumbu terakhir = lag), dengan interpolasi parabola
+    di sekitar puncak. Mengembalikan (lag pecahan dalam langkah grid, r di puncak)."""
+    magnitude = np.nan_to_num(np.abs(r), nan=-1.0)
+    index = magnitude.argmax(axis=-1)
+    peak = np.take_along_axis(r, index[..., None], axis=-1)[..., 0]
+    left = np.take_along_axis(magnitude, np.maximum(index - 1, 0)[..., None], axis=-1)[..., 0]
+    right = np.take_along_axis(magnitude, np.minimum(index + 1, len(lags) - 1)[..., None], axis=-1)[..., 0]
+    centre = np.abs(peak)
+    curvature = left - 2 * centre + right
+    inside = (index > 0) & (index < len(lags) - 1) & (left >= 0) & (right >= 0) & (curvature < 0)
+    offset = np.zeros(index.shape)
+    np.divide(0.5 * (left - right), curvature, out=offset, where=inside)
+    return lags[index] + offset, peak
+
+
+def confidence(peak_r, pairs, overlap, lag_count):
+    """Keyakinan bahwa puncak korelasi bukan kebetulan, di [0, 1].
+
+    Simpangan baku r untuk dua seri independen menurut Bartlett:
+        se^2 = sum_k rho_x(k) rho_y(k) / n     (semua lag, lihat acf_overlap)
+    Seri yang sangat berautokorelasi (mis. tren, random walk) punya jumlah ini sebesar
+    orde n, jadi r besar di antara dua tren tidak dianggap bermakna. Peluang dua sisi
+    |r| di bawah puncak dipangkatkan jumlah lag yang diuji (koreksi Sidak), karena
+    puncak dipilih dari seluruh jendela lag."""
+    inflation = np.maximum(np.nan_to_num(overlap, nan=1.0), 1.0)
+    se = np.sqrt(inflation / np.maximum(pairs, 1))
+    z = np.abs(np.nan_to_num(peak_r)) / se
+    single = np.vectorize(math.erf)(z / math.sqrt(2.0))
+    return np.where(pairs >= MIN_PAIRS, single ** lag_count, 0.0)
+
+
+def grid_step(aligned_step, max_lag_s):
+    """Langkah grid untuk estimasi lag: langkah sampling, tetapi cukup kasar supaya jendela
+    lag tidak lebih dari MAX_LAG_BINS langkah."""
+    return max(float(aligned_step), float(max_lag_s) / MAX_LAG_BINS)
+
+
+def estimate_lags(aligned, rows, columns, max_lag_s, differences=False, check=None):
+    """Lag semua pasangan (baris x kolom) seri AlignedSeries dalam satu lintasan.
+
+    differences=True mengkorelasikan selisih orde-1 (menghilangkan tren lambat, sehingga
+    puncak menunjukkan kapan perubahan muncul, bukan kemiripan tren). Mengembalikan dict:
+        lags_s      (K,) sumbu lag dalam detik
+        ccf         (P, Q, K) korelasi silang
+        lag_s, r, confidence, pairs   (P, Q) lag puncak, r puncak, keyakinan, n pasangan
+        edge        (P, Q) True bila puncak jatuh di tepi jendela (+-max_lag): itu bukan
+                    estimasi lag (lag sebenarnya mungkin di luar jendela, atau tidak ada),
+                    jadi keyakinannya dibuat 0
+    """
+    rows, columns = list(rows), list(columns)
+    names = list(dict.fromkeys(rows + columns))
+    data = np.column_stack([aligned.values[name] for name in names]) if len(aligned) else np.empty((0, len(names)))
+    if differences:
+        data = np.diff(data, axis=0)
+    if len(data) < 2:
+        raise ValueError("Data terlalu pendek untuk korelasi silang")
+    max_lag = min(int(math.ceil(max_lag_s / aligned.step)), len(data) - 1)
+    lags, r, pairs = correlation_matrix(data, max_lag, check)
+
+    row_index = [names.index(name) for name in rows]
+    column_index = [names.index(name) for name in columns]
+    ccf = r[np.ix_(row_index, column_index)]
+    peak, peak_r = peak_lag(lags, ccf)
+    zero = pairs[np.ix_(row_index, column_index)][..., max_lag]
+    overlap = acf_overlap(data, check)[np.ix_(row_index, column_index)]
+    edge = (np.abs(peak) >= max_lag) if max_lag > 0 else np.zeros(peak.shape, dtype=bool)
+    conf = np.where(edge, 0.0, confidence(peak_r, zero, overlap, len(lags)))
+    return {
+        'lags_s': lags * aligned.step,
+        'ccf': ccf,
+        'lag_s': peak * aligned.step,
+        'r': peak_r,
+        'confidence': conf,
+        'pairs': zero,
+        'edge': edge,
+        'step': aligned.step,
+    }
@@ -0,0 +1,168 @@
+# file: analysis/online.py
+"""
+Statistik online untuk data live, diperbarui per blok yang masuk (bukan memuat ulang riwayat):
+
+    stats = LiveStats.from_settings(settings.get('live_stats', {}))
+    stats.update(system_id, block)             # di jalur ingest, sekali per blok
+    stats.get(system_id, 'ph').snapshot()      # dibaca tab overview/detail
+
+Per (sistem, parameter) satu RunningStats:
+    mean / std      Welford sejak mulai (blok digabung dengan rumus Chan, bukan per sampel)
+    ewma / ew_std   rata-rata & simpangan eksponensial (span sampel), lewat exponential_recursion
+    minimum/maximum ekstrem jendela waktu geser memakai deque monoton
+    rate            perubahan EWMA per menit (arah tren)
+
+Biaya per blok O(panjang blok) dengan operasi NumPy; memori O(1) kecuali deque min/max,
+yang hanya berisi kandidat ekstrem di jendela (biasanya sedikit).
+"""
+
+from collections import deque
+import numpy as np
+from sample_block import NUMERIC_FIELDS
+from analysis.filters import exponential_recursion
+
+DEFAULT_EWMA_SPAN = 30       # sampel
+DEFAULT_WINDOW_S = 600.0     # jendela min/max (detik)
+
+
+class RunningStats:
+    """Akumulator satu kanal. update() menerima waktu (detik, float) dan nilai; NaN dilewati."""
+    def __init__(self, ewma_span=DEFAULT_EWMA_SPAN, window_s=DEFAULT_WINDOW_S):
+        self.alpha = 2.0 / (max(1, int(ewma_span)) + 1)
+        self.window_s = float(window_s)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.ewma = None
+        self._ew_var = 0.0
+        self.last = None
+        self.last_time = None
+        self.rate = 0.0
+        self._max = deque()  # (waktu, nilai), nilai menurun dari depan ke belakang
+        self._min = deque()  # (waktu, -nilai), idem
+
+    def update(self, t, x):
+        t = np.asarray(t, dtype=np.float64)
+        x = np.asarray(x, dtype=np.float64)
+        valid = ~np.isnan(x)
+        if not valid.all():
+            t, x = t[valid], x[valid]
+        n = len(x)
+        if not n:
+            return
+
+        # Welford per blok (gabungan dua kelompok, Chan dkk.)
+        block_mean = float(x.mean())
+        block_m2 = float(((x - block_mean) ** 2).sum())
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += block_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+        # EWMA dan varians eksponensial: m_k = m_(k-1) + a d_k, S_k = b (S_(k-1) + a d_k^2)
+        alpha, beta = self.alpha, 1.0 - self.alpha
+        previous = x[0] if self.ewma is None else self.ewma
+        means = exponential_recursion(alpha * x, beta, previous)
+        deviations = x - np.concatenate(([previous], means[:-1]))
+        self._ew_var = float(exponential_recursion(alpha * beta * deviations ** 2, beta, self._ew_var)[-1])
+
+        # laju: dari titik EWMA sebelumnya (blok lalu, atau awal blok ini untuk blok pertama)
+        if self.last_time is not None:
+            start_time, start_value = self.last_time, self.ewma
+        else:
+            start_time, start_value = t[0], means[0]
+        if t[-1] > start_time:
+            self.rate = float((means[-1] - start_value) / (t[-1] - start_time) * 60.0)
+
+        self.ewma = float(means[-1])
+        self.last = float(x[-1])
+        self.last_time = float(t[-1])
+        _push_extremes(self._max, t, x, self.window_s)
+        _push_extremes(self._min, t, -x, self.window_s)
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.variance))
+
+    @property
+    def ew_std(self):
+        return float(np.sqrt(self._ew_var))
+
+    @property
+    def maximum(self):
+        return self._max[0][1] if self._max else None
+
+    @property
+    def minimum(self):
+        return -self._min[0][1] if self._min else None
+
+    def snapshot(self):
+        """Nilai terkini sebagai dict biasa (untuk label GUI)."""
+        return {
+            'count': self.count, 'last': self.last, 'mean': self.mean, 'std': self.std,
+            'ewma': self.ewma, 'ew_std': self.ew_std, 'min': self.minimum, 'max': self.maximum,
+            'rate': self.rate,
+        }
+
+
+def _push_extremes(window, t, x, window_s):
+    """Memperbarui deque maksimum geser dengan satu blok. Hanya 'maksimum sufiks' blok
+    (lebih besar dari semua nilai sesudahnya) yang bisa menjadi maksimum nanti, jadi
+    kandidat dipilih sekaligus dengan np.maximum.accumulate, bukan satu per satu."""
+    suffix_max = np.maximum.accumulate(x[::-1])[::-1]
+    keep = np.empty(len(x), dtype=bool)
+    keep[:-1] = x[:-1] > suffix_max[1:]
+    keep[-1] = True
+    block_max = suffix_max[0]
+    while window and window[-1][1] <= block_max:
+        window.pop()
+    window.extend(zip(t[keep].tolist(), x[keep].tolist()))
+    cutoff = t[-1] - window_s
+    while window[0][0] < cutoff:
+        window.popleft()  # sampel terakhir selalu di dalam jendela, jadi deque tidak kosong
+
+
+class LiveStats:
+    """RunningStats per (sistem, parameter), dibuat saat blok pertama datang.
+    Dipakai dari thread GUI saja (jalur process_incoming_batch)."""
+    def __init__(self, fields=NUMERIC_FIELDS, ewma_span=DEFAULT_EWMA_SPAN, window_s=DEFAULT_WINDOW_S):
+        self.fields = tuple(fields)
+        self.ewma_span = ewma_span
+        self.window_s = window_s
+        self._stats = {}
+
+    @classmethod
+    def from_settings(cls, options):
+        """Membuat LiveStats dari settings['live_stats']."""
+        return cls(ewma_span=options.get('ewma_span', DEFAULT_EWMA_SPAN),
+                   window_s=options.get('window_s', DEFAULT_WINDOW_S))
+
+    def update(self, system_id, block):
+        if not len(block['timestamp']):
+            return
+        t = block['timestamp'].astype('datetime64[ms]').astype(np.int64) / 1000.0
+        for name in self.fields:
+            values = block.get(name)
+            if values is None:
+                continue
+            stats = self._stats.get((system_id, name))
+            if stats is None:
+                stats = self._stats[(system_id, name)] = RunningStats(self.ewma_span, self.window_s)
+            stats.update(t, values)
+
+    def get(self, system_id, name):
+        """RunningStats kanal itu, atau None bila belum ada data."""
+        return self._stats.get((system_id, name))
+
+    def reset(self, system_id=None):
+        for key in list(self._stats):
+            if system_id is None or key[0] == system_id:
+                del self._stats[key]
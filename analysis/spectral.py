@@ -0,0 +1,191 @@
+# file: analysis/spectral.py
+"""
+Mesin spektral untuk tab analisis: semua berbasis FFT riil, O(n log n).
+
+    autocorrelation(x, max_lag)      -> ACF lewat |rfft|^2 (Wiener-Khinchin), bukan np.correlate
+    amplitude_spectrum(x, dt)        -> rfft, panjang dipadatkan ke next_fast_len()
+    welch(x, dt, segment)            -> PSD rata-rata segmen berjendela Hann (50% overlap)
+    lomb_scargle(t, y)               -> periodogram untuk sampel tidak rata / bercelah
+                                        (metode cepat Press & Rybicki, lewat ekstirpolasi + FFT)
+    spectrum(t, y)                   -> memilih Welch atau Lomb-Scargle menurut pola sampling
+
+Waktu dalam detik (float), frekuensi dalam Hz.
+"""
+
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+GAP_FACTOR = 1.5            # jeda > 1.5x langkah median dianggap celah
+MAX_GAP_FRACTION = 0.05     # celah > 5% rentang -> dianggap tidak rata (Lomb-Scargle)
+WELCH_SEGMENTS = 8          # target jumlah segmen (tanpa overlap) untuk Welch
+MAX_FREQUENCIES = 1 << 18   # batas titik frekuensi Lomb-Scargle
+
+
+def next_fast_len(n):
+    """Panjang >= n terkecil berbentuk 2^a 3^b 5^c (FFT cepat untuk panjang ini)."""
+    n = int(n)
+    if n <= 6:
+        return max(n, 1)
+    best = 1 << (n - 1).bit_length()
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            # kalikan dengan pangkat 2 terkecil yang mencapai n
+            quotient = -(-n // power35)
+            candidate = power35 << (quotient - 1).bit_length()
+            best = min(best, candidate)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+def sampling(t):
+    """(langkah median, apakah sampling cukup rata untuk FFT biasa)."""
+    steps = np.diff(np.asarray(t, dtype=np.float64))
+    if not len(steps):
+        return 0.0, False
+    dt = float(np.median(steps))
+    if dt <= 0:
+        return dt, False
+    gaps = steps[steps > GAP_FACTOR * dt]
+    span = float(t[-1] - t[0])
+    return dt, (gaps - dt).sum() <= MAX_GAP_FRACTION * span
+
+
+def autocorrelation(x, max_lag=None, normalize=True):
+    """ACF (estimator bias, rata-rata dibuang) untuk lag 0..max_lag, dalam O(n log n).
+    normalize=True membagi dengan lag 0, jadi nilainya di [-1, 1]."""
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    max_lag = n - 1 if max_lag is None else min(int(max_lag), n - 1)
+    if n == 0 or max_lag < 0:
+        return np.empty(0)
+    x = x - x.mean()
+    # padding >= n + max_lag mencegah korelasi sirkular ikut tercampur
+    nfft = next_fast_len(n + max_lag)
+    spectrum = np.fft.rfft(x, nfft)
+    acf = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, nfft)[:max_lag + 1]
+    if normalize:
+        acf = acf / acf[0] if acf[0] > 0 else np.zeros_like(acf)
+    return acf
+
+
+def amplitude_spectrum(x, dt):
+    """(frekuensi, |X|) satu sisi dari rfft. Panjang FFT dipadatkan ke next_fast_len()
+    (grid frekuensi sedikit lebih rapat, bukan n sembarang yang lambat)."""
+    x = np.asarray(x, dtype=np.float64)
+    nfft = next_fast_len(len(x))
+    values = np.fft.rfft(x - x.mean(), nfft)
+    return np.fft.rfftfreq(nfft, d=dt), np.abs(values)
+
+
+def welch(x, dt, segment=None, overlap=0.5):
+    """PSD Welch: segmen berjendela Hann dengan overlap, detrend rata-rata per segmen,
+    semua segmen di-rfft sekaligus (satu panggilan batch) lalu dirata-rata.
+    Mengembalikan (frekuensi, PSD satuan^2/Hz)."""
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if segment is None:
+        segment = max(256, n // WELCH_SEGMENTS)
+    segment = min(int(segment), n)
+    step = max(1, int(segment * (1 - overlap)))
+    frames = sliding_window_view(x, segment)[::step]
+    window = np.hanning(segment) if segment > 1 else np.ones(1)
+    frames = (frames - frames.mean(axis=1, keepdims=True)) * window
+    nfft = next_fast_len(segment)
+    power = np.fft.rfft(frames, nfft, axis=1)
+    power = (power.real ** 2 + power.imag ** 2).mean(axis=0)
+    # skala densitas satu sisi (sama seperti scipy.signal.welch scaling='density')
+    power *= dt / (window ** 2).sum()
+    power[1:-1 if nfft % 2 == 0 else None] *= 2
+    return np.fft.rfftfreq(nfft, d=dt), power
+
+
+def _extirpolate(x, y, n, order=4):
+    """Menyebar nilai y di posisi pecahan x ke grid bilangan bulat 0..n-1 sehingga jumlah
+    fungsi periodik apa pun di x terwakili di grid (interpolasi Lagrange terbalik)."""
+    result = np.zeros(n)
+    integers = x % 1 == 0
+    result += np.bincount(x[integers].astype(np.int64), y[integers], minlength=n)
+    x, y = x[~integers], y[~integers]
+    low = np.clip((x - order // 2).astype(np.int64), 0, n - order)
+    numerator = y * np.prod(x - low - np.arange(order)[:, None], axis=0)
+    denominator = float(math.factorial(order - 1))
+    for j in range(order):
+        if j > 0:
+            denominator *= j / (j - order)
+        index = low + (order - 1 - j)
+        result += np.bincount(index, numerator / (denominator * (x - index)), minlength=n)
+    return result
+
+
+def _trig_sums(t, h, df, count, oversampling=5):
+    """(S, C) = (sum h sin(2 pi f t), sum h cos(2 pi f t)) untuk f = k*df, k = 0..count-1."""
+    t0 = t.min()
+    nfft = 1 << int(count * oversampling - 1).bit_length()
+    grid = _extirpolate(((t - t0) * df) % 1 * nfft, h, nfft)
+    sums = np.fft.ifft(grid)[:count] * nfft
+    sums *= np.exp(2j * np.pi * t0 * df * np.arange(count))
+    return sums.imag, sums.real
+
+
+def lomb_scargle(t, y, f_max=None, df=None, max_frequencies=MAX_FREQUENCIES):
+    """Periodogram Lomb-Scargle ternormalisasi (0..1) untuk sampel tak rata.
+
+    Dihitung dengan metode cepat Press & Rybicki: jumlah trigonometri untuk semua
+    frekuensi sekaligus lewat ekstirpolasi ke grid rata + FFT, O(n + m log m) untuk
+    m frekuensi (bukan O(n*m)). Default grid: df = 1/rentang, f_max = Nyquist dari
+    langkah median; bila lebih dari max_frequencies titik, f_max diturunkan (resolusi
+    frekuensi rendah, mis. siklus harian, tetap dipertahankan).
+    Mengembalikan (frekuensi, daya)."""
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    span = float(t.max() - t.min()) if len(t) else 0.0
+    if len(t) < 3 or span <= 0:
+        return np.empty(0), np.empty(0)
+    if f_max is None:
+        dt, _ = sampling(t)
+        f_max = 0.5 / dt if dt > 0 else 0.5 * len(t) / span
+    if df is None:
+        df = 1.0 / span
+    count = int(f_max / df)
+    count = min(count, int(max_frequencies))
+    if count < 1:
+        return np.empty(0), np.empty(0)
+
+    weights = np.full(len(y), 1.0 / len(y))
+    y = y - y.mean()
+    # frekuensi 0 ikut dihitung (grid FFT mulai dari 0) lalu dibuang
+    sin_y, cos_y = _trig_sums(t, weights * y, df, count + 1)
+    sin_2, cos_2 = _trig_sums(t, weights, 2 * df, count + 1)
+    sin_y, cos_y, sin_2, cos_2 = sin_y[1:], cos_y[1:], sin_2[1:], cos_2[1:]
+
+    # tau (pergeseran fase) membuat suku sin dan cos ortogonal
+    tan_2wt = sin_2 / cos_2
+    cos_2wt = 1 / np.sqrt(1 + tan_2wt ** 2)
+    sin_2wt = tan_2wt * cos_2wt
+    cos_wt = np.sqrt(0.5 * (1 + cos_2wt))
+    sin_wt = np.sign(sin_2wt) * np.sqrt(0.5 * (1 - cos_2wt))
+    yc = cos_y * cos_wt + sin_y * sin_wt
+    ys = sin_y * cos_wt - cos_y * sin_wt
+    cc = 0.5 * (1 + cos_2 * cos_2wt + sin_2 * sin_2wt)
+    ss = 0.5 * (1 - cos_2 * cos_2wt - sin_2 * sin_2wt)
+    yy = np.dot(weights, y ** 2)
+    if yy <= 0:
+        return df * np.arange(1, count + 1), np.zeros(count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        power = (yc ** 2 / cc + ys ** 2 / ss) / yy
+    return df * np.arange(1, count + 1), np.nan_to_num(power)
+
+
+def spectrum(t, y):
+    """Spektrum yang cocok untuk pola sampling data: (metode, frekuensi, daya).
+    Sampling rata -> Welch PSD; ada celah/jitter besar -> Lomb-Scargle."""
+    dt, regular = sampling(t)
+    if regular:
+        freqs, power = welch(y, dt)
+        return 'welch', freqs, power
+    freqs, power = lomb_scargle(t, y)
+    return 'lomb-scargle', freqs, power
@@ -0,0 +1,150 @@
+# file: anomaly_benchmark.py
+"""
+Benchmark detektor anomali (analysis.anomaly) dengan profil gangguan hardware_simulator.py.
+
+Tiap skenario: NORMAL_SAMPLES sampel operasi normal, lalu profil gangguan selama
+FAULT_SAMPLES sampel (counter direset seperti menu simulator), untuk banyak sistem
+sekaligus dengan seed berbeda. Label diambil dari definisi profil:
+    spike     temperature & cps pada sampel yang diberi lonjakan
+    drift     temperature sejak profil dimulai
+    periodic  moisture sejak profil dimulai
+Dilaporkan recall, presisi, latensi deteksi (sampel dan detik, 1 sampel = 2 s di
+simulator) dan throughput (sampel-kanal per detik) untuk detektor satu matriks
+(semua kanal) dan untuk jalur GUI (AnomalyMonitor, satu blok per sistem).
+Kejadian lain dihitung FP, termasuk lompatan level akibat reset counter simulator
+saat profil dipilih (nyata di data simulator, tetapi bukan gangguan berlabel).
+
+Contoh:
+    python anomaly_benchmark.py --systems 40 --batch 20
+"""
+
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+from sample_block import NUMERIC_FIELDS
+from analysis.anomaly import AnomalyDetector, AnomalyMonitor
+from hardware_simulator import profile_values, spike_injected
+
+NORMAL_SAMPLES = 600
+FAULT_SAMPLES = 300
+SAMPLE_PERIOD_S = 2.0    # simulator mengirim satu sampel tiap 2 detik
+SPIKE_TOLERANCE = 2      # spike dianggap terdeteksi bila kejadian <= 2 sampel setelahnya
+PROFILES = ('normal', 'spike', 'drift', 'periodic')
+TARGETS = {'spike': ('temperature', 'cps'), 'drift': ('temperature',), 'periodic': ('moisture',)}
+
+
+def replay(profile, systems, seed):
+    """Matriks nilai (sampel x (sistem * parameter)) untuk satu skenario."""
+    columns = []
+    for system in range(systems):
+        rng = random.Random(seed * 1000 + system)
+        samples = [profile_values('normal', counter, rng) for counter in range(NORMAL_SAMPLES)]
+        # menu simulator mereset counter saat profil gangguan dipilih, tidak untuk 'normal'
+        first = NORMAL_SAMPLES if profile == 'normal' else 0
+        samples += [profile_values(profile, counter, rng) for counter in range(first, first + FAULT_SAMPLES)]
+        columns.extend(np.array([sample[name] for sample in samples], dtype=np.float64)
+                       for name in NUMERIC_FIELDS)
+    return np.column_stack(columns)
+
+
+def labels(profile, systems):
+    """(kanal target, baris awal gangguan atau daftar baris spike)."""
+    fields = len(NUMERIC_FIELDS)
+    channels = [system * fields + NUMERIC_FIELDS.index(name)
+                for system in range(systems) for name in TARGETS.get(profile, ())]
+    if profile == 'spike':
+        rows = [NORMAL_SAMPLES + counter for counter in range(FAULT_SAMPLES)
+                if spike_injected(profile, counter)]
+        return channels, rows
+    return channels, NORMAL_SAMPLES
+
+
+def detect(data, batch, options):
+    """Semua kanal dalam satu AnomalyDetector. Mengembalikan (kejadian, detik)."""
+    detector = AnomalyDetector(data.shape[1], **options)
+    events = []
+    start = time.perf_counter()
+    for offset in range(0, len(data), batch):
+        events.extend((kind, offset + row, channel, score)
+                      for kind, row, channel, score in detector.update(data[offset:offset + batch]))
+    return events, time.perf_counter() - start
+
+
+def monitor_seconds(data, batch, options):
+    """Jalur GUI: satu AnomalyMonitor, satu blok per sistem per giliran."""
+    fields = len(NUMERIC_FIELDS)
+    monitor = AnomalyMonitor(**options)
+    timestamps = np.arange(len(data)).astype('datetime64[s]').astype('datetime64[ms]')
+    start = time.perf_counter()
+    for offset in range(0, len(data), batch):
+        for system in range(data.shape[1] // fields):
+            block = {'timestamp': timestamps[offset:offset + batch]}
+            for index, name in enumerate(NUMERIC_FIELDS):
+                block[name] = data[offset:offset + batch, system * fields + index]
+            monitor.process(f"S{system}", block)
+    return time.perf_counter() - start
+
+
+def evaluate(profile, events, systems):
+    channels, onset = labels(profile, systems)
+    targets = set(channels)
+    true_positive = 0
+    detected = {}  # target -> baris kejadian pertama dari detektor yang sesuai
+    for kind, row, channel, _ in events:
+        if channel not in targets:
+            continue
+        if profile == 'spike':
+            hits = [spike for spike in onset if 0 <= row - spike <= SPIKE_TOLERANCE]
+            if hits:
+                true_positive += 1
+                if kind == 'spike':
+                    detected.setdefault((channel, hits[0]), row - hits[0])
+        elif row >= onset:
+            true_positive += 1
+            if kind == profile:
+                detected.setdefault(channel, row - onset)
+    expected = len(channels) * len(onset) if profile == 'spike' else len(channels)
+    latencies = np.array(list(detected.values()), dtype=np.float64)
+    return {
+        'events': len(events),
+        'false_positive': len(events) - true_positive,
+        'precision': true_positive / len(events) if events else float('nan'),
+        'recall': len(detected) / expected if expected else float('nan'),
+        'latency': latencies,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark detektor anomali LISIDA")
+    parser.add_argument('--systems', type=int, default=40, help="jumlah sistem (kanal = sistem x 11)")
+    parser.add_argument('--batch', type=int, default=20, help="sampel per blok ingest")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    channels = args.systems * len(NUMERIC_FIELDS)
+    print(f"{args.systems} sistem, {channels} kanal, blok {args.batch} sampel, "
+          f"{NORMAL_SAMPLES} normal + {FAULT_SAMPLES} gangguan\n")
+    print(f"{'profil':<10}{'kejadian':>9}{'FP':>6}{'presisi':>9}{'recall':>8}"
+          f"{'latensi median':>17}{'maks':>10}{'kanal-sampel/s':>16}{'GUI/s':>12}")
+    for profile in PROFILES:
+        data = replay(profile, args.systems, args.seed)
+        events, seconds = detect(data, args.batch, {})
+        gui_seconds = monitor_seconds(data, args.batch, {})
+        result = evaluate(profile, events, args.systems)
+        latency = result['latency']
+        if len(latency):
+            median = f"{np.median(latency):.0f} ({np.median(latency) * SAMPLE_PERIOD_S:.0f} s)"
+            worst = f"{latency.max():.0f}"
+        else:
+            median = worst = "-"
+        print(f"{profile:<10}{result['events']:>9}{result['false_positive']:>6}"
+              f"{result['precision']:>9.2f}{result['recall']:>8.2f}{median:>17}{worst:>10}"
+              f"{data.size / seconds:>16,.0f}{data.size / gui_seconds:>12,.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# file: calibration.py
+
+import copy
+from datetime import datetime
+import numpy as np
+from sample_block import NUMERIC_FIELDS
+
+# Model kalibrasi per parameter di settings['calibration']:
+#   linear     -> {'m': 1.0, 'c': 0.0}                            (default jika 'type' tidak ada)
+#   polynomial -> {'type': 'polynomial', 'coefficients': [a0, a1, a2, ...]}
+#                 nilai = a0 + a1*x + a2*x^2 + ...
+#   piecewise  -> {'type': 'piecewise', 'points': [[raw, nilai], ...]}
+#                 interpolasi linear antar titik, di luar rentang memakai segmen ujung
+MODELS = ('linear', 'polynomial', 'piecewise')
+
+
+def _interp_extrapolate(x, xp, fp):
+    """np.interp, tetapi di luar [xp[0], xp[-1]] diekstrapolasi (bukan dijepit)."""
+    y = np.interp(x, xp, fp)
+    low = x < xp[0]
+    if low.any():
+        y[low] = fp[0] + (x[low] - xp[0]) * ((fp[1] - fp[0]) / (xp[1] - xp[0]))
+    high = x > xp[-1]
+    if high.any():
+        y[high] = fp[-1] + (x[high] - xp[-1]) * ((fp[-1] - fp[-2]) / (xp[-1] - xp[-2]))
+    return y
+
+
+class CompiledCalibration:
+    """Kalibrasi yang sudah dikompilasi ke array koefisien.
+
+    Dibuat sekali setiap pengaturan berubah (bukan per sampel), lalu apply() dipakai
+    untuk seluruh blok. Semua parameter linear dihitung dalam satu operasi matriks;
+    parameter linear identitas (m=1, c=0) dilewati. Entri yang tidak valid membuat
+    konstruktor melempar ValueError.
+    """
+    def __init__(self, calibration=None):
+        linear = []
+        self.polynomials = {}  # {param: koefisien pangkat tertinggi dulu (untuk np.polyval)}
+        self.piecewise = {}    # {param: (xp, fp)} terurut menurut xp
+        for param, entry in (calibration or {}).items():
+            model = entry.get('type', 'linear')
+            if model == 'linear':
+                m, c = float(entry.get('m', 1.0)), float(entry.get('c', 0.0))
+                if m != 1.0 or c != 0.0:
+                    linear.append((param, m, c))
+            elif model == 'polynomial':
+                coefficients = np.asarray(entry.get('coefficients', []), dtype=np.float64)
+                if coefficients.ndim != 1 or not len(coefficients):
+                    raise ValueError(f"Kalibrasi polinomial '{param}' butuh minimal satu koefisien.")
+                self.polynomials[param] = coefficients[::-1].copy()
+            elif model == 'piecewise':
+                points = np.asarray(entry.get('points', []), dtype=np.float64)
+                if points.ndim != 2 or points.shape[1] != 2 or len(points) < 2:
+                    raise ValueError(f"Kalibrasi piecewise '{param}' butuh minimal dua titik [raw, nilai].")
+                points = points[np.argsort(points[:, 0])]
+                if np.any(np.diff(points[:, 0]) == 0):
+                    raise ValueError(f"Kalibrasi piecewise '{param}' punya titik raw ganda.")
+                self.piecewise[param] = (points[:, 0].copy(), points[:, 1].copy())
+            else:
+                raise ValueError(f"Model kalibrasi '{model}' untuk '{param}' tidak dikenal.")
+
+        self.linear_names = tuple(name for name, _, _ in linear)
+        self.linear_m = np.array([m for _, m, _ in linear], dtype=np.float64)[:, None]
+        self.linear_c = np.array([c for _, _, c in linear], dtype=np.float64)[:, None]
+
+    @property
+    def is_identity(self):
+        return not (self.linear_names or self.polynomials or self.piecewise)
+
+    def apply(self, block):
+        """Mengembalikan blok baru yang sudah dikalibrasi; blok mentah tidak diubah."""
+        calibrated = dict(block)
+        if self.linear_names:
+            present = [i for i, name in enumerate(self.linear_names) if name in block]
+            if present:
+                rows = np.vstack([block[self.linear_names[i]] for i in present])
+                rows = rows * self.linear_m[present] + self.linear_c[present]
+                for row, i in enumerate(present):
+                    calibrated[self.linear_names[i]] = rows[row]
+        for param, coefficients in self.polynomials.items():
+            if param in block:
+                calibrated[param] = np.polyval(coefficients, block[param])
+        for param, (xp, fp) in self.piecewise.items():
+            if param in block:
+                calibrated[param] = _interp_extrapolate(np.asarray(block[param], dtype=np.float64), xp, fp)
+        return calibrated
+
+
+# --- Riwayat versi kalibrasi ---
+# master_datalog.csv menyimpan nilai mentah; kalibrasi dihitung saat data dibaca.
+# settings['calibration_history'] adalah list versi:
+#   {'version': n, 'valid_from': 'YYYY-MM-DD HH:MM:SS' | None, 'valid_to': ... | None,
+#    'calibration': {...format settings['calibration']...}, 'stored_calibrated': bool}
+# Interval berlaku [valid_from, valid_to); None berarti tak terbatas. Jika beberapa versi
+# mencakup satu timestamp, nomor versi terbesar yang dipakai. Versi 'stored_calibrated'
+# menandai baris log lama yang ditulis sudah terkalibrasi, jadi tidak dikalibrasi lagi.
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _parse_time(text):
+    return None if not text else np.datetime64(str(text).replace(' ', 'T'), 'ms')
+
+
+def initial_history(calibration, legacy_until=None):
+    """Riwayat awal untuk config lama. Jika legacy_until diisi, baris sebelum waktu itu
+    dianggap sudah terkalibrasi (format log lama) dan dilindungi dari kalibrasi ulang."""
+    history = []
+    if legacy_until:
+        history.append({'version': 0, 'valid_from': None, 'valid_to': legacy_until,
+                        'calibration': {}, 'stored_calibrated': True})
+    history.append({'version': 1, 'valid_from': legacy_until, 'valid_to': None,
+                    'calibration': copy.deepcopy(calibration)})
+    return history
+
+
+def add_calibration_version(settings, calibration, valid_from=None):
+    """Menambahkan versi kalibrasi baru ke settings (in-place). Versi yang masih terbuka
+    dan dimulai sebelum valid_from ditutup di valid_from; versi lama tidak dihapus."""
+    valid_from = valid_from or datetime.now().strftime(TIME_FORMAT)
+    history = [dict(v) for v in settings.get('calibration_history', [])]
+    start = _parse_time(valid_from)
+    for version in history:
+        if version.get('valid_to') is None and not version.get('stored_calibrated') \
+                and (version.get('valid_from') is None or _parse_time(version['valid_from']) < start):
+            version['valid_to'] = valid_from
+    history.append({
+        'version': max((v['version'] for v in history), default=0) + 1,
+        'valid_from': valid_from,
+        'valid_to': None,
+        'calibration': copy.deepcopy(calibration),
+        'created': datetime.now().strftime(TIME_FORMAT),
+    })
+    settings['calibration_history'] = history
+    return history
+
+
+class CalibrationHistory:
+    """Menerapkan versi kalibrasi yang tepat untuk setiap timestamp, sekaligus per blok.
+
+    Semua versi dikompilasi sekali di update(). Garis waktu dipecah menjadi segmen
+    (batas = semua valid_from/valid_to), tiap segmen sudah tahu versi yang berlaku,
+    jadi apply() cukup np.searchsorted + satu CompiledCalibration per segmen yang muncul.
+    """
+    def __init__(self, versions=()):
+        self.update(versions)
+
+    def update(self, versions):
+        self.versions = [dict(v) for v in versions]
+        compiled = {v['version']: CompiledCalibration(v.get('calibration', {})) for v in self.versions}
+        spans = [(_parse_time(v.get('valid_from')), _parse_time(v.get('valid_to')), v) for v in self.versions]
+
+        points = sorted({t for start, end, _ in spans for t in (start, end) if t is not None})
+        bounds = np.array(points, dtype='datetime64[ms]')
+        # segmen k = [bounds[k-1], bounds[k]); segmen pertama/terakhir tak terbatas
+        segments = []
+        for k in range(len(points) + 1):
+            low = points[k - 1] if k > 0 else None
+            high = points[k] if k < len(points) else None
+            active = [v for start, end, v in spans
+                      if (start is None or (low is not None and start <= low))
+                      and (end is None or (high is not None and high <= end))]
+            if not active or any(v.get('stored_calibrated') for v in active):
+                segments.append(None)
+                continue
+            chosen = compiled[max(v['version'] for v in active)]
+            segments.append(None if chosen.is_identity else chosen)
+        # diganti sekaligus: job latar bisa sedang memanggil apply() dari thread lain
+        self._timeline = (bounds, segments)
+
+    def apply(self, block):
+        """Blok mentah -> blok baru terkalibrasi (kolom 'timestamp' wajib ada)."""
+        return self._apply_columns(block['timestamp'], block)
+
+    def apply_frame(self, df, columns=None):
+        """DataFrame log mentah -> salinan terkalibrasi. columns membatasi kolom yang
+        dihitung (mis. hanya parameter yang sedang diplot)."""
+        names = [name for name in (columns or NUMERIC_FIELDS) if name in df.columns]
+        if df.empty or not names:
+            return df
+        data = {name: np.asarray(df[name], dtype=np.float64) for name in names}
+        calibrated = self._apply_columns(np.asarray(df['timestamp'], dtype='datetime64[ms]'), data)
+        df = df.copy()
+        for name in names:
+            # tipe kolom dipertahankan (mis. float32 dari penyimpanan kolumnar)
+            df[name] = calibrated[name].astype(df[name].dtype, copy=False)
+        return df
+
+    def _apply_columns(self, timestamps, columns):
+        bounds, segments = self._timeline
+        if not any(segments):
+            return dict(columns)
+        segment_of = np.searchsorted(bounds, np.asarray(timestamps, dtype='datetime64[ms]'), side='right')
+        present = np.unique(segment_of)
+        if len(present) == 1:
+            compiled = segments[present[0]]
+            return compiled.apply(columns) if compiled is not None else dict(columns)
+
+        result = dict(columns)
+        names = [name for name in NUMERIC_FIELDS if name in columns]
+        for name in names:
+            result[name] = np.array(columns[name], dtype=np.float64)
+        for k in present:
+            compiled = segments[k]
+            if compiled is None:
+                continue
+            mask = segment_of == k
+            part = compiled.apply({name: result[name][mask] for name in names})
+            for name in names:
+                result[name][mask] = part[name]
+        return result
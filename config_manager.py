@@ -3,18 +3,24 @@
 import json
 import os
 import logging
+from datetime import datetime
+from calibration import initial_history, TIME_FORMAT
+
+# Sistem lisimeter yang ditampilkan bila config belum punya daftar 'systems'
+DEFAULT_SYSTEMS = ['Lisimeter_1', 'Lisimeter_2']
 
 class ConfigManager:
     """Kelas untuk mengelola semua konfigurasi dan log audit."""
     def __init__(self, config_file="config.json", audit_log_file="audit.log"):
         self.config_file = config_file
-        self.settings = self.load_settings()
         self.setup_audit_log(audit_log_file)
+        self.settings = self.load_settings()
 
     def get_default_settings(self):
         """Menyediakan struktur dan nilai default untuk pengaturan."""
         return {
             'theme': 'Dark',
+            'systems': list(DEFAULT_SYSTEMS),
             'calibration': {
                 # Format: 'parameter': {'m': 1.0, 'c': 0.0, 'last_calibrated': 'N/A'}
                 # m = faktor pengali, c = faktor penambah (offset)
@@ -29,6 +35,77 @@ class ConfigManager:
                 'energy':      {'m': 1.0, 'c': 0.0, 'last_calibrated': 'N/A'},
                 'cps':         {'m': 1.0, 'c': 0.0, 'last_calibrated': 'N/A'},
                 'activity':    {'m': 1.0, 'c': 0.0, 'last_calibrated': 'N/A'},
+            },
+            'ingest': {
+                # Sampel dikirim ke GUI per blok: saat blok berisi batch_size sampel
+                # atau saat sampel tertua sudah menunggu batch_interval_ms.
+                'batch_size': 20,
+                'batch_interval_ms': 500,
+                # Port serial dibaca berbasis event (add_reader) dan dikuras hingga
+                # read_chunk_size byte sekaligus. serial_timeout (detik) hanya dipakai di
+                # Windows, tempat pembacaan memblok di executor; di Linux/macOS diabaikan.
+                'baudrate': 9600,
+                'serial_timeout': 0.1,
+                'serial_write_timeout': 1.0,
+                'read_chunk_size': 4096,
+                # 'csv' (baris teks) atau 'binary' (frame biner ber-CRC, dinegosiasikan
+                # dengan perangkat; perangkat lama yang tidak membalas tetap dibaca sebagai CSV)
+                'wire_protocol': 'csv',
+                # Antrian berbatas antara pembaca dan GUI. overflow_policy:
+                # 'block' (tahan hanya pembaca sumber yang mengisi saat penuh), 'drop_oldest',
+                # atau 'spill' (tumpah ke spill_dir)
+                'queue_max_samples': 20000,
+                'overflow_policy': 'drop_oldest',
+                'spill_dir': 'ingest_spill',
+                # Sambung ulang otomatis dengan jeda eksponensial
+                'reconnect': True,
+                'reconnect_initial_s': 1.0,
+                'reconnect_max_s': 60.0,
+            },
+            'storage': {
+                # 'csv' (CSV log + indeks sidecar), atau opt-in 'columnar' (partisi biner
+                # per sistem & hari di store_dir) / 'sqlite' (database WAL di sqlite_file);
+                # CSV log lama diimpor sekali saat backend baru dipakai pertama kali
+                'backend': 'csv',
+                'store_dir': 'datastore',
+                'sqlite_file': 'lisida.db',
+                # Rollup 1m/1h/1d (min/max/mean/count/last) dipakai plot rentang panjang.
+                # raw_retention_days: data mentah lebih tua dihapus, rollup tetap (None = simpan semua);
+                # sebelum dihapus, data mentah diarsipkan terkompresi ke archive_dir (None = tidak)
+                'rollup_dir': 'rollups',
+                'raw_retention_days': None,
+                'archive_dir': 'archive',
+                # Cache data mentah bersama untuk tab-tab GUI (partisi lama dibuang jika penuh)
+                'cache_mb': 256,
+                # Log ditulis per kelompok (group commit) oleh thread penulis: saat
+                # flush_rows baris terkumpul atau setelah flush_interval_ms.
+                # fsync=True menjamin data sampai ke disk (lebih lambat).
+                'flush_interval_ms': 1000,
+                'flush_rows': 500,
+                'fsync': False,
+            },
+            'live_stats': {
+                # Statistik live per parameter di kartu overview & tampilan detail:
+                # EWMA dengan span ewma_span sampel, min/max dalam window_s detik terakhir
+                'ewma_span': 30,
+                'window_s': 600,
+            },
+            'anomaly': {
+                # Detektor anomali live (analysis.anomaly): spike = z-skor robust > spike_z,
+                # drift = CUSUM (k, h) terhadap baseline lambat, periodic = skor spectral residual
+                'enabled': True,
+                'spike_z': 6.0,
+                'cusum_k': 2.0,
+                'cusum_h': 8.0,
+                'periodic_score': 3.0,
+            },
+            'daemon': {
+                # ingest_daemon.py: {system_id: port} yang dibaca saat daemon berjalan,
+                # mis. {"Lisimeter_1": "/dev/ttyUSB0", "Lisimeter_2": "SIMULATOR_2"}
+                'sources': {},
+                # Siaran data terkalibrasi untuk GUI (client baca-saja), hanya di localhost
+                'live_host': '127.0.0.1',
+                'live_port': 65440,
             }
         }
 
@@ -37,21 +114,50 @@ class ConfigManager:
         if not os.path.exists(self.config_file):
             # Jika file tidak ada, buat dengan nilai default
             default_settings = self.get_default_settings()
-            with open(self.config_file, 'w') as f:
-                json.dump(default_settings, f, indent=4)
+            default_settings['calibration_history'] = initial_history(default_settings['calibration'])
+            self.write_settings_file(default_settings)
             return default_settings
         else:
             # Jika file ada, buka dan baca
             with open(self.config_file, 'r') as f:
-                return json.load(f)
+                settings = json.load(f)
+            if 'calibration_history' not in settings:
+                self.migrate_calibration_history(settings)
+            return settings
+
+    def migrate_calibration_history(self, settings):
+        """Config lama: log berisi nilai yang sudah dikalibrasi. Mulai sekarang log berisi
+        nilai mentah, jadi baris sebelum saat ini ditandai 'stored_calibrated'."""
+        now = datetime.now().strftime(TIME_FORMAT)
+        settings['calibration_history'] = initial_history(settings.get('calibration', {}), legacy_until=now)
+        # batas legacy_until harus tersimpan sekali (kalau hanya di memori, tiap pemuatan
+        # menggesernya maju), jadi ditulis di sini, secara atomik
+        self.write_settings_file(settings)
+        self.log_audit(f"Riwayat kalibrasi dibuat; data log sebelum {now} tersimpan terkalibrasi.")
 
     def save_settings(self, settings_data):
         """Menyimpan kamus pengaturan ke file JSON."""
         self.settings = settings_data
-        with open(self.config_file, 'w') as f:
-            json.dump(self.settings, f, indent=4)
+        self.write_settings_file(self.settings)
         self.log_audit("Pengaturan aplikasi diperbarui dan disimpan.")
 
+    def write_settings_file(self, settings):
+        """Menulis config.json secara atomik: file sementara lalu os.replace. ingest_daemon
+        membaca file yang sama kapan saja (reload saat mtime berubah), jadi tidak boleh
+        pernah melihat file yang kosong atau setengah tertulis. Nama file sementara memuat
+        PID supaya GUI dan daemon yang menulis bersamaan tidak saling menimpa."""
+        tmp = f"{self.config_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(settings, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.config_file)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
     def setup_audit_log(self, audit_log_file):
         """Mengkonfigurasi file log untuk jejak audit."""
         self.audit_logger = logging.getLogger('AuditLogger')
@@ -1,7 +1,8 @@
 # file: custom_widgets.py
 
 # --- SEMUA IMPORT DILETAKKAN DI ATAS ---
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTabWidget, QTabBar, QStackedWidget
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTabWidget, QTabBar, QStackedWidget,
+                             QProgressBar, QPushButton)
 from PyQt5.QtCore import Qt, QPropertyAnimation, pyqtSlot, QParallelAnimationGroup
 import pyqtgraph as pg
 from collections import deque
@@ -101,6 +102,46 @@ class HealthStatusWidget(QWidget):
         else: # disconnected
             self.status_label.setText("Terputus")
 
+class JobProgressWidget(QWidget):
+    """Indikator job latar sebuah tab (jobs.JobRunner): teks, progress bar, dan tombol batal.
+    Tersembunyi saat runner sedang tidak bekerja."""
+    def __init__(self, runner, parent=None):
+        super().__init__(parent)
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.label = QLabel()
+        self.bar = QProgressBar()
+        self.bar.setTextVisible(False)
+        self.bar.setMaximumHeight(12)
+        self.cancel_btn = QPushButton("Batal")
+        self.cancel_btn.clicked.connect(runner.cancel)
+        layout.addWidget(self.label)
+        layout.addWidget(self.bar, 1)
+        layout.addWidget(self.cancel_btn)
+
+        runner.started.connect(self.on_started)
+        runner.progress.connect(self.on_progress)
+        runner.idle.connect(self.hide)
+        self.hide()
+
+    def on_started(self, text):
+        self.label.setText(text)
+        self.bar.setRange(0, 0)  # belum ada laporan persen: mode sibuk
+        self.show()
+
+    def on_progress(self, percent, text):
+        self.bar.setRange(0, 100)
+        self.bar.setValue(percent)
+        if text:
+            self.label.setText(text)
+
+def format_live_stats(stats):
+    """Ringkasan satu baris RunningStats: EWMA ± simpangan, min/max jendela, laju per menit."""
+    arrow = "↗" if stats.rate > 0 else "↘" if stats.rate < 0 else "→"
+    return (f"μ {stats.ewma:.2f} ± {stats.ew_std:.2f} | "
+            f"min {stats.minimum:.1f} max {stats.maximum:.1f} | {arrow} {stats.rate:+.2f}/mnt")
+
+
 class OverviewCard(QWidget):
     """Widget kustom yang menggabungkan nilai parameter dengan grafik mini (sparkline)."""
     def __init__(self, title, icon, unit=""):
@@ -129,20 +170,25 @@ class OverviewCard(QWidget):
         self.sparkline.setMouseEnabled(x=False, y=False)
         self.sparkline_curve = self.sparkline.plot(pen=pg.mkPen('#5dade2', width=2))
 
+        self.stats_label = QLabel()
+        self.stats_label.setObjectName("cardStats")
+
         main_layout.addLayout(top_layout)
         main_layout.addWidget(self.sparkline)
+        main_layout.addWidget(self.stats_label)
 
         self.data_series = deque(maxlen=50)
 
-    def update_data(self, value):
-        if isinstance(value, (int, float)):
-            self.value_label.setText(f"{value:.1f}{self.unit}")
-        else:
-            self.value_label.setText(str(value))
-
-        if isinstance(value, (int, float)): # Hanya tambahkan angka ke grafik
-            self.data_series.append(value)
-            self.sparkline_curve.setData(list(self.data_series))
+    def update_data(self, values, stats=None):
+        """Menerima satu blok nilai (array); label menampilkan nilai terakhir, grafik digambar sekali.
+        stats (analysis.online.RunningStats, opsional) ditampilkan sebagai ringkasan tren."""
+        if len(values) == 0:
+            return
+        self.value_label.setText(f"{float(values[-1]):.1f}{self.unit}")
+        self.data_series.extend(values[-self.data_series.maxlen:].tolist())
+        self.sparkline_curve.setData(list(self.data_series))
+        if stats is not None and stats.count:
+            self.stats_label.setText(format_live_stats(stats))
             
     def set_status(self, status):
         """Mengatur properti status untuk styling dinamis."""
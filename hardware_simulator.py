@@ -1,9 +1,11 @@
 # file: hardware_simulator.py
 import socket
+import sys
 import time
 import random
 import threading
 import math
+import protocol
 
 # Konfigurasi
 HOST = '127.0.0.1'
@@ -17,57 +19,100 @@ simulation_state = {
     "running": True
 }
 
-def generate_data(system_name):
-    """Membuat data berdasarkan profil simulasi yang aktif."""
-    state = simulation_state
-    
+def spike_injected(profile, counter):
+    """Apakah sampel ke-counter profil ini diberi lonjakan (tiap 30 sampel)."""
+    return profile == "spike" and counter % 30 == 0 and counter > 0
+
+def profile_values(profile, counter, rng=random):
+    """Nilai satu sampel untuk profil dan counter tertentu, tanpa state global.
+    Dipakai generate_data() dan anomaly_benchmark.py (replay profil sebagai data berlabel)."""
     # Nilai dasar
-    temp = 25 + math.sin(state['counter'] / 20) + random.uniform(-0.5, 0.5)
-    humidity = 50 + math.sin(state['counter'] / 30) * 5 + random.uniform(-1, 1)
-    moisture = 55 - math.sin(state['counter'] / 40) * 10 + random.uniform(-2, 2)
-    ph = 7.0 + math.sin(state['counter'] / 50) * 0.2 + random.uniform(-0.1, 0.1)
-    cps = 250 + math.sin(state['counter'] / 15) * 50 + random.uniform(-10, 10)
-    
+    temp = 25 + math.sin(counter / 20) + rng.uniform(-0.5, 0.5)
+    humidity = 50 + math.sin(counter / 30) * 5 + rng.uniform(-1, 1)
+    moisture = 55 - math.sin(counter / 40) * 10 + rng.uniform(-2, 2)
+    ph = 7.0 + math.sin(counter / 50) * 0.2 + rng.uniform(-0.1, 0.1)
+    cps = 250 + math.sin(counter / 15) * 50 + rng.uniform(-10, 10)
+
     # Terapkan skenario
-    if state["profile"] == "spike" and state["counter"] % 30 == 0 and state["counter"] > 0:
-        print(f"\n[{system_name}] *** INJECTING SPIKE! ***")
-        cps += random.randint(250, 300)  
-        temp += random.uniform(5, 10)    
-    
-    elif state["profile"] == "drift":
-        temp += state["counter"] * 0.05
-        
-    elif state["profile"] == "periodic":
-        moisture += math.sin(state["counter"]) * 15
+    if spike_injected(profile, counter):
+        cps += rng.randint(250, 300)
+        temp += rng.uniform(5, 10)
 
+    elif profile == "drift":
+        temp += counter * 0.05
+
+    elif profile == "periodic":
+        moisture += math.sin(counter) * 15
+
+    return {
+        'temperature': temp, 'humidity': humidity, 'moisture': moisture, 'ph': ph,
+        'ec': round(rng.uniform(500, 1000)),
+        'nitrogen': round(rng.uniform(100, 200)),
+        'phosphorus': round(rng.uniform(50, 100)),
+        'potassium': round(rng.uniform(50, 150)),
+        'energy': rng.uniform(1170, 1330),
+        'cps': cps,
+        'activity': rng.uniform(1.0, 2.5),
+    }
+
+def generate_data(system_name, wire_format="csv", seq=0):
+    """Membuat data berdasarkan profil simulasi yang aktif.
+
+    wire_format="csv" mengembalikan satu baris teks; "binary" mengembalikan satu
+    frame biner (bytes) dengan nomor urut seq, lihat protocol.py.
+    """
+    state = simulation_state
+    if spike_injected(state["profile"], state["counter"]):
+        print(f"\n[{system_name}] *** INJECTING SPIKE! ***")
+    values = profile_values(state["profile"], state["counter"])
     state["counter"] += 1
 
+    temp, humidity, moisture, ph = values['temperature'], values['humidity'], values['moisture'], values['ph']
+    ec, nitrogen, phosphorus, potassium = values['ec'], values['nitrogen'], values['phosphorus'], values['potassium']
+    energy, cps, activity = values['energy'], values['cps'], values['activity']
+
+    if wire_format == "binary":
+        return protocol.encode_frame(seq, {
+            'temperature': temp, 'humidity': humidity, 'moisture': moisture, 'ph': ph,
+            'ec': ec, 'nitrogen': nitrogen, 'phosphorus': phosphorus, 'potassium': potassium,
+            'source_name': 'Co-60', 'energy': energy, 'cps': int(cps), 'activity': activity
+        })
+
     # Format string data
     return (
-        f"{temp:.2f},{humidity:.2f},{moisture:.2f},{ph:.2f},{random.uniform(500, 1000):.0f},"
-        f"{random.uniform(100, 200):.0f},{random.uniform(50, 100):.0f},{random.uniform(50, 150):.0f},"
-        f"Co-60,{random.uniform(1170, 1330):.2f},{int(cps)},{random.uniform(1.0, 2.5):.2f}\n"
+        f"{temp:.2f},{humidity:.2f},{moisture:.2f},{ph:.2f},{ec},"
+        f"{nitrogen},{phosphorus},{potassium},"
+        f"Co-60,{energy:.2f},{int(cps)},{activity:.2f}\n"
     )
 
 def handle_client(conn, addr, system_name):
     """Melayani satu client sampai putus."""
     print(f"[{system_name}] Client terhubung dari {addr}")
+    wire_format = "csv"  # client bisa meminta frame biner dengan "PROTO BIN"
+    seq = 0
     with conn:
         conn.settimeout(0.1)  
         while simulation_state["running"]:
             try:
                 # kirim data simulasi
-                data_str = generate_data(system_name)
-                conn.sendall(data_str.encode('utf-8'))
+                payload = generate_data(system_name, wire_format, seq)
+                seq = (seq + 1) & 0xFFFF
+                if isinstance(payload, str):
+                    payload = payload.encode('utf-8')
+                conn.sendall(payload)
                 time.sleep(2)
 
                 # cek pesan masuk
                 try:
-                    incoming = conn.recv(1024).decode('utf-8').strip()
-                    if incoming == "STOP":
+                    incoming = conn.recv(1024).decode('utf-8').split()
+                    if "STOP" in incoming:
                         print(f"[{system_name}] Client meminta STOP.")
                         conn.sendall(b"STOP\n")
                         break
+                    if protocol.REQUEST_BINARY.decode().split() == incoming[:2]:
+                        print(f"[{system_name}] Client meminta protokol biner.")
+                        conn.sendall((protocol.ACK_BINARY + "\n").encode('utf-8'))
+                        wire_format = "binary"
                 except socket.timeout:
                     pass
 
@@ -125,9 +170,10 @@ def user_input_thread():
 if __name__ == "__main__":
     print("===== Hardware Simulator untuk LISIDA v2.2 (Fixed) =====")
     
-    # Jalankan 2 sistem
-    threading.Thread(target=system_simulator, args=(HOST, PORT_SYS1, "Lisimeter 1"), daemon=True).start()
-    threading.Thread(target=system_simulator, args=(HOST, PORT_SYS2, "Lisimeter 2"), daemon=True).start()
+    # Jalankan N sistem (default 2): python hardware_simulator.py [jumlah_sistem]
+    num_systems = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    for i in range(num_systems):
+        threading.Thread(target=system_simulator, args=(HOST, PORT_SYS1 + i, f"Lisimeter {i + 1}"), daemon=True).start()
     
     # Jalankan menu input
     threading.Thread(target=user_input_thread, daemon=True).start()
@@ -0,0 +1,260 @@
+# file: ingest_daemon.py
+"""
+Layanan ingest LISIDA tanpa GUI.
+
+Membaca semua perangkat lewat IngestHub, menulis nilai mentah ke penyimpanan log,
+menerapkan kalibrasi dari config.json, lalu menyiarkan blok terkalibrasi ke GUI yang
+menyambung sebagai client baca-saja (lihat MainWindow.attach_to_daemon_if_running).
+
+Contoh:
+    python ingest_daemon.py --source Lisimeter_1=/dev/ttyUSB0 --source Lisimeter_2=SIMULATOR_2
+
+Tanpa --source, daftar sumber diambil dari config.json ('daemon' -> 'sources').
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+
+import sample_block
+from calibration import CalibrationHistory
+from config_manager import ConfigManager
+from ingest_hub import IngestHub
+from ingest_queue import IngestQueue
+from storage import csv_log, backends
+
+DEFAULT_LIVE_HOST = '127.0.0.1'
+DEFAULT_LIVE_PORT = 65440
+CONFIG_CHECK_INTERVAL = 2.0  # detik, cek perubahan kalibrasi di config.json
+RETENTION_INTERVAL = 3600.0  # detik, retensi data mentah (raw_retention_days)
+
+
+class LiveServer:
+    """Server TCP lokal yang menyiarkan pesan JSON-lines ke semua client.
+
+    Berjalan di event loop milik IngestHub. Client tidak boleh mengirim perintah
+    (baca-saja); apa pun yang dikirim client diabaikan. Client yang terlalu lambat
+    (buffer kirim melebihi max_client_buffer) diputus agar daemon tidak ikut tertahan.
+    """
+    def __init__(self, loop, host, port, max_client_buffer=4 * 1024 * 1024):
+        self.loop = loop
+        self.host = host
+        self.port = port
+        self.max_client_buffer = max_client_buffer
+        self.server = None
+        self.clients = set()
+        self.last_states = {}  # {system_id: status} dikirim ulang ke client baru
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port)
+
+    async def close(self):
+        for writer in list(self.clients):
+            writer.close()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def broadcast(self, message):
+        """Aman dipanggil dari thread mana pun."""
+        line = (json.dumps(message) + "\n").encode()
+        if message.get('type') == 'state':
+            self.loop.call_soon_threadsafe(self.last_states.__setitem__, message['system_id'], message['state'])
+        self.loop.call_soon_threadsafe(self._send_all, line)
+
+    def _send_all(self, line):
+        for writer in list(self.clients):
+            if writer.transport.get_write_buffer_size() > self.max_client_buffer:
+                self.clients.discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+    async def _handle_client(self, reader, writer):
+        self.clients.add(writer)
+        for system_id, state in self.last_states.items():
+            writer.write((json.dumps({'type': 'state', 'system_id': system_id, 'state': state}) + "\n").encode())
+        try:
+            while await reader.read(1024):
+                pass
+        except OSError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+
+class IngestDaemon:
+    """Menghubungkan IngestHub -> kalibrasi -> CSV log + siaran live."""
+    def __init__(self, config_manager, sources, data_file=csv_log.DATA_FILE,
+                 live_host=DEFAULT_LIVE_HOST, live_port=DEFAULT_LIVE_PORT):
+        self.config_manager = config_manager
+        self.settings = config_manager.settings
+        self.calibration = CalibrationHistory(self.settings.get('calibration_history', []))
+        self.sources = sources
+        self.data_file = data_file
+        self.live_host = live_host
+        self.live_port = live_port
+        self.running = False
+
+        options = self.settings.get('ingest', {})
+        self.queue = IngestQueue(
+            max_samples=options.get('queue_max_samples', 20000),
+            policy=options.get('overflow_policy', 'drop_oldest'),
+            spill_dir=options.get('spill_dir', 'ingest_spill')
+        )
+        self.hub = IngestHub(options,
+                             on_batch=lambda system_id, block: self.queue.put(system_id, block, wait=False),
+                             on_status=self.on_status, on_state=self.on_state,
+                             backpressure=self.queue.wait_for_room)
+        storage_options = self.settings.get('storage', {})
+        backends.prepare_storage(storage_options, data_file, log=config_manager.log_audit)
+        self.log_writer = backends.open_log_writer(storage_options, data_file)
+        self.live = None
+        self._config_mtime = self._read_config_mtime()
+
+    # ---------------- callback dari thread hub ----------------
+    def on_status(self, system_id, message):
+        print(f"[{time.strftime('%H:%M:%S')}] {system_id}: {message}", flush=True)
+        if self.live is not None:
+            self.live.broadcast({'type': 'status', 'system_id': system_id, 'message': message})
+
+    def on_state(self, system_id, state):
+        if self.live is not None:
+            self.live.broadcast({'type': 'state', 'system_id': system_id, 'state': state})
+
+    # ---------------- siklus hidup ----------------
+    def run(self):
+        """Berjalan sampai stop() dipanggil (mis. dari SIGINT/SIGTERM)."""
+        self.hub.start()
+        self.live = LiveServer(self.hub.loop, self.live_host, self.live_port)
+        asyncio.run_coroutine_threadsafe(self.live.start(), self.hub.loop).result()
+        self.config_manager.log_audit(
+            f"Ingest daemon dimulai: {', '.join(f'{k}={v}' for k, v in self.sources.items())}"
+        )
+        print(f"Siaran live di {self.live_host}:{self.live_port}", flush=True)
+        for system_id, port_info in self.sources.items():
+            self.hub.connect_source(system_id, port_info)
+
+        self.running = True
+        last_config_check = last_retention = time.monotonic()
+        try:
+            while self.running:
+                if self.queue.wait(0.5):
+                    self.process_pending()
+                if time.monotonic() - last_config_check >= CONFIG_CHECK_INTERVAL:
+                    last_config_check = time.monotonic()
+                    self.reload_settings_if_changed()
+                if time.monotonic() - last_retention >= RETENTION_INTERVAL:
+                    last_retention = time.monotonic()
+                    self.apply_retention()
+        finally:
+            self.shutdown()
+
+    def stop(self, *_):
+        self.running = False
+
+    def shutdown(self):
+        try:
+            try:
+                asyncio.run_coroutine_threadsafe(self.live.close(), self.hub.loop).result(5.0)
+            finally:
+                # hub dulu, antrian kemudian: blok yang di-flush tiap sumber saat dihentikan
+                # masih diterima antrian, bukan dibuang sebagai 'dropped'
+                self.hub.stop()
+            self.live = None  # loop hub sudah ditutup: tidak ada lagi siaran
+            self.queue.close()
+            while self.queue.pending():
+                self.process_pending()  # sisa blok ditulis ke log tanpa disiarkan
+        finally:
+            self.log_writer.close()
+            self.config_manager.log_audit("Ingest daemon dihentikan.")
+
+    # ---------------- pemrosesan ----------------
+    def process_pending(self):
+        for system_id, raw_block in self.queue.get_all():
+            # log menyimpan nilai mentah; yang disiarkan ke GUI sudah terkalibrasi
+            self.log_writer.append(system_id, raw_block)
+            if self.live is not None:
+                block = self.calibration.apply(raw_block)
+                self.live.broadcast({'type': 'block', 'system_id': system_id,
+                                     'block': sample_block.to_payload(block)})
+
+    def apply_retention(self):
+        try:
+            backends.apply_retention(self.settings.get('storage', {}), self.data_file,
+                                     log=self.config_manager.log_audit)
+        except OSError as e:
+            print(f"⚠️ Retensi data mentah gagal: {e}", flush=True)
+
+    def _read_config_mtime(self):
+        try:
+            return os.path.getmtime(self.config_manager.config_file)
+        except OSError:
+            return None
+
+    def reload_settings_if_changed(self):
+        """Kalibrasi yang disimpan dari tab Pengaturan GUI langsung berlaku di daemon."""
+        mtime = self._read_config_mtime()
+        if mtime is None or mtime == self._config_mtime:
+            return
+        self._config_mtime = mtime
+        try:
+            settings = self.config_manager.load_settings()
+            calibration = CalibrationHistory(settings.get('calibration_history', []))
+        except (OSError, ValueError) as e:
+            # kalibrasi lama tetap dipakai sampai file valid lagi
+            print(f"⚠️ Gagal memuat ulang {self.config_manager.config_file}: {e}", flush=True)
+            return
+        self.settings, self.calibration = settings, calibration
+        print("🔁 Pengaturan kalibrasi dimuat ulang", flush=True)
+
+
+def parse_sources(values):
+    """['Lisimeter_1=/dev/ttyUSB0', ...] -> {'Lisimeter_1': '/dev/ttyUSB0', ...}"""
+    sources = {}
+    for value in values:
+        system_id, sep, port_info = value.partition('=')
+        if not sep or not system_id or not port_info:
+            raise argparse.ArgumentTypeError(f"Format sumber salah: {value!r} (harus SYSTEM=PORT)")
+        sources[system_id] = port_info
+    return sources
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LISIDA ingest daemon (tanpa GUI)")
+    parser.add_argument('--source', action='append', default=[], metavar='SYSTEM=PORT',
+                        help="sumber data, mis. Lisimeter_1=/dev/ttyUSB0 atau Lisimeter_2=SIMULATOR_2")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--data-file', default=csv_log.DATA_FILE,
+                        help="CSV log (backend 'csv', atau sumber impor awal backend 'columnar'/'sqlite')")
+    parser.add_argument('--live-host', default=None)
+    parser.add_argument('--live-port', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config_manager = ConfigManager(config_file=args.config)
+    daemon_settings = config_manager.settings.get('daemon', {})
+    try:
+        sources = parse_sources(args.source) if args.source else dict(daemon_settings.get('sources', {}))
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if not sources:
+        parser.error("Tidak ada sumber data. Gunakan --source atau isi 'daemon' -> 'sources' di config.json")
+
+    daemon = IngestDaemon(
+        config_manager, sources, data_file=args.data_file,
+        live_host=args.live_host or daemon_settings.get('live_host', DEFAULT_LIVE_HOST),
+        live_port=args.live_port or daemon_settings.get('live_port', DEFAULT_LIVE_PORT)
+    )
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    daemon.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
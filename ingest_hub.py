@@ -0,0 +1,319 @@
+# file: ingest_hub.py
+
+import asyncio
+import json
+import random
+import sys
+import threading
+import traceback
+import serial
+import protocol
+import sample_block
+
+SIMULATOR_HOST = '127.0.0.1'
+SIMULATOR_BASE_PORT = 65430  # SIMULATOR_1 -> 65431, SIMULATOR_2 -> 65432, dst.
+DAEMON_SCHEME = "daemon://"
+DAEMON_LINE_LIMIT = 16 * 1024 * 1024  # satu pesan JSON = satu blok
+
+
+def simulator_port(index):
+    """Port TCP untuk simulator ke-index (mulai dari 1)."""
+    return SIMULATOR_BASE_PORT + index
+
+
+def resolve_tcp_address(port_info):
+    """'SIMULATOR_n' atau 'tcp://host:port' -> (host, port); None berarti port serial."""
+    if port_info.startswith("SIMULATOR_"):
+        return SIMULATOR_HOST, simulator_port(int(port_info.rsplit('_', 1)[1]))
+    for scheme in ("tcp://", DAEMON_SCHEME):
+        if port_info.startswith(scheme):
+            host, _, port = port_info[len(scheme):].rpartition(':')
+            return host, int(port)
+    return None
+
+
+def daemon_address(host, port):
+    """port_info untuk menyambung ke ingest_daemon.py sebagai client baca-saja."""
+    return f"{DAEMON_SCHEME}{host}:{port}"
+
+
+class _Source:
+    """Status satu sumber data yang sedang dilayani hub."""
+    def __init__(self, system_id, port_info):
+        self.system_id = system_id
+        self.port_info = port_info
+        self.decoder = protocol.StreamDecoder()
+        self.batch = []        # blok-blok yang belum dikirim
+        self.batch_count = 0   # jumlah sampel di dalamnya
+        self.flush_handle = None
+        self.task = None
+        self.received = False  # sudah menerima data sejak koneksi terakhir dibuka
+
+    def reset_stream(self):
+        """Koneksi baru: mulai lagi dari mode teks (negosiasi biner diulang)."""
+        self.decoder = protocol.StreamDecoder()
+        self.received = False
+
+
+class IngestHub:
+    """Melayani banyak perangkat (TCP simulator & serial) dari satu event loop asyncio.
+
+    Loop berjalan di satu thread milik hub. Semua metode publik aman dipanggil dari
+    thread lain. Hasil dikirim lewat callback yang dipanggil dari thread hub:
+      on_batch(system_id, block)   -> blok sampel kolumnar (lihat sample_block.py)
+      on_status(system_id, pesan)  -> pesan status untuk operator
+      on_state(system_id, status)  -> 'connected' / 'reconnecting' / 'disconnected'
+
+    backpressure(timeout) (opsional, mis. IngestQueue.wait_for_room) dipanggil setelah
+    setiap pembacaan: bila antrian penuh, coroutine sumber itu menunggu di thread lain
+    (asyncio.to_thread) dan berhenti membaca, sementara sumber lain, timer flush, dan
+    jeda reconnect tetap berjalan. on_batch tidak boleh memblok (put(wait=False)).
+
+    Koneksi yang gagal atau terputus dicoba ulang otomatis dengan jeda eksponensial
+    (reconnect_initial_s, 2x, 4x, ... maks. reconnect_max_s) sampai disconnect_source().
+
+    Sumber 'daemon://host:port' adalah ingest_daemon.py: blok yang diterima sudah
+    terkalibrasi dan membawa system_id masing-masing, jadi diteruskan apa adanya.
+    """
+    def __init__(self, options=None, on_batch=None, on_status=None, on_state=None, backpressure=None):
+        options = options or {}
+        self.batch_size = max(1, int(options.get('batch_size', 20)))
+        self.batch_interval = max(0, options.get('batch_interval_ms', 500)) / 1000.0
+        self.baudrate = int(options.get('baudrate', 9600))
+        self.serial_timeout = float(options.get('serial_timeout', 0.1))  # hanya Windows
+        self.serial_write_timeout = float(options.get('serial_write_timeout', 1.0))
+        self.read_chunk_size = max(64, int(options.get('read_chunk_size', 4096)))
+        self.wire_protocol = options.get('wire_protocol', 'csv')
+        self.reconnect = bool(options.get('reconnect', True))
+        self.reconnect_initial = float(options.get('reconnect_initial_s', 1.0))
+        self.reconnect_max = float(options.get('reconnect_max_s', 60.0))
+        self.reconnects = 0  # total percobaan ulang semua sumber
+
+        self.on_batch = on_batch or (lambda system_id, batch: None)
+        self.on_status = on_status or (lambda system_id, message: None)
+        self.on_state = on_state or (lambda system_id, state: None)
+        self.backpressure = backpressure
+
+        self.loop = None
+        self._thread = None
+        self._sources = {}  # {system_id: _Source}, hanya disentuh dari thread hub
+
+    # ---------------- API publik (thread-safe) ----------------
+    def start(self):
+        """Menjalankan event loop hub di thread tersendiri."""
+        if self._thread is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="IngestHub", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Memutus semua sumber lalu menghentikan event loop."""
+        if self._thread is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        try:
+            future.result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def connect_source(self, system_id, port_info):
+        """Mulai membaca port_info (nama simulator, tcp://host:port, atau port serial)."""
+        self.loop.call_soon_threadsafe(self._connect, system_id, port_info)
+
+    def disconnect_source(self, system_id):
+        """Memutus satu sumber; sumber lain tidak terpengaruh."""
+        self.loop.call_soon_threadsafe(self._disconnect, system_id)
+
+    # ---------------- di dalam thread hub ----------------
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+
+    async def _shutdown(self):
+        tasks = [source.task for source in self._sources.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _connect(self, system_id, port_info):
+        if system_id in self._sources:
+            self._disconnect(system_id)
+        source = _Source(system_id, port_info)
+        self._sources[system_id] = source
+        source.task = self.loop.create_task(self._run_source(source))
+
+    def _disconnect(self, system_id):
+        source = self._sources.get(system_id)
+        if source is not None:
+            source.task.cancel()
+
+    async def _run_source(self, source):
+        address = resolve_tcp_address(source.port_info)
+        attempt = 0
+        try:
+            while True:
+                try:
+                    if source.port_info.startswith(DAEMON_SCHEME):
+                        await self._run_daemon_client(source, *address)
+                    elif address:
+                        await self._run_tcp(source, *address)
+                    else:
+                        await self._run_serial(source)
+                except (OSError, ValueError, serial.SerialException) as e:
+                    self.on_status(source.system_id, f"❌ Gagal: {e}")
+                except Exception as e:
+                    # JSON daemon yang tak lengkap atau bug decoder: jangan sampai task berhenti
+                    # diam-diam (gather return_exceptions), tetap lewat jalur sambung ulang
+                    traceback.print_exc()
+                    self.on_status(source.system_id, f"❌ Galat tak terduga: {type(e).__name__}: {e}")
+                self._flush(source)
+                if source.decoder.stopped or not self.reconnect:
+                    break  # perangkat sendiri yang minta berhenti
+
+                # sempat menerima data -> mulai lagi dari jeda terpendek
+                if source.received:
+                    attempt = 0
+                delay = min(self.reconnect_max, self.reconnect_initial * 2 ** attempt)
+                delay *= random.uniform(0.8, 1.0)  # jitter agar banyak perangkat tidak serempak
+                attempt += 1
+                self.on_state(source.system_id, 'reconnecting')
+                self.on_status(source.system_id, f"🔁 Menyambung ulang {source.port_info} dalam {delay:.1f} detik")
+                await asyncio.sleep(delay)
+                source.reset_stream()
+                self.reconnects += 1
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._flush(source)
+            self.on_status(source.system_id, f"🔌 Terputus dari {source.port_info}")
+            # sumber yang sudah digantikan koneksi baru tidak boleh menimpa statusnya
+            if self._sources.get(source.system_id) is source:
+                del self._sources[source.system_id]
+                self.on_state(source.system_id, 'disconnected')
+
+    async def _run_tcp(self, source, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        self.on_status(source.system_id, f"✅ Terhubung ke {source.port_info} ({host}:{port})")
+        self.on_state(source.system_id, 'connected')
+        try:
+            if self.wire_protocol == 'binary':
+                writer.write(protocol.REQUEST_BINARY)
+            while True:
+                data = await reader.read(self.read_chunk_size)
+                if not data or not self._feed(source, data):
+                    break
+                await self._wait_for_room()
+        finally:
+            # beri tahu simulator bahwa client berhenti
+            try:
+                writer.write(b"STOP\n")
+            except Exception:
+                pass
+            writer.close()
+
+    async def _run_daemon_client(self, source, host, port):
+        """Membaca siaran JSON-lines dari daemon. Client tidak pernah mengirim apa pun."""
+        reader, writer = await asyncio.open_connection(host, port, limit=DAEMON_LINE_LIMIT)
+        self.on_status(source.system_id, f"✅ Terhubung ke daemon {host}:{port} (baca-saja)")
+        self.on_state(source.system_id, 'connected')
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                source.received = True
+                message = json.loads(line)
+                kind = message.get('type')
+                if kind == 'block':
+                    self.on_batch(message['system_id'], sample_block.from_payload(message['block']))
+                elif kind == 'status':
+                    self.on_status(message['system_id'], message['message'])
+                elif kind == 'state':
+                    self.on_state(message['system_id'], message['state'])
+                await self._wait_for_room()
+        finally:
+            writer.close()
+
+    async def _run_serial(self, source):
+        # timeout=0: read() tidak pernah memblok event loop
+        ser = serial.Serial(source.port_info, self.baudrate, timeout=0,
+                            write_timeout=self.serial_write_timeout)
+        self.on_status(source.system_id, f"✅ Terhubung ke Hardware di {source.port_info} ({self.baudrate} baud)")
+        self.on_state(source.system_id, 'connected')
+        try:
+            if self.wire_protocol == 'binary':
+                ser.write(protocol.REQUEST_BINARY)
+            if sys.platform != 'win32':
+                await self._read_serial_events(source, ser)
+            else:
+                await self._read_serial_blocking(source, ser)
+        finally:
+            ser.close()
+
+    async def _read_serial_events(self, source, ser):
+        """POSIX: bangun hanya saat file descriptor port siap dibaca, lalu kuras semuanya."""
+        readable = asyncio.Event()
+        fd = ser.fileno()
+        self.loop.add_reader(fd, readable.set)
+        try:
+            while True:
+                await readable.wait()
+                readable.clear()
+                data = ser.read(min(max(1, ser.in_waiting), self.read_chunk_size))
+                if data and not self._feed(source, data):
+                    break
+                await self._wait_for_room()
+        finally:
+            self.loop.remove_reader(fd)
+
+    async def _read_serial_blocking(self, source, ser):
+        """Windows tidak mendukung add_reader untuk port serial: baca memblok di executor,
+        paling lama serial_timeout per panggilan (satu-satunya pemakai opsi itu)."""
+        ser.timeout = self.serial_timeout
+
+        def read_available():
+            return ser.read(min(max(1, ser.in_waiting), self.read_chunk_size))
+
+        while True:
+            data = await self.loop.run_in_executor(None, read_available)
+            if data and not self._feed(source, data):
+                break
+            await self._wait_for_room()
+
+    async def _wait_for_room(self):
+        """Backpressure per sumber: cek cepat di loop, menunggu lama hanya di thread lain."""
+        if self.backpressure is None or self.backpressure(0):
+            return
+        while not await asyncio.to_thread(self.backpressure, 0.5):
+            pass
+
+    def _feed(self, source, data):
+        """Mendekode byte, memasukkan sampel ke blok. False jika perangkat mengirim STOP."""
+        source.received = True
+        block = source.decoder.feed(data)
+        for message in source.decoder.pop_notices():
+            self.on_status(source.system_id, message)
+        count = sample_block.length(block)
+        if count:
+            source.batch.append(block)
+            source.batch_count += count
+            if source.batch_count >= self.batch_size:
+                self._flush(source)
+            elif source.flush_handle is None:
+                source.flush_handle = self.loop.call_later(self.batch_interval, self._flush, source)
+        return not source.decoder.stopped
+
+    def _flush(self, source):
+        """Kirim semua sampel yang tertahan sebagai satu blok."""
+        if source.flush_handle is not None:
+            source.flush_handle.cancel()
+            source.flush_handle = None
+        if source.batch:
+            block = sample_block.concat(source.batch)
+            source.batch, source.batch_count = [], 0
+            self.on_batch(source.system_id, block)
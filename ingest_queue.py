@@ -0,0 +1,183 @@
+# file: ingest_queue.py
+
+import os
+import glob
+import threading
+from collections import deque
+import numpy as np
+import sample_block
+
+POLICIES = ('block', 'drop_oldest', 'spill')
+
+
+class IngestQueue:
+    """Antrian berbatas antara pembaca perangkat (hub) dan konsumen (GUI/daemon).
+
+    Isinya pasangan (system_id, blok). Batasnya dihitung dalam jumlah sampel, jadi
+    memori tetap terkendali walau ukuran blok berubah-ubah. Jika penuh:
+      'block'       -> backpressure: put() menunggu sampai konsumen mengambil data.
+                       Produsen di event loop (IngestHub) memakai put(wait=False) lalu
+                       menunggu wait_for_room() di luar loop (asyncio.to_thread), supaya
+                       hanya sumber yang lambat yang berhenti membaca, bukan seluruh loop
+      'drop_oldest' -> blok tertua dibuang dan dihitung di counter 'dropped'
+      'spill'       -> blok baru ditulis ke disk (.npz) lalu dibaca lagi sesuai urutan
+    Aman dipakai dari beberapa thread.
+    """
+    def __init__(self, max_samples=20000, policy='drop_oldest', spill_dir='ingest_spill'):
+        if policy not in POLICIES:
+            raise ValueError(f"Kebijakan antrian tidak dikenal: {policy}")
+        self.max_samples = max(1, int(max_samples))
+        self.policy = policy
+        self.spill_dir = spill_dir
+
+        self._items = deque()
+        self._queued = 0          # sampel di memori
+        self._spill_files = deque()
+        self._spilled_queued = 0  # sampel di disk yang belum dibaca lagi
+        self._spill_seq = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.counters = {'enqueued': 0, 'dropped': 0, 'spilled': 0, 'high_water': 0}
+
+        if policy == 'spill':
+            self._recover_spill_files()
+
+    # ---------------- produsen ----------------
+    def put(self, system_id, block, wait=True):
+        """Memasukkan satu blok. Mengembalikan True jika antrian sebelumnya kosong
+        (konsumen perlu dibangunkan). wait=False: kebijakan 'block' tidak menunggu di
+        sini (antrian boleh lewat batas sebanyak satu blok); produsen wajib memanggil
+        wait_for_room() sebelum membaca data berikutnya."""
+        count = sample_block.length(block)
+        if not count:
+            return False
+        with self._cond:
+            if self._closed:
+                self.counters['dropped'] += count
+                return False
+            was_empty = not self._items and not self._spill_files
+
+            if self.policy == 'block' and wait:
+                while self._queued and self._queued + count > self.max_samples and not self._closed:
+                    self._cond.wait(0.5)
+                if self._closed:
+                    self.counters['dropped'] += count
+                    return False
+            elif self.policy == 'drop_oldest':
+                while self._items and self._queued + count > self.max_samples:
+                    _, old = self._items.popleft()
+                    old_count = sample_block.length(old)
+                    self._queued -= old_count
+                    self.counters['dropped'] += old_count
+            elif self.policy == 'spill' and (
+                    self._spill_files or (self._items and self._queued + count > self.max_samples)):
+                # sekali mulai menumpah, blok berikutnya ikut ke disk agar urutan tetap
+                self._spill(system_id, block, count)
+                self.counters['enqueued'] += count
+                self._update_high_water()
+                self._cond.notify_all()
+                return was_empty
+
+            self._items.append((system_id, block))
+            self._queued += count
+            self.counters['enqueued'] += count
+            self._update_high_water()
+            self._cond.notify_all()
+            return was_empty
+
+    def wait_for_room(self, timeout=None):
+        """Kebijakan 'block': menunggu sampai sampel di memori di bawah max_samples (atau
+        antrian ditutup). Mengembalikan False bila timeout. Kebijakan lain tidak pernah
+        menahan produsen, jadi selalu True."""
+        if self.policy != 'block':
+            return True
+        with self._cond:
+            return self._cond.wait_for(lambda: self._closed or self._queued < self.max_samples, timeout)
+
+    def _update_high_water(self):
+        self.counters['high_water'] = max(self.counters['high_water'], self._queued + self._spilled_queued)
+
+    # ---------------- konsumen ----------------
+    def get_all(self, max_samples=None):
+        """Mengambil blok-blok yang menunggu (maks. max_samples sampel, default: semua di memori)."""
+        taken = []
+        with self._cond:
+            self._unspill()
+            limit = max_samples or self.max_samples
+            total = 0
+            while self._items and (not taken or total + sample_block.length(self._items[0][1]) <= limit):
+                system_id, block = self._items.popleft()
+                count = sample_block.length(block)
+                self._queued -= count
+                total += count
+                taken.append((system_id, block))
+            self._unspill()
+            self._cond.notify_all()
+        return taken
+
+    def wait(self, timeout=None):
+        """Menunggu sampai ada data (atau timeout). Untuk konsumen tanpa event loop Qt."""
+        with self._cond:
+            if not (self._items or self._spill_files or self._closed):
+                self._cond.wait(timeout)
+            return bool(self._items or self._spill_files)
+
+    def pending(self):
+        """True jika masih ada data di memori atau di disk."""
+        with self._cond:
+            return bool(self._items or self._spill_files)
+
+    def stats(self):
+        """Salinan counter plus jumlah sampel yang sedang mengantri."""
+        with self._cond:
+            stats = dict(self.counters)
+            stats['queued'] = self._queued + self._spilled_queued
+            stats['spill_files'] = len(self._spill_files)
+            return stats
+
+    def close(self):
+        """Membangunkan produsen yang sedang menunggu; put() berikutnya dibuang."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    # ---------------- spill ke disk ----------------
+    def _spill(self, system_id, block, count):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"{self._spill_seq:012d}.npz")
+        self._spill_seq += 1
+        np.savez(path, system_id=np.array(system_id), **block)
+        self._spill_files.append((path, count))
+        self._spilled_queued += count
+        self.counters['spilled'] += count
+
+    def _unspill(self):
+        """Memindahkan blok dari disk ke memori selama masih ada tempat."""
+        while self._spill_files and (not self._queued
+                                     or self._queued + self._spill_files[0][1] <= self.max_samples):
+            path, count = self._spill_files.popleft()
+            self._spilled_queued -= count
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    system_id = str(data['system_id'])
+                    block = {name: data[name] for name in data.files if name != 'system_id'}
+                os.remove(path)
+            except (OSError, ValueError, KeyError):
+                self.counters['dropped'] += count
+                continue
+            self._items.append((system_id, block))
+            self._queued += count
+
+    def _recover_spill_files(self):
+        """Blok yang tertinggal di disk dari sesi sebelumnya ikut diantrikan lagi. File .npz
+        lain di folder itu (nama bukan nomor urut, atau isinya rusak) dilewati."""
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "*.npz"))):
+            try:
+                seq = int(os.path.basename(path)[:-4])
+                with np.load(path, allow_pickle=False) as data:
+                    count = len(data['timestamp'])
+            except (OSError, ValueError, KeyError):
+                continue
+            self._spill_files.append((path, count))
+            self._spilled_queued += count
+            self._spill_seq = max(self._spill_seq, seq + 1)
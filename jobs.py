@@ -0,0 +1,142 @@
+# file: jobs.py
+
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class JobCancelled(Exception):
+    """Dilempar job.check() bila job sudah dibatalkan atau digantikan permintaan baru."""
+
+
+class Job:
+    """Konteks untuk fungsi yang berjalan di thread latar.
+
+    Fungsi job menerima objek ini dan sebaiknya memanggil job.check() (atau
+    job.progress()) di antara langkah-langkah berat, supaya job yang sudah basi
+    berhenti lebih awal. Hasil job yang dibatalkan tidak pernah sampai ke GUI.
+    """
+    def __init__(self, signals):
+        self._signals = signals
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def progress(self, percent, text=""):
+        """Melaporkan kemajuan (0-100) ke GUI; sekaligus titik pembatalan."""
+        self.check()
+        self._signals.progress.emit(self, int(percent), text)
+
+
+class _JobSignals(QObject):
+    # objek ini tinggal di thread GUI, jadi emit dari thread latar otomatis diantrikan
+    finished = pyqtSignal(object, object)  # (job, hasil)
+    failed = pyqtSignal(object, str)       # (job, pesan error)
+    progress = pyqtSignal(object, int, str)
+    ended = pyqtSignal(object)             # selalu dipancarkan, juga untuk job batal
+
+
+class _JobRunnable(QRunnable):
+    def __init__(self, job, fn, signals):
+        super().__init__()
+        self.job = job
+        self.fn = fn
+        self.signals = signals
+
+    def run(self):
+        try:
+            self.job.check()
+            result = self.fn(self.job)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.signals.failed.emit(self.job, str(e))
+        else:
+            self.signals.finished.emit(self.job, result)
+        finally:
+            self.signals.ended.emit(self.job)
+
+
+class JobRunner(QObject):
+    """Menjalankan pekerjaan berat sebuah tab (baca data, FFT, ekspor) di QThreadPool.
+
+    Satu runner = satu jenis permintaan: submit() membatalkan job sebelumnya yang
+    belum selesai, dan hanya hasil job terbaru yang diteruskan ke on_done/on_error
+    (dipanggil di thread GUI). Sinyal started/progress/idle dipakai indikator kemajuan.
+    """
+    started = pyqtSignal(str)       # teks status
+    progress = pyqtSignal(int, str)  # persen, teks
+    idle = pyqtSignal()
+
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self._signals = _JobSignals()
+        self._signals.finished.connect(self._on_finished)
+        self._signals.failed.connect(self._on_failed)
+        self._signals.progress.connect(self._on_progress)
+        self._signals.ended.connect(self._on_ended)
+        self._current = None
+        self._callbacks = None
+        self._runnables = {}  # referensi Python harus hidup sampai run() selesai
+
+    def submit(self, fn, on_done, on_error=None, text="Memproses..."):
+        """Menjalankan fn(job) di thread latar; on_done(hasil) / on_error(pesan) di GUI."""
+        self.cancel(notify=False)
+        job = Job(self._signals)
+        runnable = _JobRunnable(job, fn, self._signals)
+        runnable.setAutoDelete(False)
+        self._current = job
+        self._callbacks = (on_done, on_error)
+        self._runnables[job] = runnable
+        self.started.emit(text)
+        self.pool.start(runnable)
+        return job
+
+    def cancel(self, notify=True):
+        if self._current is None:
+            return
+        self._current.cancel()
+        if self.pool.tryTake(self._runnables[self._current]):
+            del self._runnables[self._current]  # belum sempat mulai: dibuang dari antrian
+        self._current = None
+        self._callbacks = None
+        if notify:
+            self.idle.emit()
+
+    def is_busy(self):
+        return self._current is not None
+
+    def _finish(self, job):
+        if job is not self._current:
+            return None  # job basi
+        callbacks = self._callbacks
+        self._current = None
+        self._callbacks = None
+        self.idle.emit()
+        return callbacks
+
+    def _on_finished(self, job, result):
+        callbacks = self._finish(job)
+        if callbacks is not None:
+            callbacks[0](result)
+
+    def _on_failed(self, job, message):
+        callbacks = self._finish(job)
+        if callbacks is not None and callbacks[1] is not None:
+            callbacks[1](message)
+
+    def _on_ended(self, job):
+        self._runnables.pop(job, None)
+
+    def _on_progress(self, job, percent, text):
+        if job is self._current:
+            self.progress.emit(percent, text)
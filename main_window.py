@@ -1,18 +1,22 @@
 # file: main_window.py
 
-import os
-import csv
 import socket
-from datetime import datetime
 from PyQt5.QtWidgets import (
-    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
     QGroupBox, QLabel, QComboBox, QPushButton, QMessageBox
 )
-from PyQt5.QtCore import QThread, QTimer
+from PyQt5.QtCore import QTimer, QThreadPool
 from serial.tools import list_ports
 
-from config_manager import ConfigManager
-from worker import DataWorker  # <- pastikan ini DataWorker, bukan Worker
+import sample_block
+from calibration import CalibrationHistory
+from storage import csv_log, backends
+from config_manager import ConfigManager, DEFAULT_SYSTEMS
+from worker import IngestHubWorker
+from jobs import JobRunner
+from analysis.online import LiveStats
+from analysis.anomaly import AnomalyMonitor
+from ingest_hub import simulator_port, daemon_address
 from custom_widgets import AnimatedTabWidget, HealthStatusWidget
 from tabs.overview_tab import OverviewTab
 from tabs.detailed_view_tab import DetailedViewTab
@@ -22,6 +26,13 @@ from tabs.settings_tab import SettingsTab
 from tabs.analysis_toolkit_tab import AnalysisToolkitTab
 from styles import DARK_STYLE, LIGHT_STYLE
 
+DAEMON_SOURCE = "LISIDA_daemon"  # id sumber untuk siaran ingest_daemon.py
+
+
+def create_anomaly_monitor(options):
+    """AnomalyMonitor dari settings['anomaly'], atau None bila deteksi anomali dimatikan."""
+    return AnomalyMonitor.from_settings(options) if options.get('enabled', True) else None
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -35,40 +46,73 @@ class MainWindow(QMainWindow):
             self.setStyleSheet(DARK_STYLE)
 
         self.connections = {}        # {system_id: {...}}
-        self.DATA_FILE = "master_datalog.csv"
+        self.DATA_FILE = csv_log.DATA_FILE
+        storage_options = self.settings.get('storage', {})
+        backends.prepare_storage(storage_options, self.DATA_FILE, log=self.config.log_audit)
+        self.log_writer = backends.open_log_writer(storage_options, self.DATA_FILE)
+        # Satu cache data bersama untuk semua tab (storage.cache.DataStore)
+        self.store = backends.open_reader(storage_options, self.DATA_FILE, cached=True)
         self.health_timers = {}      # {system_id: QTimer}
+        self.systems = list(self.settings.get('systems', DEFAULT_SYSTEMS))
+        # Log menyimpan nilai mentah; semua versi kalibrasi dikompilasi sekali di sini
+        # (dan setiap pengaturan disimpan), lalu dipakai bersama oleh tampilan live dan tab riwayat
+        self.calibration_history = CalibrationHistory(self.settings.get('calibration_history', []))
+        # Statistik online per (sistem, parameter), diperbarui per blok di process_incoming_batch
+        self.live_stats = LiveStats.from_settings(self.settings.get('live_stats', {}))
+        self.anomaly_monitor = create_anomaly_monitor(self.settings.get('anomaly', {}))
+
+        # Satu hub asyncio melayani semua perangkat; GUI hanya berlangganan sinyalnya
+        self.ingest_hub = IngestHubWorker(self.settings.get('ingest', {}), self)
+        self.ingest_hub.data_ready.connect(self.drain_ingest_queue)
+        self.ingest_hub.status_update.connect(self.show_source_status)
+        self.ingest_hub.source_state.connect(self.on_source_state)
+        self.ingest_hub.start()
 
         self.initUI()
+
+        # Counter antrian ingest ditampilkan permanen di status bar
+        self.ingest_stats_label = QLabel()
+        self.statusBar().addPermanentWidget(self.ingest_stats_label)
+        self.ingest_stats_timer = QTimer(self)
+        self.ingest_stats_timer.timeout.connect(self.update_ingest_stats)
+        self.ingest_stats_timer.start(1000)
         self.config.log_audit("Aplikasi LISIDA dimulai.")
 
+        # Jika ingest_daemon.py sudah berjalan, GUI hanya menjadi client baca-saja
+        self.daemon_attached = False
+        self.attach_to_daemon_if_running()
+
     def initUI(self):
         self.showMaximized()
         main_layout = QVBoxLayout()
 
-        # Panel kontrol koneksi
-        control_panel = QHBoxLayout()
-        control_panel.addWidget(self.create_connection_box("Lisimeter_1"))
-        control_panel.addWidget(self.create_connection_box("Lisimeter_2"))
+        # Panel kontrol koneksi (2 kotak per baris, berapa pun jumlah sistemnya)
+        control_panel = QGridLayout()
+        self.connection_boxes = {}
+        for idx, system_id in enumerate(self.systems):
+            row, col = divmod(idx, 2)
+            self.connection_boxes[system_id] = self.create_connection_box(system_id)
+            control_panel.addWidget(self.connection_boxes[system_id], row, col)
         main_layout.addLayout(control_panel)
 
         # Panel status kesehatan
         health_panel_box = QGroupBox("Status Kesehatan Sistem")
-        health_panel_layout = QHBoxLayout(health_panel_box)
-        self.health_widgets = {
-            "Lisimeter_1": HealthStatusWidget("Lisimeter 1"),
-            "Lisimeter_2": HealthStatusWidget("Lisimeter 2")
-        }
-        health_panel_layout.addWidget(self.health_widgets["Lisimeter_1"])
-        health_panel_layout.addWidget(self.health_widgets["Lisimeter_2"])
+        health_panel_layout = QGridLayout(health_panel_box)
+        self.health_widgets = {}
+        for idx, system_id in enumerate(self.systems):
+            widget = HealthStatusWidget(system_id.replace('_', ' '))
+            self.health_widgets[system_id] = widget
+            row, col = divmod(idx, 4)
+            health_panel_layout.addWidget(widget, row, col)
         main_layout.addWidget(health_panel_box)
 
         # Tab utama
         self.tabs = AnimatedTabWidget()
-        self.overview_tab = OverviewTab()
-        self.detailed_tab = DetailedViewTab()
-        self.comparison_tab = ComparisonTab(self.DATA_FILE)
-        self.analysis_tab = AnalysisToolkitTab(self.DATA_FILE)
-        self.datalog_tab = DataLogTab(self.DATA_FILE)
+        self.overview_tab = OverviewTab(self.systems, self.live_stats)
+        self.detailed_tab = DetailedViewTab(self.systems, self.live_stats)
+        self.comparison_tab = ComparisonTab(self.store, self.systems, self.calibration_history)
+        self.analysis_tab = AnalysisToolkitTab(self.store, self.systems, self.calibration_history)
+        self.datalog_tab = DataLogTab(self.store, self.systems, self.calibration_history)
         self.settings_tab = SettingsTab(self)
 
         self.tabs.addTab(self.overview_tab, "📊  Overview")
@@ -113,12 +157,12 @@ class MainWindow(QMainWindow):
         )
         return box
 
-    def check_simulator_availability(self, port):
-        """Cek apakah simulator mendengar di port tsb. Timeout dibuat agak longgar."""
+    def check_simulator_availability(self, port, host='127.0.0.1'):
+        """Cek apakah simulator (atau daemon) mendengar di port tsb. Timeout dibuat agak longgar."""
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.settimeout(0.2)  # sebelumnya 0.05 -> mudah false negative
-                s.connect(('127.0.0.1', port))
+                s.connect((host, port))
             return True
         except (socket.timeout, ConnectionRefusedError, OSError):
             return False
@@ -128,10 +172,9 @@ class MainWindow(QMainWindow):
         port_selector.clear()
 
         port_list = []
-        if self.check_simulator_availability(65431):
-            port_list.append("SIMULATOR_1")
-        if self.check_simulator_availability(65432):
-            port_list.append("SIMULATOR_2")
+        for index in range(1, len(self.systems) + 1):
+            if self.check_simulator_availability(simulator_port(index)):
+                port_list.append(f"SIMULATOR_{index}")
 
         # Port serial fisik (kalau dipakai)
         try:
@@ -156,53 +199,51 @@ class MainWindow(QMainWindow):
             return
 
         self.config.log_audit(f"Koneksi dimulai untuk {system_id} di port {port}.")
-        thread = QThread(self)
-        worker = DataWorker(port_info=port)
-        worker.moveToThread(thread)
-
-        # Sinyal data & status
-        worker.data_received.connect(lambda data: self.process_incoming_data(system_id, data))
-        worker.status_update.connect(lambda msg: self.statusBar().showMessage(f"[{system_id}] {msg}"))
-
-        # Start worker ketika thread mulai
-        thread.started.connect(worker.run)
-        # Bersihkan worker saat thread selesai
-        thread.finished.connect(worker.deleteLater)
-
-        # Mulai thread
-        thread.start()
 
         # Timer kesehatan untuk deteksi "signal lost"
-        self.health_timers[system_id] = QTimer(self)
-        self.health_timers[system_id].setSingleShot(True)
-        self.health_timers[system_id].timeout.connect(lambda: self.signal_lost(system_id))
+        self.ensure_health_timer(system_id)
 
-        # Simpan referensi supaya tidak di-GC
         self.connections[system_id] = {
-            'thread': thread,
-            'worker': worker,
+            'port': port,
             'port_selector': port_selector,
             'connect_btn': connect_btn,
             'disconnect_btn': disconnect_btn
         }
+        self.ingest_hub.connect_source(system_id, port)
 
         connect_btn.setEnabled(False)
         disconnect_btn.setEnabled(True)
         port_selector.setEnabled(False)
 
+    def ensure_health_timer(self, system_id):
+        if system_id not in self.health_timers:
+            self.health_timers[system_id] = QTimer(self)
+            self.health_timers[system_id].setSingleShot(True)
+            self.health_timers[system_id].timeout.connect(lambda: self.signal_lost(system_id))
+
+    def attach_to_daemon_if_running(self):
+        """Perangkat dipegang ingest_daemon.py: GUI menerima blok yang sudah terkalibrasi
+        dan sudah ditulis ke log oleh daemon, jadi koneksi lokal dinonaktifkan."""
+        daemon_settings = self.settings.get('daemon', {})
+        host = daemon_settings.get('live_host', '127.0.0.1')
+        port = daemon_settings.get('live_port', 65440)
+        if not self.check_simulator_availability(port, host):
+            return
+        self.daemon_attached = True
+        for system_id in self.systems:
+            self.ensure_health_timer(system_id)
+            self.connection_boxes[system_id].setEnabled(False)
+        self.ingest_hub.connect_source(DAEMON_SOURCE, daemon_address(host, port))
+        self.config.log_audit(f"GUI tersambung ke ingest daemon {host}:{port} (baca-saja).")
+
     def stop_connection(self, system_id, connect_btn, disconnect_btn, port_selector):
-        if system_id in self.connections and 'worker' in self.connections[system_id]:
-            try:
-                if system_id in self.health_timers:
-                    self.health_timers[system_id].stop()
-
-                self.connections[system_id]['worker'].stop()     # akan kirim STOP ke simulator jika perlu
-                self.connections[system_id]['thread'].quit()
-                self.connections[system_id]['thread'].wait()
-                self.config.log_audit(f"Koneksi dihentikan untuk {system_id}.")
-                self.health_widgets[system_id].set_status("disconnected")
-            except Exception as e:
-                print(f"⚠️ Gagal stop {system_id}: {e}")
+        if system_id in self.connections:
+            if system_id in self.health_timers:
+                self.health_timers[system_id].stop()
+            self.ingest_hub.disconnect_source(system_id)     # akan kirim STOP ke simulator jika perlu
+            del self.connections[system_id]
+            self.config.log_audit(f"Koneksi dihentikan untuk {system_id}.")
+            self.health_widgets[system_id].set_status("disconnected")
 
         connect_btn.setEnabled(True)
         disconnect_btn.setEnabled(False)
@@ -210,30 +251,90 @@ class MainWindow(QMainWindow):
         self.refresh_ports(port_selector)
         self.statusBar().showMessage(f"[{system_id}] Terputus.")
 
-    def process_incoming_data(self, system_id, raw_data):
+    def drain_ingest_queue(self):
+        """Mengambil blok dari antrian ingest. Jika masih tersisa, lanjut di giliran
+        event loop berikutnya supaya GUI tetap responsif."""
+        for system_id, block in self.ingest_hub.take_blocks(max_samples=5000):
+            self.process_incoming_batch(system_id, block)
+        if self.ingest_hub.has_pending():
+            QTimer.singleShot(0, self.drain_ingest_queue)
+
+    def update_ingest_stats(self):
+        stats = self.ingest_hub.stats()
+        self.ingest_stats_label.setText(
+            f"Antrian: {stats['queued']} | Dibuang: {stats['dropped']} | "
+            f"Ke disk: {stats['spilled']} | Reconnect: {stats['reconnects']}"
+        )
+
+    def show_source_status(self, system_id, message):
+        self.statusBar().showMessage(f"[{system_id}] {message}")
+
+    def on_source_state(self, system_id, state):
+        """Sumber putus sendiri (gagal konek, perangkat dicabut): kembalikan tombolnya."""
+        if self.daemon_attached:
+            self.on_daemon_state(system_id, state)
+            return
+        if system_id not in self.connections:
+            return
+        if state == 'reconnecting':
+            # hub sedang mencoba ulang; tombol tetap 'Putuskan' agar operator bisa membatalkan
+            self.health_widgets[system_id].set_status("warning")
+            return
+        if state != 'disconnected':
+            return
+        conn_info = self.connections.pop(system_id)
+        if system_id in self.health_timers:
+            self.health_timers[system_id].stop()
+        self.health_widgets[system_id].set_status("disconnected")
+        self.config.log_audit(f"Koneksi {system_id} di port {conn_info['port']} terputus.")
+        conn_info['connect_btn'].setEnabled(True)
+        conn_info['disconnect_btn'].setEnabled(False)
+        conn_info['port_selector'].setEnabled(True)
+
+    def on_daemon_state(self, system_id, state):
+        """Status koneksi daemon sendiri, atau status perangkat yang diteruskan daemon."""
+        if system_id == DAEMON_SOURCE:
+            if state == 'reconnecting':
+                for widget in self.health_widgets.values():
+                    widget.set_status("warning")
+            return
+        if system_id in self.health_widgets:
+            status = {'connected': "connected", 'reconnecting': "warning"}.get(state, "disconnected")
+            self.health_widgets[system_id].set_status(status)
+
+    def process_incoming_batch(self, system_id, raw_block):
+        """Memproses satu blok sampel: kalibrasi, update tampilan sekali, simpan ke log."""
+        if not sample_block.length(raw_block) or system_id not in self.health_widgets:
+            return
+
         # reset/ulang timer kesehatan setiap kali ada data
         if system_id in self.health_timers:
             self.health_timers[system_id].start(10000)  # 10 detik tanpa data => warning
             self.health_widgets[system_id].set_status("connected")
 
-        calibrated_data = raw_data.copy()
-
-        # kalibrasi linear m*x + c
-        cal_params = self.settings.get('calibration', {})
-        for param, values in cal_params.items():
-            if param in calibrated_data:
-                raw_value = calibrated_data[param]
-                m = values.get('m', 1.0)
-                c = values.get('c', 0.0)
-                try:
-                    calibrated_data[param] = (raw_value * m) + c
-                except Exception:
-                    pass
-
+        if self.daemon_attached:
+            calibrated_block = raw_block  # sudah dikalibrasi dan dicatat oleh daemon
+        else:
+            calibrated_block = self.calibration_history.apply(raw_block)
+
+        self.live_stats.update(system_id, calibrated_block)
+        anomalies = set()
+        if self.anomaly_monitor is not None:
+            for event in self.anomaly_monitor.process(system_id, calibrated_block):
+                self.report_anomaly(event)
+            anomalies = self.anomaly_monitor.active(system_id)
         thresholds = self.settings.get('thresholds', {})
-        self.overview_tab.update_data(system_id, calibrated_data, thresholds)
-        self.detailed_tab.update_data(system_id, calibrated_data)
-        self.save_calibrated_data_to_log(system_id, calibrated_data)
+        self.overview_tab.update_data(system_id, calibrated_block, thresholds, anomalies)
+        self.detailed_tab.update_data(system_id, calibrated_block)
+        if not self.daemon_attached:
+            self.save_raw_data_to_log(system_id, raw_block)
+
+    def report_anomaly(self, event):
+        timestamp = str(event['timestamp'].astype('datetime64[s]')).replace('T', ' ')
+        message = (f"[{event['system_id']}] ANOMALI {event['kind']} pada {event['parameter']}: "
+                   f"{event['value']:.2f} pada {timestamp} (skor {event['score']:.1f})")
+        self.config.log_audit(message)
+        self.statusBar().showMessage(message)
 
     def signal_lost(self, system_id):
         self.health_widgets[system_id].set_status("warning")
@@ -241,38 +342,44 @@ class MainWindow(QMainWindow):
         self.statusBar().showMessage(f"[{system_id}] PERINGATAN: Sinyal tidak diterima > 10 detik.")
 
     def update_settings(self, new_settings):
-        self.settings = new_settings
+        self.calibration_history.update(new_settings.get('calibration_history', []))
+        old_settings, self.settings = self.settings, new_settings
+        # opsi statistik online / detektor anomali berubah -> dibangun ulang (statistiknya mulai lagi)
+        if new_settings.get('live_stats', {}) != old_settings.get('live_stats', {}):
+            self.live_stats = LiveStats.from_settings(new_settings.get('live_stats', {}))
+            self.overview_tab.live_stats = self.live_stats
+            self.detailed_tab.live_stats = self.live_stats
+        if new_settings.get('anomaly', {}) != old_settings.get('anomaly', {}):
+            self.anomaly_monitor = create_anomaly_monitor(new_settings.get('anomaly', {}))
         if self.settings.get('theme') == 'Light':
             self.setStyleSheet(LIGHT_STYLE)
         else:
             self.setStyleSheet(DARK_STYLE)
         self.config.save_settings(self.settings)
 
-    def save_calibrated_data_to_log(self, system_id, data):
-        header = [
-            'system_id', 'timestamp', 'temperature', 'humidity', 'moisture', 'ph', 'ec',
-            'nitrogen', 'phosphorus', 'potassium', 'source_name', 'energy', 'cps', 'activity'
-        ]
-        file_exists = os.path.exists(self.DATA_FILE)
-        with open(self.DATA_FILE, 'a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=header)
-            if not file_exists:
-                writer.writeheader()
-            # pastikan format timestamp string
-            if isinstance(data.get('timestamp'), datetime):
-                data = data.copy()
-                data['timestamp'] = data['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-            row = {'system_id': system_id, **data}
-            filtered_row = {key: row.get(key) for key in header}
-            writer.writerow(filtered_row)
+    def save_raw_data_to_log(self, system_id, block):
+        # hanya antri; penulisan ke disk dilakukan thread LogWriter
+        self.log_writer.append(system_id, block)
 
     def closeEvent(self, event):
         self.config.log_audit("Aplikasi LISIDA ditutup.")
+        # job latar tab (baca data, analisis, ekspor) dibatalkan lalu ditunggu selesai
+        for runner in self.findChildren(JobRunner):
+            runner.cancel()
+        QThreadPool.globalInstance().waitForDone(10000)
         for system_id in list(self.connections.keys()):
-            if 'worker' in self.connections[system_id]:
-                conn_info = self.connections[system_id]
-                try:
-                    self.stop_connection(system_id, conn_info['connect_btn'], conn_info['disconnect_btn'], conn_info['port_selector'])
-                except Exception as e:
-                    print(f"⚠️ Error saat menutup koneksi {system_id}: {e}")
+            conn_info = self.connections[system_id]
+            try:
+                self.stop_connection(system_id, conn_info['connect_btn'], conn_info['disconnect_btn'], conn_info['port_selector'])
+            except Exception as e:
+                print(f"⚠️ Error saat menutup koneksi {system_id}: {e}")
+        self.ingest_hub.stop()
+        # blok terakhir yang sempat masuk sebelum hub berhenti ikut ditulis (get_all mengambil
+        # paling banyak max_samples sekali panggil, jadi dikuras sampai kosong)
+        try:
+            while self.ingest_hub.has_pending():
+                for system_id, block in self.ingest_hub.take_blocks():
+                    self.process_incoming_batch(system_id, block)
+        finally:
+            self.log_writer.close()
         event.accept()
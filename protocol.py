@@ -0,0 +1,285 @@
+# file: protocol.py
+
+import io
+import re
+import struct
+import binascii
+from datetime import datetime
+import numpy as np
+import sample_block
+
+# --- Protokol biner LISIDA ---
+# Satu frame berukuran tetap (33 byte, little-endian):
+#   sync(2) | seq(u16) | temperature(i16) humidity moisture ph ec nitrogen phosphorus
+#   potassium(u16) | source(u8) | energy(u32) | cps(u32) | activity(u16) | crc16(u16)
+# Nilai disimpan sebagai fixed-point (nilai * skala). Skala mengikuti presisi format
+# CSV lama, jadi tidak ada informasi yang hilang dibanding baris teks.
+# CRC-16/CCITT dihitung dari seq sampai activity (tanpa sync dan crc).
+
+SYNC = b'\xa5\x5a'
+FRAME = struct.Struct('<2sHhHHHHHHHBIIHH')
+FRAME_SIZE = FRAME.size
+SEQ_HALF_RANGE = 0x8000  # celah seq >= ini dianggap mundur (duplikat/reset), bukan frame hilang
+
+# Perintah negosiasi (baris teks) sebelum aliran berpindah ke format biner
+REQUEST_BINARY = b"PROTO BIN\n"
+ACK_BINARY = "PROTO BIN OK"
+
+# (nama field, skala) sesuai urutan di dalam frame
+FIELD_SCALES = (
+    ('temperature', 100), ('humidity', 100), ('moisture', 100), ('ph', 100),
+    ('ec', 1), ('nitrogen', 1), ('phosphorus', 1), ('potassium', 1),
+)
+TAIL_SCALES = (('energy', 100), ('cps', 1), ('activity', 100))
+
+# Nama sumber radiasi dikirim sebagai kode 1 byte; 0 = tidak dikenal
+SOURCE_NAMES = ('Unknown', 'Co-60', 'Cs-137', 'Am-241', 'Ba-133', 'Eu-152', 'Na-22')
+_SOURCE_CODES = {name: code for code, name in enumerate(SOURCE_NAMES)}
+
+_FIELD_LIMITS = {
+    'temperature': (-32768, 32767),
+    'energy': (0, 0xFFFFFFFF),
+    'cps': (0, 0xFFFFFFFF),
+}
+
+
+def _fixed(name, value, scale):
+    """Mengubah nilai float ke integer fixed-point, dijepit ke rentang tipe field-nya."""
+    low, high = _FIELD_LIMITS.get(name, (0, 0xFFFF))
+    return min(max(int(round(float(value) * scale)), low), high)
+
+
+def encode_frame(seq, sample):
+    """Membungkus satu sampel (dict seperti hasil parsing CSV) menjadi frame biner."""
+    head = [_fixed(name, sample[name], scale) for name, scale in FIELD_SCALES]
+    source = _SOURCE_CODES.get(sample.get('source_name'), 0)
+    tail = [_fixed(name, sample[name], scale) for name, scale in TAIL_SCALES]
+    frame = bytearray(FRAME.pack(SYNC, seq & 0xFFFF, *head, source, *tail, 0))
+    crc = binascii.crc_hqx(frame[2:-2], 0xFFFF)
+    struct.pack_into('<H', frame, FRAME_SIZE - 2, crc)
+    return bytes(frame)
+
+
+class FrameDecoder:
+    """Mendekode aliran byte biner menjadi sampel, sekaligus menghitung frame rusak/hilang.
+
+    Byte boleh datang terpotong di sembarang posisi; sisa frame yang belum lengkap
+    disimpan untuk panggilan feed() berikutnya. Frame dengan CRC salah dibuang dan
+    decoder mencari sync word berikutnya. Celah nomor urut ke depan dihitung sebagai frame
+    hilang. Nomor urut yang mundur atau melompat lebih dari setengah rentang u16 bukan
+    kehilangan: frame yang sama dengan frame sebelumnya (kiriman ulang) dibuang dan dihitung
+    di 'duplicates', selain itu dianggap perangkat mulai ulang ('resyncs') lalu disinkronkan.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.expected_seq = None
+        self.crc_errors = 0
+        self.lost_frames = 0
+        self.duplicates = 0
+        self.resyncs = 0
+
+    def feed(self, data):
+        """Menambahkan byte dan mengembalikan list sampel (dict tanpa timestamp)."""
+        buffer = self.buffer
+        buffer += data
+        samples = []
+        pos = 0
+        end = len(buffer)
+        while end - pos >= FRAME_SIZE:
+            if buffer[pos:pos + 2] != SYNC:
+                nxt = buffer.find(SYNC, pos + 1)
+                pos = nxt if nxt >= 0 else end - 1
+                continue
+            fields = FRAME.unpack_from(buffer, pos)
+            if binascii.crc_hqx(buffer[pos + 2:pos + FRAME_SIZE - 2], 0xFFFF) != fields[-1]:
+                self.crc_errors += 1
+                pos += 1  # sync palsu atau frame rusak: cari ulang
+                continue
+            pos += FRAME_SIZE
+            sample = self._to_sample(fields)
+            if sample is not None:
+                samples.append(sample)
+        del buffer[:pos]
+        return samples
+
+    def _to_sample(self, fields):
+        seq = fields[1]
+        if self.expected_seq is not None and seq != self.expected_seq:
+            gap = (seq - self.expected_seq) & 0xFFFF
+            if gap < SEQ_HALF_RANGE:
+                self.lost_frames += gap
+            elif seq == (self.expected_seq - 1) & 0xFFFF:
+                self.duplicates += 1  # frame terakhir terkirim ulang
+                return None
+            else:
+                self.resyncs += 1     # reset perangkat (mis. kembali ke 0) atau urutan mundur
+        self.expected_seq = (seq + 1) & 0xFFFF
+
+        sample = {name: fields[2 + i] / scale for i, (name, scale) in enumerate(FIELD_SCALES)}
+        code = fields[10]
+        sample['source_name'] = SOURCE_NAMES[code] if code < len(SOURCE_NAMES) else SOURCE_NAMES[0]
+        for i, (name, scale) in enumerate(TAIL_SCALES):
+            sample[name] = fields[11 + i] / scale
+        sample['cps'] = int(sample['cps'])
+        return sample
+
+
+# --- Format teks (CSV) ---
+# Satu baris = 12 kolom, urutan sama dengan CSV_FIELDS.
+CSV_FIELDS = (
+    'temperature', 'humidity', 'moisture', 'ph', 'ec', 'nitrogen',
+    'phosphorus', 'potassium', 'source_name', 'energy', 'cps', 'activity'
+)
+_NUMERIC_COLUMNS = [i for i, name in enumerate(CSV_FIELDS) if name != 'source_name']
+_NUMERIC_NAMES = [CSV_FIELDS[i] for i in _NUMERIC_COLUMNS]
+_SOURCE_COLUMN = CSV_FIELDS.index('source_name')
+
+# Baris kontrol di tengah aliran teks: "STOP" atau ACK peralihan ke biner
+_CONTROL_LINE = re.compile(rb'^[ \t\r]*(STOP|' + re.escape(ACK_BINARY.encode()) + rb')[ \t\r]*$', re.M)
+
+
+def _load_columns(data):
+    """Membaca kolom angka dan kolom sumber dari teks CSV dengan parser C NumPy.
+
+    Melempar ValueError jika ada baris dengan kolom kurang/lebih atau angka rusak.
+    """
+    numeric = np.loadtxt(io.BytesIO(data), delimiter=',', usecols=_NUMERIC_COLUMNS,
+                         dtype=np.float64, comments=None, ndmin=2)
+    # usecols mengabaikan kolom berlebih; total koma memastikan tiap baris tepat 12 kolom
+    if data.count(b',') != (len(CSV_FIELDS) - 1) * len(numeric):
+        raise ValueError("jumlah kolom tidak sama")
+    sources = np.loadtxt(io.BytesIO(data), delimiter=',', usecols=_SOURCE_COLUMN,
+                         dtype=str, comments=None, ndmin=1)
+    return numeric, np.char.strip(sources)
+
+
+def _load_valid_rows(rows, rejected):
+    """Membaca rows; jika gagal, dibagi dua terus sampai baris rusak terisolasi.
+
+    Baris rusak masuk ke rejected. Mengembalikan list (numeric, sources) per potongan
+    yang berhasil, sehingga k baris rusak hanya butuh sekitar k*log(n) kali parsing.
+    """
+    try:
+        return [_load_columns(b'\n'.join(rows))]
+    except ValueError:
+        if len(rows) == 1:
+            rejected.append(rows[0])
+            return []
+        mid = len(rows) // 2
+        return _load_valid_rows(rows[:mid], rejected) + _load_valid_rows(rows[mid:], rejected)
+
+
+def parse_csv_block(data, timestamp=None):
+    """Mem-parsing banyak baris CSV sekaligus menjadi blok kolumnar NumPy.
+
+    data berisi baris-baris lengkap (dipisah newline). Jalur normal membaca seluruh
+    chunk dalam satu kali jalan. Jika ada baris rusak, jumlah kolom dicek untuk
+    semua baris sekaligus dan sisa baris rusak dicari dengan pembagian biner.
+    Mengembalikan (blok, list baris yang ditolak). Semua sampel di blok diberi
+    timestamp yang sama (waktu kedatangan chunk).
+    """
+    if timestamp is None:
+        timestamp = datetime.now()
+    data = bytes(data)
+    rejected = []
+    if not data.strip():
+        return sample_block.empty(), rejected
+    try:
+        numeric, sources = _load_columns(data)
+    except ValueError:
+        lines = np.array(data.split(b'\n'), dtype=bytes)
+        lines = lines[np.char.str_len(np.char.strip(lines)) > 0]
+        well_formed = np.char.count(lines, b',') == len(CSV_FIELDS) - 1
+        rejected = lines[~well_formed].tolist()
+        rows = lines[well_formed].tolist()
+        if not rows:
+            return sample_block.empty(), rejected
+        parts = _load_valid_rows(rows, rejected)
+        if not parts:
+            return sample_block.empty(), rejected
+        numeric = np.concatenate([numeric for numeric, _ in parts])
+        sources = np.concatenate([sources for _, sources in parts])
+
+    block = {'timestamp': np.full(len(numeric), np.datetime64(timestamp, 'ms'))}
+    for col, name in enumerate(_NUMERIC_NAMES):
+        block[name] = numeric[:, col]
+    block['source_name'] = sources
+    return block, rejected
+
+
+class StreamDecoder:
+    """Mengubah aliran byte mentah dari satu perangkat menjadi blok sampel kolumnar.
+
+    Semua baris lengkap yang sudah ada di buffer di-parsing sekaligus dengan
+    parse_csv_block. Menangani juga sinyal "STOP" dan peralihan ke frame biner
+    setelah perangkat membalas ACK_BINARY. Pesan untuk operator (baris dibuang,
+    frame hilang) dikumpulkan di notices dan diambil dengan pop_notices().
+    """
+    def __init__(self, max_buffer=16384):
+        self.buffer = bytearray()
+        self.max_buffer = max_buffer
+        self.frame_decoder = None
+        self.rejected_lines = 0
+        self.stopped = False
+        self.notices = []
+
+    def feed(self, data):
+        """Menambahkan byte dan mengembalikan blok berisi semua sampel yang sudah lengkap."""
+        now = datetime.now()
+        if self.frame_decoder is not None:
+            return self._decode_frames(data, now)
+        return self._decode_lines(data, now)
+
+    def pop_notices(self):
+        notices, self.notices = self.notices, []
+        return notices
+
+    def _decode_lines(self, data, now):
+        buffer = self.buffer
+        buffer += data
+        last_newline = buffer.rfind(b'\n')
+        if last_newline < 0:
+            if len(buffer) > self.max_buffer:
+                buffer.clear()  # sampah tanpa newline (mis. baud rate salah), buang
+            return sample_block.empty()
+        complete = bytes(buffer[:last_newline + 1])
+        del buffer[:last_newline + 1]
+
+        control = _CONTROL_LINE.search(complete)
+        if control is None:
+            return self._parse_lines(complete, now)
+
+        block = self._parse_lines(complete[:control.start()], now)
+        if control.group(1) == b"STOP":
+            self.stopped = True
+            buffer.clear()
+            return block
+
+        # sisa aliran setelah ACK sudah berupa frame biner
+        self.frame_decoder = FrameDecoder()
+        self.notices.append("🔁 Perangkat beralih ke protokol biner")
+        rest = complete[control.end() + 1:] + bytes(buffer)
+        buffer.clear()
+        return sample_block.concat([block, self._decode_frames(rest, now)])
+
+    def _parse_lines(self, data, now):
+        block, rejected = parse_csv_block(data, now)
+        if rejected:
+            # Data yang formatnya salah dibuang, tapi dihitung dan dilaporkan
+            self.rejected_lines += len(rejected)
+            self.notices.append(f"⚠️ Baris data tidak valid dibuang (total {self.rejected_lines})")
+        return block
+
+    def _decode_frames(self, data, now):
+        decoder = self.frame_decoder
+        lost_before, crc_before, resyncs_before = decoder.lost_frames, decoder.crc_errors, decoder.resyncs
+        samples = decoder.feed(data)
+        if decoder.lost_frames != lost_before or decoder.crc_errors != crc_before:
+            self.notices.append(
+                f"⚠️ Frame hilang: {decoder.lost_frames}, CRC salah: {decoder.crc_errors}"
+            )
+        if decoder.resyncs != resyncs_before:
+            self.notices.append(f"🔁 Nomor urut frame dimulai ulang (perangkat restart?), total {decoder.resyncs}")
+        for sample in samples:
+            sample['timestamp'] = now
+        return sample_block.from_samples(samples)
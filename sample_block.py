@@ -0,0 +1,72 @@
+# file: sample_block.py
+
+import numpy as np
+
+# Blok sampel kolumnar: dict {kolom: np.ndarray} dengan panjang yang sama.
+#   'timestamp'   -> datetime64[ms] (waktu lokal, sama seperti di master_datalog.csv)
+#   NUMERIC_FIELDS -> float64
+#   'source_name' -> array string
+# Semua tahap setelah parser (kalibrasi, tampilan, log) bekerja per blok, bukan per sampel.
+
+NUMERIC_FIELDS = (
+    'temperature', 'humidity', 'moisture', 'ph', 'ec', 'nitrogen',
+    'phosphorus', 'potassium', 'energy', 'cps', 'activity'
+)
+TEXT_FIELDS = ('source_name',)
+
+
+def empty():
+    """Blok kosong dengan semua kolom."""
+    block = {'timestamp': np.empty(0, dtype='datetime64[ms]')}
+    for name in NUMERIC_FIELDS:
+        block[name] = np.empty(0, dtype=np.float64)
+    block['source_name'] = np.empty(0, dtype=str)
+    return block
+
+
+def length(block):
+    """Jumlah sampel di dalam blok."""
+    return len(block['timestamp'])
+
+
+def from_samples(samples):
+    """Membuat blok dari list dict sampel (mis. hasil dekode frame biner)."""
+    if not samples:
+        return empty()
+    block = {'timestamp': np.array([s['timestamp'] for s in samples], dtype='datetime64[ms]')}
+    for name in NUMERIC_FIELDS:
+        block[name] = np.array([s[name] for s in samples], dtype=np.float64)
+    block['source_name'] = np.array([s['source_name'] for s in samples], dtype=str)
+    return block
+
+
+def concat(blocks):
+    """Menggabungkan beberapa blok menjadi satu."""
+    blocks = [b for b in blocks if length(b)]
+    if not blocks:
+        return empty()
+    if len(blocks) == 1:
+        return blocks[0]
+    return {name: np.concatenate([b[name] for b in blocks]) for name in blocks[0]}
+
+
+def format_timestamps(timestamps):
+    """datetime64 -> string 'YYYY-MM-DD HH:MM:SS' (format kolom timestamp di CSV), sekaligus."""
+    text = np.asarray(timestamps).astype('datetime64[s]').astype(str)
+    return np.char.replace(text, 'T', ' ')
+
+
+def to_payload(block):
+    """Blok -> dict list biasa (untuk JSON). Timestamp dikirim sebagai epoch milidetik."""
+    payload = {name: block[name].tolist() for name in NUMERIC_FIELDS + TEXT_FIELDS}
+    payload['timestamp'] = block['timestamp'].astype('datetime64[ms]').astype(np.int64).tolist()
+    return payload
+
+
+def from_payload(payload):
+    """Kebalikan to_payload()."""
+    block = {'timestamp': np.array(payload['timestamp'], dtype=np.int64).astype('datetime64[ms]')}
+    for name in NUMERIC_FIELDS:
+        block[name] = np.array(payload[name], dtype=np.float64)
+    block['source_name'] = np.array(payload['source_name'], dtype=str)
+    return block
@@ -0,0 +1 @@
+# Biarkan file ini kosong
\ No newline at end of file
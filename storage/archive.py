@@ -0,0 +1,406 @@
+# file: storage/archive.py
+"""
+Format arsip terkompresi untuk data mentah jangka panjang (*.lsa).
+
+    <root>/<system_id>/<YYYY-MM-DD>.lsa
+
+File = MAGIC, lalu blok-blok berisi paling banyak BLOCK_ROWS baris:
+    BLOCK_MAGIC | uint32 panjang header | uint32 panjang payload | header JSON | payload
+Header memuat jumlah baris, t_min/t_max, dan per kolom min/max + cara encode, sehingga
+pembaca bisa melompati blok di luar rentang waktu tanpa membaca payload-nya.
+
+Encoding per kolom (semua dekode vektor NumPy, tanpa loop per sampel):
+    timestamp   -> delta-of-delta (interval hampir tetap -> hampir semua nol), zigzag, bit-pack
+    numerik     -> 'quant': dikuantisasi ke 10^-d (d terkecil yang lossless terhadap tipe
+                   aslinya, mis. 2 desimal), selisih antar sampel, zigzag, bit-pack
+                   'xor'  : fallback bila tidak bisa dikuantisasi; bit float di-XOR dengan
+                   sampel sebelumnya (seperti Gorilla), byte di-shuffle lalu zlib
+    source_name -> kamus per blok + kode yang di-bit-pack
+Bit-pack memakai lebar bit tetap per kolom per blok (pencilan disimpan sebagai
+pengecualian); kolom konstan tidak memakan byte.
+
+Contoh:
+    python -m storage.archive csv master_datalog.csv archive
+    python -m storage.archive info archive/Lisimeter_1/2025-08-25.lsa
+"""
+
+import os
+import sys
+import json
+import zlib
+import struct
+import argparse
+import numpy as np
+import pandas as pd
+from sample_block import NUMERIC_FIELDS
+from storage.csv_log import HEADER, empty_frame, read_blocks
+
+ARCHIVE_DIR = "archive"
+EXTENSION = ".lsa"
+MAGIC = b"LSA1"
+BLOCK_MAGIC = b"LSAB"
+BLOCK_ROWS = 4096
+MAX_DECIMALS = 4
+_BLOCK_HEADER = struct.Struct('<4sII')
+_POWERS_OF_TWO = np.uint64(1) << np.arange(64, dtype=np.uint64)
+
+
+# ---------------- primitif ----------------
+def _zigzag(values):
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values):
+    values = values.astype(np.uint64)
+    return ((values >> np.uint64(1)).view(np.int64)) ^ -((values & np.uint64(1)).view(np.int64))
+
+
+def _pack(values, width):
+    """uint64[n] -> bytes, width bit per nilai (LSB dulu)."""
+    if width == 0 or not len(values):
+        return b''
+    shifts = np.arange(width, dtype=np.uint64)
+    bits = ((values[:, None] >> shifts) & np.uint64(1)).astype(np.uint8)
+    return np.packbits(bits.ravel(), bitorder='little').tobytes()
+
+
+def _unpack(data, count, width):
+    if width == 0:
+        return np.zeros(count, dtype=np.uint64)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=count * width, bitorder='little')
+    bits = bits.reshape(count, width).astype(np.uint64)
+    return np.bitwise_or.reduce(bits << np.arange(width, dtype=np.uint64), axis=1)
+
+
+def _encode_ints(values):
+    """uint64[n] -> (spec, bytes). Lebar bit dipilih agar total terkecil; nilai yang tidak
+    muat (mis. satu celah waktu panjang) disimpan terpisah sebagai pengecualian, jadi satu
+    pencilan tidak membuat semua nilai di blok ikut lebar."""
+    if not len(values):
+        return {'width': 0}, b''
+    lengths = np.searchsorted(_POWERS_OF_TWO, values, side='right')  # jumlah bit per nilai
+    histogram = np.bincount(lengths, minlength=65)
+    exceeding = len(values) - np.cumsum(histogram)  # [w] = jumlah nilai yang butuh > w bit
+    cost = np.arange(65) * len(values) + exceeding * 96
+    width = int(np.argmin(cost))
+    spec = {'width': width}
+    outliers = np.flatnonzero(lengths > width)
+    if not len(outliers):
+        return spec, _pack(values, width)
+    spec['exceptions'] = len(outliers)
+    packed = values.copy()
+    packed[outliers] = 0
+    return spec, (outliers.astype('<u4').tobytes() + values[outliers].astype('<u8').tobytes()
+                  + _pack(packed, width))
+
+
+def _decode_ints(spec, data, count):
+    exceptions = spec.get('exceptions', 0)
+    values = _unpack(data[exceptions * 12:], count, spec['width'])
+    if exceptions:
+        positions = np.frombuffer(data[:exceptions * 4], dtype='<u4')
+        values[positions] = np.frombuffer(data[exceptions * 4:exceptions * 12], dtype='<u8')
+    return values
+
+
+# ---------------- kolom ----------------
+def _encode_timestamps(ts):
+    header = {'t0': int(ts[0]), 'd0': int(ts[1] - ts[0]) if len(ts) > 1 else 0}
+    spec, data = _encode_ints(_zigzag(np.diff(ts, n=2)) if len(ts) > 2 else np.empty(0, dtype=np.uint64))
+    header.update(spec)
+    return header, data
+
+
+def _decode_timestamps(header, data, count):
+    ts = np.empty(count, dtype=np.int64)
+    ts[0] = header['t0']
+    if count > 1:
+        deltas = np.empty(count - 1, dtype=np.int64)
+        deltas[0] = header['d0']
+        if count > 2:
+            deltas[1:] = header['d0'] + np.cumsum(_unzigzag(_decode_ints(header, data, count - 2)))
+        ts[1:] = header['t0'] + np.cumsum(deltas)
+    return ts
+
+
+def _quantize(values):
+    """Desimal terkecil yang membuat kuantisasi lossless terhadap dtype asal, atau None."""
+    for decimals in range(MAX_DECIMALS + 1):
+        scaled = values.astype(np.float64) * 10.0 ** decimals
+        if len(scaled) and np.abs(scaled).max() >= 2.0 ** 52:
+            return None
+        q = np.round(scaled)
+        if np.array_equal((q / 10.0 ** decimals).astype(values.dtype), values):
+            return decimals, q.astype(np.int64)
+    return None
+
+
+def _encode_numeric(values):
+    valid = ~np.isnan(values)
+    header = {'dtype': values.dtype.str}
+    parts = []
+    if not valid.all():
+        header['mask'] = True
+        parts.append(np.packbits(valid, bitorder='little').tobytes())
+        values = values[valid]
+    if len(values):
+        header['min'], header['max'] = float(values.min()), float(values.max())
+    quantized = _quantize(values)
+    if quantized is not None:
+        decimals, q = quantized
+        header.update(encoding='quant', decimals=decimals, first=int(q[0]) if len(q) else 0)
+        spec, data = _encode_ints(_zigzag(np.diff(q)) if len(q) > 1 else np.empty(0, dtype=np.uint64))
+        header.update(spec)
+        parts.append(data)
+    else:
+        bits = values.view(np.uint64 if values.dtype.itemsize == 8 else np.uint32)
+        xored = np.empty_like(bits)
+        if len(bits):
+            xored[0] = bits[0]
+            xored[1:] = bits[1:] ^ bits[:-1]
+        # byte-shuffle: byte yang sama dari semua nilai berdampingan (banyak nol) -> zlib efektif
+        shuffled = xored.view(np.uint8).reshape(-1, bits.itemsize).T.tobytes()
+        header['encoding'] = 'xor'
+        parts.append(zlib.compress(shuffled, 6))
+    header['lengths'] = [len(p) for p in parts]
+    return header, b''.join(parts)
+
+
+def _decode_numeric(header, data, count):
+    dtype = np.dtype(header['dtype'])
+    offset = 0
+    lengths = list(header['lengths'])
+    valid = None
+    if header.get('mask'):
+        valid = np.unpackbits(np.frombuffer(data[:lengths[0]], dtype=np.uint8),
+                              count=count, bitorder='little').astype(bool)
+        offset = lengths.pop(0)
+    stored = count if valid is None else int(valid.sum())
+    body = data[offset:offset + lengths[0]]
+    if header['encoding'] == 'quant':
+        q = np.empty(stored, dtype=np.int64)
+        if stored:
+            q[0] = header['first']
+            q[1:] = header['first'] + np.cumsum(_unzigzag(_decode_ints(header, body, stored - 1)))
+        values = (q / 10.0 ** header['decimals']).astype(dtype)
+    else:
+        unsigned = np.uint64 if dtype.itemsize == 8 else np.uint32
+        raw = np.frombuffer(zlib.decompress(body), dtype=np.uint8).reshape(dtype.itemsize, stored)
+        xored = np.ascontiguousarray(raw.T).view(unsigned).ravel()
+        values = np.bitwise_xor.accumulate(xored).view(dtype) if stored else np.empty(0, dtype=dtype)
+    if valid is None:
+        return values
+    result = np.full(count, np.nan, dtype=dtype)
+    result[valid] = values
+    return result
+
+
+def _encode_text(values):
+    names, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    spec, data = _encode_ints(codes.reshape(-1).astype(np.uint64))
+    header = {'encoding': 'dict', 'names': names.tolist()}
+    header.update(spec)
+    return header, data
+
+
+def _decode_text(header, data, count):
+    codes = _decode_ints(header, data, count).astype(np.int64)
+    return np.array(header['names'], dtype=str)[codes]
+
+
+# ---------------- blok ----------------
+def encode_block(block):
+    """Blok sampel (urut waktu, <= BLOCK_ROWS baris) -> bytes satu blok arsip."""
+    ts = np.asarray(block['timestamp'], dtype='datetime64[ms]').astype(np.int64)
+    header = {'rows': len(ts), 't_min': int(ts.min()), 't_max': int(ts.max()), 'columns': {}}
+    payload = []
+    offset = 0
+    for name in ['timestamp'] + [n for n in block if n != 'timestamp']:
+        if name == 'timestamp':
+            column, data = _encode_timestamps(ts)
+        elif name in NUMERIC_FIELDS:
+            column, data = _encode_numeric(np.ascontiguousarray(block[name]))
+        else:
+            column, data = _encode_text(block[name])
+        column['offset'], column['length'] = offset, len(data)
+        header['columns'][name] = column
+        payload.append(data)
+        offset += len(data)
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    return _BLOCK_HEADER.pack(BLOCK_MAGIC, len(header_bytes), offset) + header_bytes + b''.join(payload)
+
+
+def decode_block(header, payload, columns=None):
+    """Header + payload -> blok {'timestamp': datetime64[ms], kolom: array}."""
+    count = header['rows']
+    specs = header['columns']
+    names = [name for name in specs if name != 'timestamp'] if columns is None else columns
+    block = {}
+    for name in ['timestamp'] + [name for name in names if name in specs]:
+        spec = specs[name]
+        data = payload[spec['offset']:spec['offset'] + spec['length']]
+        if name == 'timestamp':
+            block[name] = _decode_timestamps(spec, data, count).astype('datetime64[ms]')
+        elif spec['encoding'] == 'dict':
+            block[name] = _decode_text(spec, data, count)
+        else:
+            block[name] = _decode_numeric(spec, data, count)
+    return block
+
+
+# ---------------- file ----------------
+def write_file(path, block, block_rows=BLOCK_ROWS):
+    """Menulis blok sampel ke satu file arsip (atomik: tmp lalu rename)."""
+    ts = np.asarray(block['timestamp'], dtype='datetime64[ms]')
+    if np.any(ts[1:] < ts[:-1]):
+        order = np.argsort(ts, kind='stable')
+        block = {name: np.asarray(values)[order] for name, values in block.items()}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        for start in range(0, len(ts), block_rows):
+            f.write(encode_block({name: np.asarray(values)[start:start + block_rows]
+                                  for name, values in block.items()}))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_headers(path):
+    """[(header, offset payload)] semua blok, tanpa membaca payload."""
+    headers = []
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} bukan file arsip LISIDA")
+        while True:
+            prefix = f.read(_BLOCK_HEADER.size)
+            if len(prefix) < _BLOCK_HEADER.size:
+                break
+            magic, header_len, payload_len = _BLOCK_HEADER.unpack(prefix)
+            if magic != BLOCK_MAGIC:
+                raise ValueError(f"{path}: blok rusak di posisi {f.tell() - _BLOCK_HEADER.size}")
+            header = json.loads(f.read(header_len))
+            headers.append((header, f.tell(), payload_len))
+            f.seek(payload_len, os.SEEK_CUR)
+    return headers
+
+
+def read_file(path, columns=None, start_ms=None, end_ms=None):
+    """Blok sampel dari satu file; blok yang di luar [start, end) dilompati via header."""
+    parts = []
+    with open(path, 'rb') as f:
+        for header, offset, length in read_headers(path):
+            if (start_ms is not None and header['t_max'] < start_ms) or \
+                    (end_ms is not None and header['t_min'] >= end_ms):
+                continue
+            f.seek(offset)
+            block = decode_block(header, f.read(length), columns)
+            ts = block['timestamp'].astype(np.int64)
+            keep = np.ones(len(ts), dtype=bool)
+            if start_ms is not None:
+                keep &= ts >= start_ms
+            if end_ms is not None:
+                keep &= ts < end_ms
+            if not keep.all():
+                block = {name: values[keep] for name, values in block.items()}
+            parts.append(block)
+    if not parts:
+        return None
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def day_path(root, system_id, day):
+    return os.path.join(root, system_id, f"{day}{EXTENSION}")
+
+
+class ArchiveReader:
+    """Membaca arsip dengan antarmuka read_frame() yang sama seperti backend lain."""
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+
+    def systems(self):
+        try:
+            return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+        except OSError:
+            return []
+
+    def days(self, system_id, start=None, end=None):
+        try:
+            days = sorted(name[:-len(EXTENSION)] for name in os.listdir(os.path.join(self.root, system_id))
+                          if name.endswith(EXTENSION))
+        except OSError:
+            return []
+        if start is not None:
+            days = [day for day in days if day >= str(pd.Timestamp(start).date())]
+        if end is not None:
+            days = [day for day in days if day <= str((pd.Timestamp(end) - pd.Timedelta(milliseconds=1)).date())]
+        return days
+
+    def read_frame(self, systems=None, columns=None, start=None, end=None, tail=None):
+        names = list(NUMERIC_FIELDS) + ['source_name'] if columns is None else list(columns)
+        start_ms = None if start is None else int(pd.Timestamp(start).to_datetime64().astype('datetime64[ms]').astype(np.int64))
+        end_ms = None if end is None else int(pd.Timestamp(end).to_datetime64().astype('datetime64[ms]').astype(np.int64))
+        frames = []
+        for system_id in (self.systems() if systems is None else systems):
+            for day in self.days(system_id, start, end):
+                block = read_file(day_path(self.root, system_id, day), names, start_ms, end_ms)
+                if block is None or not len(block['timestamp']):
+                    continue
+                frame = pd.DataFrame(block)
+                frame.insert(0, 'system_id', system_id)
+                frames.append(frame)
+        if not frames:
+            return empty_frame(columns)
+        df = pd.concat(frames, ignore_index=True).sort_values('timestamp', kind='stable', ignore_index=True)
+        df = df[[name for name in HEADER if name in df.columns]]
+        df['system_id'] = df['system_id'].astype('category')
+        df['timestamp'] = df['timestamp'].astype('datetime64[ns]')
+        return df.tail(tail).reset_index(drop=True) if tail is not None else df
+
+
+def archive_blocks(blocks, root=ARCHIVE_DIR, merge=True):
+    """(system_id, blok) -> satu file per sistem per hari. Mengembalikan jumlah baris.
+    merge=False menimpa file hari yang sudah ada (blok berisi hari yang lengkap)."""
+    rows = 0
+    for system_id, block in blocks:
+        days = np.asarray(block['timestamp'], dtype='datetime64[ms]').astype('datetime64[D]')
+        for day in np.unique(days):
+            selection = days == day
+            part = {name: np.asarray(values)[selection] for name, values in block.items()}
+            path = day_path(root, system_id, str(day))
+            if merge and os.path.exists(path):
+                existing = read_file(path)
+                part = {name: np.concatenate([existing[name], part[name]]) for name in part if name in existing}
+            write_file(path, part)
+            rows += int(selection.sum())
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arsip terkompresi LISIDA (*.lsa)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    csv_cmd = commands.add_parser('csv', help="mengarsipkan CSV log (per sistem per hari)")
+    csv_cmd.add_argument('csv_file')
+    csv_cmd.add_argument('out_dir', nargs='?', default=ARCHIVE_DIR)
+    info_cmd = commands.add_parser('info', help="menampilkan header blok sebuah file arsip")
+    info_cmd.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'csv':
+        rows = archive_blocks(read_blocks(args.csv_file), args.out_dir)
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(args.out_dir) for f in files)
+        print(f"{rows} baris diarsipkan ke {args.out_dir}: {size} byte "
+              f"({os.path.getsize(args.csv_file) / max(size, 1):.1f}x lebih kecil dari CSV)")
+    else:
+        for header, offset, length in read_headers(args.path):
+            encodings = ', '.join(f"{name}={spec.get('encoding', 'dod')}/{spec.get('width', '-')}b"
+                                  for name, spec in header['columns'].items())
+            print(f"@{offset}: {header['rows']} baris, {length} byte, "
+                  f"{pd.Timestamp(header['t_min'], unit='ms')} .. {pd.Timestamp(header['t_max'], unit='ms')}: {encodings}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# file: storage/backends.py
+
+import os
+import shutil
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sample_block import NUMERIC_FIELDS
+from storage import csv_log, columnar, sqlite_store, rollup, archive, cache
+from storage.writer import LogWriter
+
+# settings['storage']['backend']:
+#   'csv'      -> CSV log seperti versi lama, plus indeks sidecar (default: ekspor/impor
+#                 dan alat lain yang membaca CSV tetap melihat data terbaru)
+#   'columnar' -> partisi biner per sistem & hari di store_dir (opt-in)
+#   'sqlite'   -> database SQLite (WAL) di sqlite_file, berindeks (system_id, timestamp)
+# Saat 'columnar'/'sqlite' dipilih pertama kali, isi CSV log diimpor sekali (import_legacy_csv);
+# sejak itu CSV tidak lagi bertambah.
+BACKENDS = ('csv', 'columnar', 'sqlite')
+DEFAULT_BACKEND = 'csv'
+# Rollup 1m/1h/1d selalu diperbarui bersama data mentah (lihat storage/rollup.py).
+# raw_retention_days > 0 menghapus data mentah yang lebih tua; rollup tetap disimpan dan
+# data mentahnya lebih dulu dipindah ke arsip terkompresi di archive_dir (None = tanpa arsip).
+
+
+def backend_name(options):
+    name = options.get('backend', DEFAULT_BACKEND)
+    if name not in BACKENDS:
+        raise ValueError(f"Backend penyimpanan tidak dikenal: {name}")
+    return name
+
+
+def rollup_dir(options):
+    return options.get('rollup_dir', rollup.ROLLUP_DIR)
+
+
+def open_raw_sink(options, data_file=csv_log.DATA_FILE):
+    name = backend_name(options)
+    if name == 'columnar':
+        return columnar.ColumnarSink(options.get('store_dir', columnar.STORE_DIR))
+    if name == 'sqlite':
+        return sqlite_store.SqliteSink(options.get('sqlite_file', sqlite_store.DB_FILE))
+    return csv_log.CsvSink(data_file)
+
+
+def open_sink(options, data_file=csv_log.DATA_FILE):
+    """Sink data mentah + pembaruan rollup, untuk LogWriter."""
+    return rollup.RollupSink(open_raw_sink(options, data_file), rollup_dir(options))
+
+
+def open_raw_reader(options, data_file=csv_log.DATA_FILE):
+    name = backend_name(options)
+    if name == 'columnar':
+        return columnar.ColumnarReader(options.get('store_dir', columnar.STORE_DIR))
+    if name == 'sqlite':
+        return sqlite_store.SqliteReader(options.get('sqlite_file', sqlite_store.DB_FILE))
+    return csv_log.CsvReader(data_file)
+
+
+def open_reader(options, data_file=csv_log.DATA_FILE, cached=False):
+    """Pembaca untuk tab-tab riwayat (dipakai lewat storage.query.query()): read_block()
+    dan read_frame() sama untuk semua backend, ditambah tier rollup. cached=True menaruh
+    DataStore (cache memori bersama, budget cache_mb) di depan pembaca data mentah."""
+    rollups = rollup.RollupReader(rollup_dir(options))
+    raw = open_raw_reader(options, data_file)
+    if cached:
+        raw = cache.DataStore(raw, rollups, options.get('cache_mb', cache.DEFAULT_CACHE_MB))
+    return rollup.TieredReader(raw, rollups)
+
+
+def open_log_writer(options, data_file=csv_log.DATA_FILE):
+    return LogWriter.from_settings(open_sink(options, data_file), options)
+
+
+def prepare_storage(options, data_file=csv_log.DATA_FILE, log=print):
+    """Dipanggil sekali saat start, sebelum LogWriter dibuka: impor CSV lama ke backend
+    baru, bangun rollup yang belum ada/rusak, lalu terapkan retensi data mentah."""
+    rows = import_legacy_csv(options, data_file, log)
+    raw = open_raw_reader(options, data_file)
+    if rollup.needs_rebuild(rollup_dir(options)) and raw.systems():
+        if backend_name(options) == 'csv':
+            blocks = csv_log.read_blocks(data_file)
+        else:
+            blocks = rollup.raw_blocks(raw)
+        count = rollup.rebuild(blocks, rollup_dir(options))
+        log(f"Rollup dibangun ulang dari {count} baris data mentah.")
+    apply_retention(options, data_file, log)
+    return rows
+
+
+def import_legacy_csv(options, data_file=csv_log.DATA_FILE, log=print):
+    """Saat backend kolumnar/SQLite dipakai pertama kali (masih kosong), isi CSV log
+    lama diimpor sekali. CSV tidak dihapus. Mengembalikan jumlah baris yang diimpor."""
+    name = backend_name(options)
+    if name == 'csv' or not os.path.exists(data_file) or open_raw_reader(options, data_file).systems():
+        return 0
+    sink = open_sink(options, data_file)
+    rows = 0
+    try:
+        for system_id, block in csv_log.read_blocks(data_file):
+            sink.write([(system_id, block)])
+            rows += len(block['timestamp'])
+    finally:
+        sink.close()
+    log(f"{rows} baris dari {data_file} diimpor ke penyimpanan '{name}'.")
+    return rows
+
+
+def apply_retention(options, data_file=csv_log.DATA_FILE, log=print):
+    """Menghapus data mentah sebelum (hari ini - raw_retention_days), rollup tidak disentuh.
+
+    Kolumnar: direktori partisi hari dihapus. SQLite: DELETE berindeks per sistem.
+    Hanya hari yang sudah lewat yang dihapus, jadi aman selagi penulis berjalan.
+    Backend CSV tidak didukung (file harus ditulis ulang selagi penulis membukanya).
+    """
+    days = options.get('raw_retention_days')
+    if not days or days <= 0:
+        return 0
+    cutoff = datetime.combine(datetime.now().date() - timedelta(days=int(days)), datetime.min.time())
+    name = backend_name(options)
+    if name == 'csv':
+        log("Retensi data mentah tidak didukung backend 'csv'; gunakan 'columnar' atau 'sqlite'.")
+        return 0
+    archive_dir = options.get('archive_dir', archive.ARCHIVE_DIR)
+    if archive_dir:
+        archived = archive_before(open_raw_reader(options, data_file), cutoff, archive_dir)
+        if archived:
+            log(f"Arsip: {archived} baris data mentah sebelum {cutoff:%Y-%m-%d} disimpan di {archive_dir}.")
+    removed = 0
+    if name == 'columnar':
+        reader = columnar.ColumnarReader(options.get('store_dir', columnar.STORE_DIR))
+        for system_id in reader.systems():
+            for day in reader.partitions(system_id, end=cutoff):
+                shutil.rmtree(os.path.join(reader.root, system_id, day), ignore_errors=True)
+                removed += 1
+        unit = "partisi hari"
+    else:
+        removed = sqlite_store.delete_before(options.get('sqlite_file', sqlite_store.DB_FILE), cutoff)
+        unit = "baris"
+    if removed:
+        log(f"Retensi: {removed} {unit} data mentah sebelum {cutoff:%Y-%m-%d} dihapus (rollup disimpan).")
+    return removed
+
+
+def archive_before(reader, cutoff, root=archive.ARCHIVE_DIR):
+    """Menyalin data mentah sebelum cutoff ke arsip, satu file per sistem per hari.
+    Hari yang sama ditimpa utuh, jadi aman diulang bila proses terhenti sebelum hapus."""
+    rows = 0
+    for system_id in reader.systems():
+        timestamps = reader.read_frame(systems=[system_id], columns=[], end=cutoff)['timestamp']
+        for day in np.unique(timestamps.to_numpy().astype('datetime64[D]')):
+            start = pd.Timestamp(day)
+            df = reader.read_frame(systems=[system_id], start=start, end=start + pd.Timedelta(days=1))
+            if df.empty:
+                continue
+            block = {'timestamp': df['timestamp'].to_numpy().astype('datetime64[ms]')}
+            for name in NUMERIC_FIELDS:
+                block[name] = df[name].to_numpy()
+            block['source_name'] = df['source_name'].astype(str).to_numpy(dtype=str)
+            rows += archive.archive_blocks([(system_id, block)], root, merge=False)
+    return rows
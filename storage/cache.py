@@ -0,0 +1,235 @@
+# file: storage/cache.py
+
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from sample_block import NUMERIC_FIELDS
+from storage.csv_log import HEADER, empty_frame
+
+DEFAULT_CACHE_MB = 256
+_ONE_DAY = np.timedelta64(1, 'D')
+
+
+class DataStore:
+    """Cache data mentah bersama di memori, dipakai semua tab lewat read_block() dan read_frame().
+
+    Data disimpan per partisi (system_id, hari) sebagai array bertipe: timestamp
+    datetime64[ms], numerik float32, source_name kategori. Partisi dimuat saat pertama
+    dibutuhkan; daftar hari yang berisi data diambil dari tier rollup 1d (tanpa membaca
+    data mentah). Partisi hari terbaru setiap sistem ("live") diperbarui secara inkremental:
+    refresh() hanya membaca baris setelah timestamp terakhir yang sudah ada di memori,
+    jadi biayanya sebanding dengan data baru, bukan seluruh riwayat. Baris yang ditulis
+    terlambat dengan timestamp lebih lama dari itu baru terlihat setelah partisinya dimuat ulang.
+
+    Jika total ukuran partisi melebihi budget_mb, partisi yang paling lama tidak dipakai
+    dibuang (partisi yang sedang dipakai query berjalan tidak ikut dibuang).
+    Aman dipakai dari beberapa thread (satu kunci untuk semua operasi).
+    """
+    def __init__(self, reader, rollups, budget_mb=DEFAULT_CACHE_MB):
+        self.reader = reader      # pembaca data mentah (storage.backends.open_raw_reader)
+        self.rollups = rollups    # storage.rollup.RollupReader, sumber daftar hari
+        self.budget = int(budget_mb * 1024 * 1024)
+        self._partitions = OrderedDict()  # {(system_id, hari): blok}, urutan = LRU
+        self._bytes = 0
+        self._live = {}  # {system_id: hari partisi terbaru yang ada di cache}
+        self._lock = threading.RLock()
+        self.counters = {'hits': 0, 'loads': 0, 'evictions': 0, 'refreshed_rows': 0}
+
+    # ---------------- antarmuka pembaca ----------------
+    def systems(self):
+        return self.reader.systems()
+
+    def read_block(self, system_id, columns=None, start=None, end=None, tail=None):
+        """Blok satu sistem (timestamp + columns atau semua kolom), urut menurut waktu.
+        Hanya partisi hari yang beririsan dengan [start, end) yang disentuh."""
+        names = _names(columns)
+        with self._lock:
+            self.refresh()
+            start64 = None if start is None else pd.Timestamp(start).to_datetime64().astype('datetime64[ms]')
+            end64 = None if end is None else pd.Timestamp(end).to_datetime64().astype('datetime64[ms]')
+            days = self._days(system_id, start64, end64)
+            if days is None:
+                # belum ada rollup untuk sistem ini: baca langsung tanpa cache
+                return self.reader.read_block(system_id, columns, start, end, tail)
+            parts, used, rows = [], set(), 0
+            for day in (reversed(days) if tail is not None else days):
+                block = _slice(self._partition(system_id, day), start64, end64)
+                used.add((system_id, day))
+                if len(block['timestamp']):
+                    parts.append(block)
+                    rows += len(block['timestamp'])
+                if tail is not None and rows >= tail:
+                    break
+            self._evict(keep=used)
+        if tail is not None:
+            parts.reverse()
+        result = {'timestamp': _join([part['timestamp'] for part in parts], 'datetime64[ms]')}
+        for name in names:
+            if name == 'source_name':
+                result[name] = _join([np.asarray(part[name], dtype=str) for part in parts], str)
+            else:
+                result[name] = _join([part[name] for part in parts], np.float32)
+        if tail is not None:
+            result = {name: values[-tail:] for name, values in result.items()}
+        return result
+
+    def read_frame(self, systems=None, columns=None, start=None, end=None, tail=None):
+        parts = []
+        for system_id in (self.systems() if systems is None else systems):
+            block = self.read_block(system_id, columns, start, end, tail)
+            if len(block['timestamp']):
+                parts.append(_to_frame(system_id, block))
+        if not parts:
+            return empty_frame(columns)
+        df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        df = df.sort_values('timestamp', kind='stable', ignore_index=True)
+        if tail is not None:
+            df = df.tail(tail).reset_index(drop=True)
+        df['system_id'] = df['system_id'].astype('category')
+        return df
+
+    def refresh(self):
+        """Menambahkan baris baru ke partisi live setiap sistem."""
+        with self._lock:
+            for system_id, day in list(self._live.items()):
+                block = self._partitions.get((system_id, day))
+                if block is None:
+                    del self._live[system_id]
+                    continue
+                ts = block['timestamp']
+                watermark = ts[-1] if len(ts) else np.datetime64(day, 'ms')
+                # baris bertimestamp sama dengan watermark yang sudah ada dilewati
+                already = int(len(ts) - np.searchsorted(ts, watermark, 'left'))
+                fresh = self.reader.read_block(system_id, None, pd.Timestamp(watermark), None)
+                if len(fresh['timestamp']) <= already:
+                    continue
+                new = _typed({name: values[already:] for name, values in fresh.items()})
+                self.counters['refreshed_rows'] += len(new['timestamp'])
+                new_days = new['timestamp'].astype('datetime64[D]')
+                for new_day in np.unique(new_days):
+                    rows = {name: values[new_days == new_day] for name, values in new.items()}
+                    key = (system_id, str(new_day))
+                    if key in self._partitions:
+                        self._store(key, _concat(self._partitions[key], rows))
+                    else:
+                        self._store(key, rows)  # hari baru: partisi lengkap sejak awal hari
+                    self._live[system_id] = max(self._live[system_id], key[1])
+
+    def memory_usage(self):
+        with self._lock:
+            return {'bytes': self._bytes, 'budget': self.budget, 'partitions': len(self._partitions)}
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._live.clear()
+            self._bytes = 0
+
+    # ---------------- internal ----------------
+    def _days(self, system_id, start64, end64):
+        days = self.rollups.days(system_id)
+        if not days:
+            return None
+        days = set(days) | {day for system, day in self._partitions if system == system_id}
+        if start64 is not None:
+            days = {day for day in days if np.datetime64(day) + _ONE_DAY > start64}
+        if end64 is not None:
+            days = {day for day in days if np.datetime64(day, 'ms') < end64}
+        return sorted(days)
+
+    def _partition(self, system_id, day):
+        key = (system_id, day)
+        block = self._partitions.get(key)
+        if block is not None:
+            self._partitions.move_to_end(key)
+            self.counters['hits'] += 1
+            return block
+        start = pd.Timestamp(day)
+        block = _typed(self.reader.read_block(system_id, None, start, start + pd.Timedelta(days=1)))
+        self.counters['loads'] += 1
+        self._store(key, block)
+        if day >= max(self.rollups.days(system_id), default=day):
+            self._live[system_id] = day  # hari terbaru: diperbarui oleh refresh()
+        return block
+
+    def _store(self, key, block):
+        old = self._partitions.pop(key, None)
+        if old is not None:
+            self._bytes -= _nbytes(old)
+        for values in block.values():
+            if isinstance(values, np.ndarray):
+                values.flags.writeable = False  # read_block() bisa mengembalikan view ke cache
+        self._partitions[key] = block
+        self._bytes += _nbytes(block)
+
+    def _evict(self, keep=()):
+        for key in list(self._partitions):
+            if self._bytes <= self.budget:
+                break
+            if key in keep:
+                continue
+            self._bytes -= _nbytes(self._partitions.pop(key))
+            self.counters['evictions'] += 1
+            if self._live.get(key[0]) == key[1]:
+                del self._live[key[0]]
+
+
+def _nbytes(block):
+    return sum(values.nbytes if isinstance(values, np.ndarray) else values.codes.nbytes
+               for values in block.values())
+
+
+def _typed(raw):
+    """Blok dari pembaca mentah (read_block) -> blok cache bertipe, urut menurut waktu."""
+    block = {'timestamp': np.asarray(raw['timestamp'], dtype='datetime64[ms]')}
+    for name in NUMERIC_FIELDS:
+        block[name] = np.asarray(raw[name], dtype=np.float32)
+    block['source_name'] = pd.Categorical(raw['source_name'])
+    if np.any(block['timestamp'][1:] < block['timestamp'][:-1]):
+        order = np.argsort(block['timestamp'], kind='stable')
+        block = {name: values[order] for name, values in block.items()}
+    return block
+
+
+def _concat(block, rows):
+    merged = {}
+    for name, values in block.items():
+        if name == 'source_name':
+            merged[name] = pd.Categorical(np.concatenate([np.asarray(values, dtype=str), np.asarray(rows[name], dtype=str)]))
+        else:
+            merged[name] = np.concatenate([values, rows[name]])
+    if len(block['timestamp']) and len(rows['timestamp']) and rows['timestamp'][0] < block['timestamp'][-1]:
+        order = np.argsort(merged['timestamp'], kind='stable')
+        merged = {name: values[order] for name, values in merged.items()}
+    return merged
+
+
+def _slice(block, start64, end64):
+    ts = block['timestamp']
+    low = 0 if start64 is None else int(np.searchsorted(ts, start64, 'left'))
+    high = len(ts) if end64 is None else int(np.searchsorted(ts, end64, 'left'))
+    if low == 0 and high == len(ts):
+        return block
+    return {name: values[low:high] for name, values in block.items()}
+
+
+def _names(columns):
+    names = list(HEADER[2:] if columns is None else columns)
+    unknown = [name for name in names if name not in HEADER[2:]]
+    if unknown:
+        raise ValueError(f"Kolom tidak dikenal: {', '.join(unknown)}")
+    return names
+
+
+def _join(arrays, dtype):
+    if not arrays:
+        return np.empty(0, dtype=dtype)
+    return arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+
+
+def _to_frame(system_id, block):
+    data = {'system_id': np.full(len(block['timestamp']), system_id),
+            'timestamp': block['timestamp'].astype('datetime64[ns]')}
+    data.update((name, values) for name, values in block.items() if name != 'timestamp')
+    return pd.DataFrame(data)
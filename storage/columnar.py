@@ -0,0 +1,292 @@
+# file: storage/columnar.py
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from sample_block import NUMERIC_FIELDS
+from storage.csv_log import HEADER, empty_frame
+
+# Penyimpanan kolumnar, dipartisi per sistem dan per hari:
+#   <root>/<system_id>/<YYYY-MM-DD>/<kolom>.bin
+# Satu file per kolom berisi nilai mentah bertipe tetap (little-endian), tanpa header,
+# sehingga bisa dibaca langsung dengan np.memmap dan hanya kolom yang diminta yang disentuh.
+#   timestamp   -> int64, epoch milidetik (waktu lokal, sama seperti di CSV)
+#   pengukuran  -> float32
+#   source_name -> uint16, kode kategori (kamus di <root>/sources.json)
+# system_id tidak disimpan per baris: sudah tersirat dari direktori partisi.
+STORE_DIR = "datastore"
+SOURCES_FILE = "sources.json"
+UNSORTED_MARKER = "unsorted"  # ada jika timestamp di partisi tidak naik monoton
+
+COLUMN_DTYPES = {'timestamp': np.dtype('<i8'), 'source_name': np.dtype('<u2')}
+COLUMN_DTYPES.update({name: np.dtype('<f4') for name in NUMERIC_FIELDS})
+COLUMNS = tuple(name for name in HEADER if name != 'system_id')
+
+
+def _column_path(partition, name):
+    return os.path.join(partition, name + ".bin")
+
+
+def _row_count(partition, names):
+    """Jumlah baris lengkap: kolom yang ditulis paling sedikit yang menentukan
+    (commit yang terpotong di tengah tidak menghasilkan baris setengah jadi)."""
+    counts = []
+    for name in names:
+        try:
+            counts.append(os.path.getsize(_column_path(partition, name)) // COLUMN_DTYPES[name].itemsize)
+        except OSError:
+            counts.append(0)
+    return min(counts) if counts else 0
+
+
+def _to_epoch_ms(value):
+    return None if value is None else pd.Timestamp(value).to_datetime64().astype('datetime64[ms]').astype(np.int64)
+
+
+class SourceDictionary:
+    """Kamus kategori source_name <-> kode uint16. Hanya bertambah, disimpan di sources.json."""
+    def __init__(self, root):
+        self.path = os.path.join(root, SOURCES_FILE)
+        self.names = []
+        self.reload()
+
+    def reload(self):
+        try:
+            with open(self.path, 'r') as f:
+                self.names = json.load(f)
+        except (OSError, ValueError):
+            self.names = []
+        self._codes = {name: code for code, name in enumerate(self.names)}
+
+    def encode(self, names):
+        """Array nama -> array kode (nama baru ditambahkan ke kamus)."""
+        unique, inverse = np.unique(np.asarray(names, dtype=str), return_inverse=True)
+        added = [name for name in unique.tolist() if name not in self._codes]
+        if added:
+            for name in added:
+                self._codes[name] = len(self.names)
+                self.names.append(name)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump(self.names, f)
+            os.replace(tmp, self.path)
+        lookup = np.array([self._codes[name] for name in unique.tolist()], dtype=np.uint16)
+        return lookup[inverse.reshape(-1)]
+
+    def decode(self, codes):
+        if len(codes) and int(codes.max()) >= len(self.names):
+            self.reload()  # kategori baru dari penulis di proses lain
+        table = np.array(self.names + ['Unknown'], dtype=str)
+        return table[np.minimum(codes, len(self.names))]
+
+
+class ColumnarSink:
+    """Sink LogWriter untuk penyimpanan kolumnar. File partisi hari berjalan tetap terbuka.
+    Commit yang gagal di tengah jalan (sebagian sistem/kolom sudah tertulis) dipangkas
+    saat partisi dibuka ulang, ke jumlah baris commit terakhir yang berhasil."""
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.sources = SourceDictionary(root)
+        self._open = {}       # {system_id: (hari, direktori partisi, {kolom: file})}
+        self._last_ts = {}    # {system_id: timestamp terakhir yang ditulis}
+        self._committed = {}  # {direktori partisi: jumlah baris setelah commit berhasil}
+        self._torn = False    # write() terakhir berhenti di tengah jalan
+        self._trim = False    # write() ini mengulang commit yang gagal: pangkas saat membuka
+
+    def write(self, batches, fsync=False):
+        touched, written = set(), set()
+        self._trim, self._torn = self._torn, True
+        for system_id, block in batches:
+            ts = np.asarray(block['timestamp'], dtype='datetime64[ms]')
+            days = ts.astype('datetime64[D]')
+            for day in np.unique(days):
+                rows = days == day
+                partition, files = self._partition(system_id, str(day))
+                columns = {
+                    'timestamp': ts[rows].astype(np.int64),
+                    'source_name': self.sources.encode(block['source_name'][rows]),
+                }
+                for name in NUMERIC_FIELDS:
+                    columns[name] = block[name][rows]
+                self._check_order(system_id, partition, columns['timestamp'])
+                for name, f in files.items():
+                    f.write(np.ascontiguousarray(columns[name], dtype=COLUMN_DTYPES[name]).tobytes())
+                touched.add(system_id)
+                written.add(partition)
+        for system_id in touched:
+            for f in self._open[system_id][2].values():
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+        for partition in written:
+            self._committed[partition] = _row_count(partition, COLUMNS)
+        self._torn = False
+
+    def close(self):
+        error = None
+        for system_id in list(self._open):
+            try:
+                self._close_partition(system_id)
+            except OSError as e:
+                error = e
+        if error is not None:
+            raise error
+
+    def _check_order(self, system_id, partition, ts):
+        last = self._last_ts.get(system_id)
+        if (last is not None and len(ts) and ts[0] < last) or np.any(ts[1:] < ts[:-1]):
+            # jam mundur (mis. sinkronisasi NTP): pembaca harus memakai filter biasa
+            open(os.path.join(partition, UNSORTED_MARKER), 'a').close()
+        if len(ts):
+            self._last_ts[system_id] = ts[-1] if last is None else max(last, ts.max())
+
+    def _partition(self, system_id, day):
+        current = self._open.get(system_id)
+        if current is not None and current[0] == day:
+            return current[1], current[2]
+        if current is not None:
+            self._close_partition(system_id)  # pergantian hari
+        partition = os.path.join(self.root, system_id, day)
+        os.makedirs(partition, exist_ok=True)
+        # sisa commit yang terpotong (crash/disk penuh) dipangkas agar semua kolom sejajar;
+        # setelah commit gagal di proses ini, juga baris utuh yang belum ter-commit
+        rows = _row_count(partition, COLUMNS)
+        if self._trim:
+            rows = min(rows, self._committed.get(partition, rows))
+        self._committed[partition] = rows
+        for name in COLUMNS:
+            path = _column_path(partition, name)
+            if os.path.exists(path) and os.path.getsize(path) > rows * COLUMN_DTYPES[name].itemsize:
+                os.truncate(path, rows * COLUMN_DTYPES[name].itemsize)
+        files = {name: open(_column_path(partition, name), 'ab') for name in COLUMNS}
+        if rows:
+            self._last_ts[system_id] = int(np.fromfile(_column_path(partition, 'timestamp'),
+                                                       dtype=COLUMN_DTYPES['timestamp'],
+                                                       offset=(rows - 1) * 8)[0])
+        self._open[system_id] = (day, partition, files)
+        return partition, files
+
+    def _close_partition(self, system_id):
+        _, _, files = self._open.pop(system_id)
+        error = None
+        for f in files.values():
+            try:
+                f.close()
+            except OSError as e:  # flush ke disk penuh; file tetap dilepas
+                error = e
+        if error is not None:
+            raise error
+
+
+class ColumnarReader:
+    """Membaca hanya partisi (sistem, hari) dan kolom yang dibutuhkan sebuah query."""
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.sources = SourceDictionary(root)
+
+    def systems(self):
+        try:
+            return sorted(name for name in os.listdir(self.root)
+                          if os.path.isdir(os.path.join(self.root, name)))
+        except OSError:
+            return []
+
+    def partitions(self, system_id, start=None, end=None):
+        """Hari-hari (string YYYY-MM-DD) milik system_id yang beririsan dengan [start, end)."""
+        try:
+            days = sorted(os.listdir(os.path.join(self.root, system_id)))
+        except OSError:
+            return []
+        if start is not None:
+            first = str(pd.Timestamp(start).date())
+            days = [day for day in days if day >= first]
+        if end is not None:
+            last = str((pd.Timestamp(end) - pd.Timedelta(milliseconds=1)).date())
+            days = [day for day in days if day <= last]
+        return days
+
+    def read(self, systems=None, columns=None, start=None, end=None, tail=None):
+        """Blok kolumnar {'system_id', 'timestamp', kolom...} urut menurut waktu.
+
+        columns=None berarti semua kolom. tail membatasi ke baris terakhir saja
+        (partisi lama tidak dibuka bila partisi terbaru sudah mencukupi).
+        """
+        names = list(COLUMNS[1:] if columns is None else columns)
+        start_ms, end_ms = _to_epoch_ms(start), _to_epoch_ms(end)
+        parts = []
+        for system_id in (self.systems() if systems is None else systems):
+            days = self.partitions(system_id, start, end)
+            system_parts, count = [], 0
+            for day in (reversed(days) if tail is not None else days):
+                part = self._read_partition(os.path.join(self.root, system_id, day), names, start_ms, end_ms)
+                if part is None:
+                    continue
+                part['system_id'] = np.full(len(part['timestamp']), system_id)
+                system_parts.append(part)
+                count += len(part['timestamp'])
+                if tail is not None and count >= tail:
+                    break
+            if tail is not None:
+                system_parts.reverse()
+            parts.extend(system_parts)
+
+        if not parts:
+            block = {'system_id': np.empty(0, dtype=str), 'timestamp': np.empty(0, dtype='datetime64[ms]')}
+            for name in names:
+                block[name] = np.empty(0, dtype=str if name == 'source_name' else np.float32)
+            return block
+        block = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        if len(parts) > 1:
+            order = np.argsort(block['timestamp'], kind='stable')
+            block = {name: values[order] for name, values in block.items()}
+        if tail is not None:
+            block = {name: values[-tail:] for name, values in block.items()}
+        return block
+
+    def read_block(self, system_id, columns=None, start=None, end=None, tail=None):
+        """Blok satu sistem tanpa kolom system_id (numerik tetap float32 seperti di disk)."""
+        block = self.read([system_id], columns, start, end, tail)
+        del block['system_id']
+        return block
+
+    def read_frame(self, systems=None, columns=None, start=None, end=None, tail=None):
+        """Sama seperti read(), sebagai DataFrame dengan urutan kolom seperti CSV log."""
+        block = self.read(systems, columns, start, end, tail)
+        if not len(block['timestamp']):
+            return empty_frame(columns)
+        df = pd.DataFrame({name: block[name] for name in HEADER if name in block})
+        df['system_id'] = df['system_id'].astype('category')
+        df['timestamp'] = df['timestamp'].astype('datetime64[ns]')
+        return df
+
+    def _read_partition(self, partition, names, start_ms, end_ms):
+        rows = _row_count(partition, ['timestamp'] + names)
+        if not rows:
+            return None
+        ts = np.memmap(_column_path(partition, 'timestamp'), dtype=COLUMN_DTYPES['timestamp'], mode='r', shape=(rows,))
+        if os.path.exists(os.path.join(partition, UNSORTED_MARKER)):
+            selection = np.ones(rows, dtype=bool)
+            if start_ms is not None:
+                selection &= ts >= start_ms
+            if end_ms is not None:
+                selection &= ts < end_ms
+            if not selection.any():
+                return None
+        else:
+            # timestamp naik monoton: cukup dua pencarian biner, hanya beberapa halaman dibaca
+            low = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, 'left'))
+            high = rows if end_ms is None else int(np.searchsorted(ts, end_ms, 'left'))
+            if high <= low:
+                return None
+            selection = slice(low, high)
+
+        part = {'timestamp': np.array(ts[selection]).astype('datetime64[ms]')}
+        del ts
+        for name in names:
+            values = np.memmap(_column_path(partition, name), dtype=COLUMN_DTYPES[name], mode='r', shape=(rows,))
+            values = np.array(values[selection])
+            part[name] = self.sources.decode(values) if name == 'source_name' else values
+        return part
+
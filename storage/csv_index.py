@@ -0,0 +1,224 @@
+# file: storage/csv_index.py
+"""
+Indeks waktu sidecar untuk master_datalog.csv.
+
+    master_datalog.csv.idx       -> rekaman INDEX_DTYPE (bucket, kode sistem, byte awal, byte akhir)
+    master_datalog.csv.idx.json  -> daftar system_id (kode = posisi di list)
+
+Satu rekaman = rentang byte yang memuat semua baris satu sistem di satu bucket waktu
+(BUCKET_MS). Rekaman bucket yang masih berjalan diperbarui di tempat oleh CsvSink setiap
+commit, jadi byte akhir terbesar = bagian CSV yang sudah terindeks. Sisa file di
+belakangnya (ditulis program lain, atau commit yang terpotong) tetap dibaca pembaca dan
+diindeks penulis saat dibuka berikutnya.
+
+Membangun ulang secara offline:
+    python -m storage.csv_index master_datalog.csv
+"""
+
+import io
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+BUCKET_MS = 10 * 60 * 1000
+INDEX_SUFFIX = ".idx"
+SYSTEMS_SUFFIX = ".idx.json"
+INDEX_DTYPE = np.dtype([('bucket', '<i8'), ('system', '<u2'), ('start', '<i8'), ('end', '<i8')])
+SCAN_CHUNK_BYTES = 64 * 1024 * 1024
+MERGE_GAP_BYTES = 256 * 1024  # rentang yang berdekatan dibaca sekaligus
+
+
+def _timestamps_ms(values):
+    return np.asarray(values, dtype='datetime64[ms]').astype(np.int64)
+
+
+def line_bounds(data):
+    """Bytes berisi baris utuh -> (awal, akhir) tiap baris relatif terhadap data."""
+    ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n')) + 1
+    starts = np.concatenate(([0], ends[:-1]))
+    return starts, ends
+
+
+def parse_lines(data):
+    """(system_id, timestamp) tiap baris; baris yang tidak valid -> timestamp NaT."""
+    frame = pd.read_csv(io.BytesIO(data), header=None, usecols=[0, 1], names=['system_id', 'timestamp'],
+                        dtype=str, skip_blank_lines=False, keep_default_na=False)
+    ts = pd.to_datetime(frame['timestamp'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    return frame['system_id'].to_numpy(dtype=str), ts
+
+
+class CsvIndex:
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.path = csv_path + INDEX_SUFFIX
+        self.systems_path = csv_path + SYSTEMS_SUFFIX
+        self.systems = []
+        self._codes = {}
+        self._file = None
+        self._open = {}  # {kode sistem: (nomor rekaman, rekaman)} untuk bucket yang berjalan
+        self.rows = 0
+        self._load_systems()
+
+    # ---------------- baca ----------------
+    def _load_systems(self):
+        try:
+            with open(self.systems_path, 'r') as f:
+                self.systems = json.load(f)
+        except (OSError, ValueError):
+            self.systems = []
+        self._codes = {name: code for code, name in enumerate(self.systems)}
+
+    def records(self):
+        try:
+            return np.fromfile(self.path, dtype=INDEX_DTYPE,
+                               count=os.path.getsize(self.path) // INDEX_DTYPE.itemsize)
+        except OSError:
+            return np.empty(0, dtype=INDEX_DTYPE)
+
+    def spans(self, systems=None, start=None, end=None):
+        """([(byte awal, byte akhir)], byte terindeks terakhir) untuk query sistem & rentang."""
+        records = self.records()
+        self._load_systems()  # bisa berubah oleh penulis di proses lain atau rebuild()
+        indexed_end = int(records['end'].max()) if len(records) else 0
+        selection = np.ones(len(records), dtype=bool)
+        if systems is not None:
+            codes = [self._codes[name] for name in systems if name in self._codes]
+            selection &= np.isin(records['system'], codes)
+        if start is not None:
+            selection &= records['bucket'] + BUCKET_MS > _timestamps_ms(pd.Timestamp(start).to_datetime64())
+        if end is not None:
+            selection &= records['bucket'] < _timestamps_ms(pd.Timestamp(end).to_datetime64())
+        chosen = np.sort(records[selection], order='start')
+        merged = []
+        for low, high in zip(chosen['start'].tolist(), chosen['end'].tolist()):
+            if merged and low <= merged[-1][1] + MERGE_GAP_BYTES:
+                merged[-1][1] = max(merged[-1][1], high)
+            else:
+                merged.append([low, high])
+        return [tuple(span) for span in merged], indexed_end
+
+    # ---------------- tulis (dipakai CsvSink) ----------------
+    def open(self, csv_size):
+        """Membuka indeks untuk ditambah; bagian CSV yang belum terindeks diindeks dulu.
+        Rekaman yang menunjuk ke luar CSV (CSV dipangkas setelah commit gagal) dibuang
+        atau dipotong ke ukuran CSV."""
+        self._file = open(self.path, 'r+b' if os.path.exists(self.path) else 'w+b')
+        size = os.path.getsize(self.path)
+        self.rows = size // INDEX_DTYPE.itemsize
+        if size != self.rows * INDEX_DTYPE.itemsize:
+            self._file.truncate(self.rows * INDEX_DTYPE.itemsize)
+        self._open = {}
+        records = self.records()
+        if len(records) and records['end'].max() > csv_size:
+            # rekaman baru selalu ditambahkan di ujung, jadi yang mulai di luar CSV ada di ekor
+            keep = int(np.searchsorted(np.maximum.accumulate(records['start']), csv_size))
+            records = records[:keep]
+            records['end'] = np.minimum(records['end'], csv_size)
+            self._file.seek(0)
+            self._file.write(records.tobytes())
+            self._file.truncate(len(records) * INDEX_DTYPE.itemsize)
+            self._file.flush()
+            self.rows = len(records)
+        indexed_end = int(records['end'].max()) if len(records) else 0
+        if indexed_end < csv_size:
+            self.index_existing(max(indexed_end, self._header_end()), csv_size)
+
+    def add(self, system_id, timestamps, starts, ends):
+        """Baris-baris satu blok yang baru ditulis: timestamp + offset byte tiap baris."""
+        if not len(starts):
+            return
+        code = self._code(system_id)
+        buckets = _timestamps_ms(timestamps) // BUCKET_MS * BUCKET_MS
+        change = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        bounds = np.r_[change, len(buckets)]
+        for first, stop in zip(bounds[:-1], bounds[1:]):
+            bucket = int(buckets[first])
+            low = int(np.min(starts[first:stop]))
+            high = int(np.max(ends[first:stop]))
+            current = self._open.get(code)
+            if current is not None and current[1]['bucket'] == bucket:
+                index, record = current
+                record['start'] = min(int(record['start']), low)
+                record['end'] = max(int(record['end']), high)
+            else:
+                index, record = self.rows, np.zeros((), dtype=INDEX_DTYPE)
+                record['bucket'], record['system'], record['start'], record['end'] = bucket, code, low, high
+                self.rows += 1
+                self._open[code] = (index, record)
+            self._file.seek(index * INDEX_DTYPE.itemsize)
+            self._file.write(record.tobytes())
+
+    def flush(self, fsync=False):
+        if self._file is not None:
+            self._file.flush()
+            if fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._open = {}
+
+    def index_existing(self, begin, end):
+        """Mengindeks baris CSV di [begin, end) yang sudah ada di disk (per potongan besar)."""
+        with open(self.csv_path, 'rb') as csv_file:
+            position = begin
+            while position < end:
+                csv_file.seek(position)
+                data = csv_file.read(min(SCAN_CHUNK_BYTES, end - position))
+                complete = data.rfind(b'\n') + 1
+                if complete == 0:
+                    break  # baris terakhir belum utuh
+                data = data[:complete]
+                starts, ends = line_bounds(data)
+                system_ids, ts = parse_lines(data)
+                valid = ts.notna().to_numpy()
+                for system_id in np.unique(system_ids[valid]):
+                    rows = valid & (system_ids == system_id)
+                    self.add(str(system_id), ts[rows].to_numpy(), starts[rows] + position, ends[rows] + position)
+                position += complete
+
+    def _code(self, system_id):
+        code = self._codes.get(system_id)
+        if code is None:
+            code = self._codes[system_id] = len(self.systems)
+            self.systems.append(system_id)
+            tmp = self.systems_path + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump(self.systems, f)
+            os.replace(tmp, self.systems_path)
+        return code
+
+    def _header_end(self):
+        with open(self.csv_path, 'rb') as f:
+            return len(f.readline())
+
+
+def rebuild(csv_path):
+    """Membuang indeks lama lalu mengindeks seluruh CSV. Mengembalikan jumlah rekaman."""
+    for suffix in (INDEX_SUFFIX, SYSTEMS_SUFFIX):
+        try:
+            os.remove(csv_path + suffix)
+        except OSError:
+            pass
+    index = CsvIndex(csv_path)
+    index.open(os.path.getsize(csv_path))
+    index.close()
+    return index.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Membangun ulang indeks waktu CSV log LISIDA")
+    parser.add_argument('csv_file', nargs='?', default="master_datalog.csv")
+    args = parser.parse_args(argv)
+    rows = rebuild(args.csv_file)
+    print(f"{rows} rekaman indeks ditulis ke {args.csv_file}{INDEX_SUFFIX}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# file: storage/csv_log.py
+
+import io
+import os
+import csv
+import numpy as np
+import pandas as pd
+import sample_block
+from storage.csv_index import CsvIndex, line_bounds
+
+DATA_FILE = "master_datalog.csv"
+HEADER = [
+    'system_id', 'timestamp', 'temperature', 'humidity', 'moisture', 'ph', 'ec',
+    'nitrogen', 'phosphorus', 'potassium', 'source_name', 'energy', 'cps', 'activity'
+]
+
+
+def format_rows(system_id, block):
+    """Blok sampel -> baris-baris CSV (urutan kolom sesuai HEADER)."""
+    count = sample_block.length(block)
+    columns = [[system_id] * count, sample_block.format_timestamps(block['timestamp']).tolist()]
+    columns += [block[key].tolist() for key in HEADER[2:]]
+    return zip(*columns)
+
+
+def empty_frame(columns=None):
+    """DataFrame kosong dengan kolom log (timestamp tetap bertipe datetime)."""
+    names = HEADER if columns is None else ['system_id', 'timestamp'] + list(columns)
+    df = pd.DataFrame({name: pd.Series(dtype=object) for name in names})
+    df['timestamp'] = pd.Series(dtype='datetime64[ns]')
+    return df
+
+
+def filter_frame(df, systems=None, start=None, end=None, tail=None):
+    """Filter umum untuk hasil baca log: sistem, rentang [start, end), dan tail baris terakhir."""
+    if systems is not None:
+        df = df[df['system_id'].isin(list(systems))]
+    if start is not None:
+        df = df[df['timestamp'] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df['timestamp'] < pd.Timestamp(end)]
+    if tail is not None:
+        df = df.tail(tail)
+    return df
+
+
+def frame_block(df, columns=None):
+    """Hasil read_frame() satu sistem -> blok {'timestamp', kolom...}: numerik float64,
+    source_name array string (lihat sample_block)."""
+    block = {'timestamp': df['timestamp'].to_numpy().astype('datetime64[ms]')}
+    for name in (HEADER[2:] if columns is None else columns):
+        if name == 'source_name':
+            block[name] = df[name].fillna('Unknown').astype(str).to_numpy(dtype=str)
+        else:
+            block[name] = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64)
+    return block
+
+
+def _render(rows):
+    text = io.StringIO()
+    csv.writer(text).writerows(rows)
+    return text.getvalue().encode()
+
+
+class CsvSink:
+    """Sink LogWriter untuk master_datalog.csv (file dibiarkan terbuka di antara commit).
+    Offset byte setiap baris dicatat ke indeks waktu sidecar (storage/csv_index.py).
+    Commit yang gagal di tengah jalan dipangkas saat file dibuka ulang (ukuran file
+    kembali ke akhir commit terakhir yang berhasil), jadi LogWriter aman mengulangnya."""
+    def __init__(self, path=DATA_FILE):
+        self.path = path
+        self._file = None
+        self._committed = None  # ukuran file setelah commit terakhir yang berhasil
+        self._torn = False      # write() terakhir berhenti di tengah jalan
+        self.index = CsvIndex(path)
+
+    def write(self, batches, fsync=False):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+            if self._torn and self._file.tell() > self._committed:
+                self._file.truncate(self._committed)
+                self._file.seek(0, os.SEEK_END)
+            if self._file.tell() == 0:
+                self._file.write(_render([HEADER]))
+                self._file.flush()
+            self.index.open(self._file.tell())
+            self._committed = self._file.tell()
+        self._torn = True
+        for system_id, block in batches:
+            data = _render(format_rows(system_id, block))
+            base = self._file.tell()
+            self._file.write(data)
+            starts, ends = line_bounds(data)
+            self.index.add(system_id, block['timestamp'], starts + base, ends + base)
+        # CSV selalu sampai di disk lebih dulu daripada indeks yang menunjuk ke sana
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+        self.index.flush(fsync)
+        self._committed = self._file.tell()
+        self._torn = False
+
+    def close(self):
+        try:
+            if self._file is not None:
+                self._file.close()
+        finally:
+            self._file = None  # close() yang gagal (flush ke disk penuh) tetap melepas file
+            self.index.close()
+
+
+class CsvReader:
+    """Pembaca master_datalog.csv. Query dengan rentang waktu hanya membaca potongan
+    byte yang ditunjuk indeks sidecar (plus ekor file yang belum terindeks)."""
+    def __init__(self, path=DATA_FILE):
+        self.path = path
+        self.index = CsvIndex(path)
+
+    def systems(self):
+        try:
+            return sorted(pd.read_csv(self.path, usecols=['system_id'])['system_id'].dropna().astype(str).unique())
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            return []
+
+    def read_frame(self, systems=None, columns=None, start=None, end=None, tail=None):
+        """Baris log sebagai DataFrame (kolom system_id, timestamp + columns atau semua)."""
+        usecols = None if columns is None else ['system_id', 'timestamp'] + list(columns)
+        try:
+            if start is None and end is None:
+                df = pd.read_csv(self.path, parse_dates=['timestamp'], usecols=usecols)
+            else:
+                df = pd.read_csv(io.BytesIO(self._read_window(systems, start, end)),
+                                 parse_dates=['timestamp'], usecols=usecols)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            return empty_frame(columns)
+        if usecols is not None:
+            df = df[usecols]
+        return filter_frame(df, systems, start, end, tail)
+
+    def read_block(self, system_id, columns=None, start=None, end=None, tail=None):
+        return frame_block(self.read_frame([system_id], columns, start, end, tail), columns)
+
+    def _read_window(self, systems, start, end):
+        """Header CSV + semua baris yang mungkin masuk jendela query, sebagai bytes."""
+        spans, indexed_end = self.index.spans(systems, start, end)
+        with open(self.path, 'rb') as f:
+            parts = [f.readline()]
+            indexed_end = max(indexed_end, f.tell())
+            for low, high in spans:
+                f.seek(low)
+                parts.append(f.read(high - low))
+            f.seek(0, os.SEEK_END)
+            if f.tell() > indexed_end:
+                f.seek(indexed_end)
+                tail = f.read()
+                parts.append(tail[:tail.rfind(b'\n') + 1])
+        return b''.join(parts)
+
+
+def read_blocks(path, chunksize=100000):
+    """Membaca CSV log per potongan -> (system_id, blok), untuk impor ke backend lain."""
+    numeric = [name for name in HEADER[2:] if name != 'source_name']
+    for chunk in pd.read_csv(path, parse_dates=['timestamp'], chunksize=chunksize):
+        chunk = chunk.dropna(subset=['system_id', 'timestamp'])
+        for system_id, rows in chunk.groupby('system_id', sort=False):
+            block = {'timestamp': rows['timestamp'].to_numpy().astype('datetime64[ms]')}
+            for name in numeric:
+                block[name] = pd.to_numeric(rows[name], errors='coerce').to_numpy(dtype=np.float64)
+            block['source_name'] = rows['source_name'].fillna('Unknown').astype(str).to_numpy(dtype=str)
+            yield str(system_id), block
@@ -0,0 +1,125 @@
+# file: storage/query.py
+"""
+Satu pintu query data log untuk semua tab:
+
+    result = query(store, systems, parameters, start, end, max_points)
+    for system_id, block in result.series.items():
+        block['timestamp']   # datetime64[ms]
+        block['ph']          # array NumPy bersebelahan
+
+Proyeksi kolom dan rentang [start, end) diteruskan ke pembaca penyimpanan (read_block),
+jadi query hanya membayar kolom dan baris yang ditampilkan: kolumnar membuka file kolom
+yang diminta saja, SQLite memakai indeks (system_id, timestamp), CSV memakai indeks
+sidecar, dan DataStore hanya mengiris partisi hari yang beririsan.
+
+max_points (mis. lebar plot dalam piksel) mengizinkan tier rollup untuk rentang panjang;
+blok tier berisi <param> (mean) plus <param>_min/_max/_count/_last. result.tier berisi
+'raw' atau '1m'/'1h'/'1d'.
+"""
+
+import numpy as np
+import pandas as pd
+from sample_block import NUMERIC_FIELDS
+from storage.csv_log import HEADER
+from storage.rollup import TIERS
+
+COLUMNS = tuple(HEADER[2:])  # parameter yang bisa diminta (system_id & timestamp selalu ikut)
+
+
+class QueryResult:
+    def __init__(self, series, parameters, tier='raw'):
+        self.series = series          # {system_id: blok}, hanya sistem yang punya data
+        self.parameters = parameters  # kolom yang diminta, urutan dipertahankan
+        self.tier = tier
+
+    @property
+    def empty(self):
+        return not self.series
+
+    def rows(self):
+        return sum(len(block['timestamp']) for block in self.series.values())
+
+    def merged(self, tail=None):
+        """Semua sistem dalam satu blok urut waktu, ditambah kolom 'system_id'."""
+        blocks = list(self.series.items())
+        if not blocks:
+            block = {'system_id': np.empty(0, dtype=str), 'timestamp': np.empty(0, dtype='datetime64[ms]')}
+            block.update((name, np.empty(0, dtype=str if name == 'source_name' else np.float64))
+                         for name in self.parameters)
+            return block
+        merged = {'system_id': np.concatenate([np.full(len(block['timestamp']), system_id)
+                                               for system_id, block in blocks])}
+        for name in blocks[0][1]:
+            merged[name] = np.concatenate([block[name] for _, block in blocks])
+        if len(blocks) > 1:
+            order = np.argsort(merged['timestamp'], kind='stable')
+            merged = {name: values[order] for name, values in merged.items()}
+        if tail is not None:
+            merged = {name: values[-tail:] for name, values in merged.items()}
+        return merged
+
+    def frame(self, tail=None):
+        """merged() sebagai DataFrame dengan urutan kolom seperti CSV log (untuk ekspor)."""
+        merged = self.merged(tail)
+        # timestamp ns seperti read_frame() (to_csv tidak menulis pecahan detik nol)
+        merged['timestamp'] = merged['timestamp'].astype('datetime64[ns]')
+        return pd.DataFrame({name: merged[name] for name in HEADER if name in merged})
+
+
+def query(store, systems=None, parameters=None, start=None, end=None, max_points=None,
+          tail=None, calibration_history=None):
+    """Data log per sistem untuk [start, end). store adalah TieredReader dari
+    storage.backends.open_reader(). parameters=None berarti semua kolom. Dengan max_points,
+    tier rollup dipakai bila data mentah rentang itu lebih dari max_points titik per sistem.
+    tail membatasi ke baris terakhir per sistem (hanya untuk data mentah)."""
+    names = list(COLUMNS if parameters is None else parameters)
+    unknown = [name for name in names if name not in COLUMNS]
+    if unknown:
+        raise ValueError(f"Parameter tidak dikenal: {', '.join(unknown)}")
+    systems = store.systems() if systems is None else list(systems)
+
+    tier = None
+    if max_points is not None:
+        tier = store.rollups.choose_tier(systems, start, end, max(1, int(max_points)))
+    series = {}
+    if tier is None:
+        for system_id in systems:
+            block = store.read_block(system_id, names, start, end, tail)
+            if len(block['timestamp']):
+                series[system_id] = block
+        if not series and max_points is not None:
+            # data mentah rentang ini sudah dipangkas retensi: pakai tier terhalus
+            tier = TIERS[0][0]
+    if tier is not None:
+        numeric = [name for name in names if name in NUMERIC_FIELDS]
+        for system_id in systems:
+            block = store.rollups.read_block(tier, system_id, numeric, start, end)
+            if len(block['timestamp']):
+                series[system_id] = block
+
+    if calibration_history is not None:
+        series = {system_id: _calibrate(calibration_history, block, names, tier)
+                  for system_id, block in series.items()}
+    return QueryResult(series, names, tier or 'raw')
+
+
+def _calibrate(calibration_history, block, names, tier):
+    """Kalibrasi hanya kolom yang diminta; tipe kolom dipertahankan (mis. float32).
+    Statistik rollup (mean/min/max/last) dikalibrasi seperti nilai biasa memakai versi yang
+    berlaku di awal bucket. Untuk model non-linear mean hasilnya pendekatan; min/max ditukar
+    bila kalibrasi membalik arah (m < 0)."""
+    numeric = [name for name in names if name in NUMERIC_FIELDS]
+    if not numeric:
+        return block
+    calibrated = dict(block)
+    stats = ('',) if tier is None else ('', '_min', '_max', '_last')
+    for suffix in stats:
+        columns = {name: block[name + suffix] for name in numeric}
+        result = calibration_history.apply(dict(columns, timestamp=block['timestamp']))
+        for name in numeric:
+            calibrated[name + suffix] = np.ascontiguousarray(result[name], dtype=columns[name].dtype)
+    if tier is not None:
+        for name in numeric:
+            low, high = calibrated[f'{name}_min'], calibrated[f'{name}_max']
+            calibrated[f'{name}_min'], calibrated[f'{name}_max'] = np.fmin(low, high), np.fmax(low, high)
+    return calibrated
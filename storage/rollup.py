@@ -0,0 +1,378 @@
+# file: storage/rollup.py
+
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from sample_block import NUMERIC_FIELDS
+
+# Agregat berjenjang yang diperbarui setiap group commit (bukan dihitung saat query):
+#   <root>/<tier>/<system_id>.bin  -> array rekaman RECORD_DTYPE urut menurut bucket
+# Per parameter disimpan count (sampel non-NaN), min, max, mean dan last dari nilai MENTAH.
+# Bucket = awal interval dalam epoch milidetik waktu lokal (tier 1d mulai tengah malam lokal).
+# Rekaman terakhir biasanya bucket yang masih berjalan dan ditimpa di tempat saat sampel
+# berikutnya masuk, jadi pembaca selalu melihat agregat sampai commit terakhir.
+ROLLUP_DIR = "rollups"
+TIERS = (('1m', 60 * 1000), ('1h', 60 * 60 * 1000), ('1d', 24 * 60 * 60 * 1000))
+TIER_WIDTH = dict(TIERS)
+STATS = ('count', 'min', 'max', 'mean', 'last')
+UNSORTED_SUFFIX = ".unsorted"   # ada jika bucket di file tidak lagi naik monoton
+REBUILD_MARKER = "rebuild"      # ada jika penulisan rollup pernah gagal -> dibangun ulang saat start
+REBUILD_STAGING = ".rebuild"    # direktori kerja rebuild() sebelum menggantikan tier
+
+_STAT_DTYPES = {'count': '<i4', 'min': '<f4', 'max': '<f4', 'mean': '<f8', 'last': '<f4'}
+RECORD_DTYPE = np.dtype([('bucket', '<i8')] + [(f'{name}_{stat}', _STAT_DTYPES[stat])
+                                                for name in NUMERIC_FIELDS for stat in STATS])
+
+
+def aggregate(ts_ms, columns, width):
+    """Sampel (epoch ms + {param: nilai}) -> rekaman per bucket, urut menurut bucket.
+    Urutan waktu di dalam satu bucket dipertahankan (menentukan 'last')."""
+    buckets = ts_ms // width * width
+    if np.any(buckets[1:] < buckets[:-1]):
+        order = np.argsort(buckets, kind='stable')
+        buckets = buckets[order]
+        columns = {name: values[order] for name, values in columns.items()}
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    records = np.zeros(len(starts), dtype=RECORD_DTYPE)
+    records['bucket'] = buckets[starts]
+    positions = np.arange(len(buckets))
+    for name in NUMERIC_FIELDS:
+        values = np.asarray(columns[name], dtype=np.float64)
+        valid = ~np.isnan(values)
+        count = np.add.reduceat(valid.astype(np.int64), starts)
+        empty = count == 0
+        total = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        last = np.maximum.reduceat(np.where(valid, positions, -1), starts)
+        records[f'{name}_count'] = count
+        records[f'{name}_min'] = np.where(empty, np.nan, np.minimum.reduceat(np.where(valid, values, np.inf), starts))
+        records[f'{name}_max'] = np.where(empty, np.nan, np.maximum.reduceat(np.where(valid, values, -np.inf), starts))
+        records[f'{name}_mean'] = np.where(empty, np.nan, total / np.maximum(count, 1))
+        records[f'{name}_last'] = np.where(empty, np.nan, values[np.maximum(last, 0)])
+    return records
+
+
+def merge_records(old, new):
+    """Menggabungkan rekaman bucket yang sama (new berisi sampel yang datang belakangan)."""
+    merged = old.copy()
+    for name in NUMERIC_FIELDS:
+        c_old, c_new = old[f'{name}_count'].astype(np.int64), new[f'{name}_count'].astype(np.int64)
+        count = c_old + c_new
+        total = (np.nan_to_num(old[f'{name}_mean']) * c_old + np.nan_to_num(new[f'{name}_mean']) * c_new)
+        merged[f'{name}_count'] = count
+        merged[f'{name}_min'] = np.fmin(old[f'{name}_min'], new[f'{name}_min'])
+        merged[f'{name}_max'] = np.fmax(old[f'{name}_max'], new[f'{name}_max'])
+        merged[f'{name}_mean'] = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+        merged[f'{name}_last'] = np.where(c_new > 0, new[f'{name}_last'], old[f'{name}_last'])
+    return merged
+
+
+class _RollupFile:
+    """Satu file tier untuk satu sistem, dibuka baca-tulis selama sink hidup."""
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.exists(path):
+            open(path, 'wb').close()
+        self.file = open(path, 'r+b')
+        size = os.path.getsize(path)
+        self.rows = size // RECORD_DTYPE.itemsize
+        if size != self.rows * RECORD_DTYPE.itemsize:
+            self.file.truncate(self.rows * RECORD_DTYPE.itemsize)  # rekaman terpotong (crash)
+        self.last_bucket = int(self._read(self.rows - 1)['bucket'][0]) if self.rows else None
+
+    def merge(self, records):
+        appended = []
+        if self.last_bucket is None:
+            appended.append(records)
+        else:
+            newer = records['bucket'] > self.last_bucket
+            for record in records[~newer]:
+                record = record.reshape(1)
+                index = self._find(int(record['bucket'][0]))
+                if index is None:
+                    # jam mundur ke bucket yang belum ada: ditambahkan di akhir, pembaca mengurutkan
+                    open(self.path + UNSORTED_SUFFIX, 'a').close()
+                    appended.append(record)
+                else:
+                    self._write(index, merge_records(self._read(index), record))
+            appended.append(records[newer])
+        for part in appended:
+            if len(part):
+                self._write(self.rows, part)
+                self.rows += len(part)
+                newest = int(part['bucket'].max())
+                self.last_bucket = newest if self.last_bucket is None else max(self.last_bucket, newest)
+
+    def flush(self, fsync=False):
+        self.file.flush()
+        if fsync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    def _find(self, bucket):
+        if bucket == self.last_bucket and not os.path.exists(self.path + UNSORTED_SUFFIX):
+            return self.rows - 1
+        self.file.flush()
+        buckets = np.memmap(self.path, dtype=RECORD_DTYPE, mode='r', shape=(self.rows,))['bucket']
+        if os.path.exists(self.path + UNSORTED_SUFFIX):
+            found = np.flatnonzero(buckets == bucket)
+            return int(found[0]) if len(found) else None
+        index = int(np.searchsorted(buckets, bucket))
+        return index if index < self.rows and buckets[index] == bucket else None
+
+    def _read(self, index):
+        self.file.seek(index * RECORD_DTYPE.itemsize)
+        return np.frombuffer(self.file.read(RECORD_DTYPE.itemsize), dtype=RECORD_DTYPE).copy()
+
+    def _write(self, index, records):
+        self.file.seek(index * RECORD_DTYPE.itemsize)
+        self.file.write(np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+
+
+class RollupSink:
+    """Sink LogWriter yang meneruskan blok ke sink data mentah, lalu memperbarui rollup.
+
+    Gagal menulis rollup tidak menggagalkan commit data mentah (yang akan diulang dan
+    menggandakan baris); rollup ditandai untuk dibangun ulang dari data mentah saat start.
+    """
+    def __init__(self, inner, root=ROLLUP_DIR):
+        self.inner = inner
+        self.root = root
+        self._files = {}  # {(tier, system_id): _RollupFile}
+
+    def write(self, batches, fsync=False):
+        self.inner.write(batches, fsync)
+        try:
+            self.write_rollups(batches, fsync)
+        except OSError as e:
+            print(f"⚠️ Gagal memperbarui rollup: {e}")
+            self._close_files()
+            try:
+                os.makedirs(self.root, exist_ok=True)
+                open(os.path.join(self.root, REBUILD_MARKER), 'a').close()
+            except OSError:
+                pass
+
+    def write_rollups(self, batches, fsync=False):
+        per_system = {}
+        for system_id, block in batches:
+            per_system.setdefault(system_id, []).append(block)
+        for system_id, blocks in per_system.items():
+            ts = np.concatenate([np.asarray(b['timestamp'], dtype='datetime64[ms]') for b in blocks]).astype(np.int64)
+            columns = {name: np.concatenate([np.asarray(b[name], dtype=np.float64) for b in blocks])
+                       for name in NUMERIC_FIELDS}
+            for tier, width in TIERS:
+                f = self._file(tier, system_id)
+                f.merge(aggregate(ts, columns, width))
+                f.flush(fsync)
+
+    def close(self):
+        self._close_files()
+        self.inner.close()
+
+    def _file(self, tier, system_id):
+        f = self._files.get((tier, system_id))
+        if f is None:
+            f = self._files[(tier, system_id)] = _RollupFile(os.path.join(self.root, tier, system_id + ".bin"))
+        return f
+
+    def _close_files(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+class RollupReader:
+    def __init__(self, root=ROLLUP_DIR):
+        self.root = root
+
+    def systems(self, tier=TIERS[-1][0]):
+        try:
+            return sorted(name[:-4] for name in os.listdir(os.path.join(self.root, tier)) if name.endswith(".bin"))
+        except OSError:
+            return []
+
+    def days(self, system_id):
+        """Hari ('YYYY-MM-DD') yang punya data untuk system_id, menurut tier 1d."""
+        records = self._records('1d', system_id)
+        if records is None:
+            return []
+        days = np.asarray(records['bucket']).astype('datetime64[ms]').astype('datetime64[D]')
+        return np.unique(days).astype(str).tolist()
+
+    def choose_tier(self, systems=None, start=None, end=None, max_points=1000):
+        """Tier terkasar yang masih punya minimal max_points bucket berisi data di [start, end)
+        (untuk sistem terpadat), atau None = data mentah. Jumlah bucket dihitung dari file
+        (pencarian biner), jadi rentang dengan celah data tetap mendapat resolusi cukup.
+        Tier yang terpilih berisi < max_points x rasio lebar tier, berapa pun rentangnya."""
+        systems = self.systems() if systems is None else systems
+        start_ms = None if start is None else _to_epoch_ms(start)
+        end_ms = None if end is None else _to_epoch_ms(end)
+        for tier, _ in reversed(TIERS):
+            counts = [high - low for low, high in
+                      (self._bounds(tier, system_id, start_ms, end_ms)[1:] for system_id in systems)]
+            if max(counts, default=0) >= max_points:
+                return tier
+        return None
+
+    def _bounds(self, tier, system_id, start_ms, end_ms):
+        """(rekaman, low, high): irisan rekaman yang bucket-nya beririsan dengan [start, end)."""
+        records = self._records(tier, system_id)
+        if records is None:
+            return None, 0, 0
+        width = TIER_WIDTH[tier]
+        low = 0 if start_ms is None else int(np.searchsorted(records['bucket'], start_ms - width, 'right'))
+        high = len(records) if end_ms is None else int(np.searchsorted(records['bucket'], end_ms, 'left'))
+        return records, low, max(low, high)
+
+    def read_block(self, tier, system_id, columns=None, start=None, end=None):
+        """Agregat satu sistem sebagai blok: timestamp = awal bucket (datetime64[ms]), lalu
+        per parameter <param> (mean), <param>_min, <param>_max, <param>_count, <param>_last."""
+        names = [name for name in (NUMERIC_FIELDS if columns is None else columns) if name in NUMERIC_FIELDS]
+        start_ms = None if start is None else _to_epoch_ms(start)
+        end_ms = None if end is None else _to_epoch_ms(end)
+        records, low, high = self._bounds(tier, system_id, start_ms, end_ms)
+        records = np.array(records[low:high]) if high > low else np.empty(0, dtype=RECORD_DTYPE)
+        block = {'timestamp': records['bucket'].astype('datetime64[ms]')}
+        for name in names:
+            block[name] = records[f'{name}_mean']
+            for stat in ('min', 'max', 'count', 'last'):
+                block[f'{name}_{stat}'] = records[f'{name}_{stat}']
+        return block
+
+    def read_frame(self, tier, systems=None, columns=None, start=None, end=None):
+        """Seperti read_block() untuk beberapa sistem, sebagai DataFrame."""
+        frames = []
+        for system_id in (self.systems(tier) if systems is None else systems):
+            block = self.read_block(tier, system_id, columns, start, end)
+            if not len(block['timestamp']):
+                continue
+            frames.append(pd.DataFrame(dict(system_id=np.full(len(block['timestamp']), system_id), **block)))
+        if not frames:
+            df = pd.DataFrame({'system_id': pd.Series(dtype=object), 'timestamp': pd.Series(dtype='datetime64[ns]')})
+            for name in (NUMERIC_FIELDS if columns is None else columns):
+                if name in NUMERIC_FIELDS:
+                    for column in [name] + [f'{name}_{stat}' for stat in ('min', 'max', 'count', 'last')]:
+                        df[column] = pd.Series(dtype=np.float64)
+            return df
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        if len(frames) > 1:
+            df = df.sort_values('timestamp', kind='stable', ignore_index=True)
+        df['system_id'] = df['system_id'].astype('category')
+        df['timestamp'] = df['timestamp'].astype('datetime64[ns]')
+        return df
+
+    def _records(self, tier, system_id):
+        path = os.path.join(self.root, tier, system_id + ".bin")
+        try:
+            rows = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        except OSError:
+            return None
+        if not rows:
+            return None
+        records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(rows,))
+        if os.path.exists(path + UNSORTED_SUFFIX):
+            records = np.array(records)
+            records = records[np.argsort(records['bucket'], kind='stable')]
+        return records
+
+
+def _to_epoch_ms(value):
+    return int(pd.Timestamp(value).to_datetime64().astype('datetime64[ms]').astype(np.int64))
+
+
+class TieredReader:
+    """Pembaca untuk tab: data mentah (read_block/read_frame) plus tier rollup. Pemilihan
+    antara keduanya menurut rentang dan lebar plot ada di storage.query.query()."""
+    def __init__(self, raw, rollups):
+        self.raw = raw
+        self.rollups = rollups
+
+    def systems(self):
+        return self.raw.systems()
+
+    def read_block(self, system_id, columns=None, start=None, end=None, tail=None):
+        return self.raw.read_block(system_id, columns, start, end, tail)
+
+    def read_frame(self, systems=None, columns=None, start=None, end=None, tail=None):
+        return self.raw.read_frame(systems, columns, start, end, tail)
+
+
+def needs_rebuild(root=ROLLUP_DIR):
+    return os.path.exists(os.path.join(root, REBUILD_MARKER)) or not RollupReader(root).systems()
+
+
+def rebuild(blocks, root=ROLLUP_DIR):
+    """Membangun ulang tier dari (system_id, blok) data mentah.
+
+    Hanya rentang yang masih punya data mentah yang dihitung ulang: bucket sebelum sampel
+    mentah tertua suatu sistem (data mentahnya sudah dihapus retensi) dipertahankan dari
+    rollup lama, begitu juga file sistem yang data mentahnya sudah habis. Hasil dibangun di
+    <root>/.rebuild lalu menggantikan direktori tier; penanda rebuild baru dihapus setelah
+    semuanya selesai, jadi rebuild yang terhenti diulang saat start berikutnya."""
+    staging = os.path.join(root, REBUILD_STAGING)
+    shutil.rmtree(staging, ignore_errors=True)
+    sink = RollupSink(None, staging)
+    oldest = {}  # {system_id: epoch ms sampel mentah tertua}
+    rows = 0
+    try:
+        for system_id, block in blocks:
+            if not len(block['timestamp']):
+                continue
+            sink.write_rollups([(system_id, block)])
+            first = int(np.asarray(block['timestamp'], dtype='datetime64[ms]').astype(np.int64).min())
+            oldest[system_id] = min(oldest.get(system_id, first), first)
+            rows += len(block['timestamp'])
+    finally:
+        sink._close_files()
+
+    previous = RollupReader(root)
+    for tier, width in TIERS:
+        target = os.path.join(staging, tier)
+        os.makedirs(target, exist_ok=True)
+        for system_id in previous.systems(tier):
+            records = previous._records(tier, system_id)
+            if records is None:
+                continue
+            path = os.path.join(target, system_id + ".bin")
+            if system_id in oldest:
+                # bucket yang memuat sampel mentah tertua ikut dihitung ulang dari data mentah
+                kept = np.array(records[records['bucket'] < oldest[system_id] // width * width])
+                fresh = np.fromfile(path, dtype=RECORD_DTYPE)
+            else:
+                kept, fresh = np.array(records), np.empty(0, dtype=RECORD_DTYPE)
+            del records  # lepas memmap sebelum direktori lama dihapus
+            if len(kept):
+                # _records() sudah mengurutkan, dan semua bucket lama < bucket hasil rebuild
+                np.concatenate((kept, fresh)).tofile(path)
+        tier_dir = os.path.join(root, tier)
+        shutil.rmtree(tier_dir, ignore_errors=True)
+        os.replace(target, tier_dir)
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        os.remove(os.path.join(root, REBUILD_MARKER))
+    except OSError:
+        pass
+    return rows
+
+
+def raw_blocks(reader, window_days=7):
+    """(system_id, blok) dari pembaca data mentah, per jendela waktu agar memori terbatas."""
+    for system_id in reader.systems():
+        ts = reader.read_frame(systems=[system_id], columns=[])['timestamp']
+        if ts.empty:
+            continue
+        start = ts.min().normalize()
+        last = ts.max()
+        while start <= last:
+            end = start + pd.Timedelta(days=window_days)
+            df = reader.read_frame(systems=[system_id], columns=list(NUMERIC_FIELDS), start=start, end=end)
+            if not df.empty:
+                block = {'timestamp': df['timestamp'].to_numpy().astype('datetime64[ms]')}
+                for name in NUMERIC_FIELDS:
+                    block[name] = df[name].to_numpy(dtype=np.float64)
+                yield system_id, block
+            start = end
@@ -0,0 +1,191 @@
+# file: storage/sqlite_store.py
+
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from sample_block import NUMERIC_FIELDS
+from storage.csv_log import HEADER, empty_frame
+
+# Satu tabel 'readings' (nilai mentah), timestamp = epoch milidetik waktu lokal.
+# Indeks gabungan (system_id, timestamp) membuat query "sistem X, rentang waktu Y"
+# menjadi pencarian indeks, bukan pemindaian seluruh data. Mode WAL membuat pembaca
+# (tab GUI, proses lain) tidak pernah diblok penulis (LogWriter / ingest daemon).
+DB_FILE = "lisida.db"
+BUSY_TIMEOUT_MS = 5000
+COLUMNS = tuple(name for name in HEADER if name != 'system_id')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS readings (
+    system_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    {', '.join(f'{name} REAL' for name in HEADER[2:] if name != 'source_name')},
+    source_name TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_readings_system_time ON readings (system_id, timestamp);
+CREATE TABLE IF NOT EXISTS systems (system_id TEXT PRIMARY KEY);
+"""
+_INSERT = (f"INSERT INTO readings (system_id, {', '.join(COLUMNS)}) "
+           f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})")
+
+
+def _to_epoch_ms(value):
+    return None if value is None else int(pd.Timestamp(value).to_datetime64().astype('datetime64[ms]').astype(np.int64))
+
+
+class SqliteSink:
+    """Sink LogWriter: satu transaksi (executemany) per group commit."""
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._conn = None
+        self._synchronous = None
+
+    def write(self, batches, fsync=False):
+        # semua error SQLite (database terkunci/sibuk, path salah, disk penuh) -> OSError,
+        # supaya LogWriter mencatatnya dan mengulang commit dengan koneksi baru
+        try:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000.0)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.executescript(SCHEMA)
+            # WAL + NORMAL: commit tidak menunggu fsync; FULL: setiap commit di-fsync
+            synchronous = "FULL" if fsync else "NORMAL"
+            if synchronous != self._synchronous:
+                self._conn.execute(f"PRAGMA synchronous={synchronous}")
+                self._synchronous = synchronous
+            with self._conn:
+                for system_id, block in batches:
+                    self._conn.execute("INSERT OR IGNORE INTO systems VALUES (?)", (system_id,))
+                    self._conn.executemany(_INSERT, self._rows(system_id, block))
+        except sqlite3.Error as e:
+            self.close()
+            raise OSError(f"SQLite: {e}") from e
+
+    @staticmethod
+    def _rows(system_id, block):
+        count = len(block['timestamp'])
+        columns = [[system_id] * count,
+                   np.asarray(block['timestamp'], dtype='datetime64[ms]').astype(np.int64).tolist()]
+        columns += [block[name].tolist() for name in COLUMNS[1:]]
+        return zip(*columns)
+
+    def close(self):
+        conn, self._conn, self._synchronous = self._conn, None, None
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+def delete_before(path, cutoff):
+    """Menghapus baris sebelum cutoff (retensi). Mengembalikan jumlah baris terhapus."""
+    if not os.path.exists(path):
+        return 0
+    try:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000.0)
+        try:
+            with conn:
+                systems = [row[0] for row in conn.execute("SELECT system_id FROM systems")]
+                return sum(conn.execute("DELETE FROM readings WHERE system_id = ? AND timestamp < ?",
+                                        (system_id, _to_epoch_ms(cutoff))).rowcount
+                           for system_id in systems)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise OSError(f"SQLite: {e}") from e
+
+
+class SqliteReader:
+    """Pembaca read-only. Setiap thread memakai koneksinya sendiri (sqlite3 tidak
+    boleh berbagi koneksi antar thread), jadi tab dan job latar bisa membaca bersamaan."""
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if not os.path.exists(self.path):
+                return None
+            uri = f"file:{os.path.abspath(self.path)}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000.0)
+            self._local.conn = conn
+        return conn
+
+    def systems(self):
+        conn = self._connection()
+        if conn is None:
+            return []
+        try:
+            return [row[0] for row in conn.execute("SELECT system_id FROM systems ORDER BY system_id")]
+        except sqlite3.OperationalError:
+            return []  # tabel belum dibuat penulis
+
+    def _select(self, columns, start, end, tail):
+        """(nama kolom, SQL, argumen) untuk satu sistem; system_id jadi argumen pertama."""
+        names = list(COLUMNS[1:] if columns is None else columns)
+        unknown = [name for name in names if name not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Kolom tidak dikenal: {', '.join(unknown)}")
+        where, args = ["system_id = ?"], []
+        if start is not None:
+            where.append("timestamp >= ?")
+            args.append(_to_epoch_ms(start))
+        if end is not None:
+            where.append("timestamp < ?")
+            args.append(_to_epoch_ms(end))
+        sql = f"SELECT {', '.join(['system_id', 'timestamp'] + names)} FROM readings WHERE {' AND '.join(where)}"
+        if tail is not None:
+            sql += f" ORDER BY timestamp DESC LIMIT {int(tail)}"
+        else:
+            sql += " ORDER BY timestamp"
+        return names, sql, args
+
+    def read_block(self, system_id, columns=None, start=None, end=None, tail=None):
+        """Blok satu sistem langsung dari hasil query (tanpa DataFrame)."""
+        names, sql, args = self._select(columns, start, end, tail)
+        conn = self._connection()
+        rows = []
+        if conn is not None:
+            try:
+                rows = conn.execute(sql, [system_id] + args).fetchall()
+            except sqlite3.Error as e:
+                raise OSError(f"SQLite: {e}") from e
+        if tail is not None:
+            rows.reverse()
+        values = list(zip(*rows)) if rows else [()] * (len(names) + 2)
+        block = {'timestamp': np.array(values[1], dtype=np.int64).astype('datetime64[ms]')}
+        for name, column in zip(names, values[2:]):
+            block[name] = np.array(column, dtype=np.float64 if name in NUMERIC_FIELDS else str)
+        return block
+
+    def read_frame(self, systems=None, columns=None, start=None, end=None, tail=None):
+        """Baris log sebagai DataFrame. Satu query berindeks per sistem."""
+        names, sql, args = self._select(columns, start, end, tail)
+        conn = self._connection()
+        if conn is None:
+            return empty_frame(columns)
+
+        frames = []
+        try:
+            for system_id in (self.systems() if systems is None else systems):
+                rows = conn.execute(sql, [system_id] + args).fetchall()
+                if rows:
+                    frames.append(pd.DataFrame.from_records(rows, columns=['system_id', 'timestamp'] + names))
+        except sqlite3.Error as e:
+            raise OSError(f"SQLite: {e}") from e
+        if not frames:
+            return empty_frame(columns)
+
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        df = df.sort_values('timestamp', kind='stable', ignore_index=True)
+        if tail is not None:
+            df = df.tail(tail).reset_index(drop=True)
+        df['system_id'] = df['system_id'].astype('category')
+        df['timestamp'] = df['timestamp'].to_numpy(dtype=np.int64).astype('datetime64[ms]').astype('datetime64[ns]')
+        for name in names:
+            if name in NUMERIC_FIELDS:
+                df[name] = df[name].astype(np.float64)
+        return df
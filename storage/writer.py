@@ -0,0 +1,151 @@
+# file: storage/writer.py
+
+import time
+import threading
+import sample_block
+
+RETRY_INITIAL_S = 1.0    # jeda sebelum mencoba lagi commit yang gagal, digandakan tiap gagal
+RETRY_MAX_S = 30.0
+
+
+class LogWriter:
+    """Penulis log yang berumur panjang, dengan group commit di thread sendiri.
+
+    append() hanya menaruh blok di antrian (tidak menyentuh disk), jadi aman dan
+    murah dipanggil dari thread GUI. Thread penulis membiarkan sink (CSV, kolumnar,
+    ...) tetap terbuka dan menulis semua blok yang menunggu sekaligus saat flush_rows
+    baris terkumpul atau flush_interval_ms berlalu, lalu flush (dan fsync bila fsync=True).
+    Jika penulisan gagal (disk penuh, share jaringan putus, atau error lain dari sink),
+    sink ditutup, blok dikembalikan ke antrian dan dicoba lagi setelah jeda yang makin
+    panjang (RETRY_INITIAL_S, 2x, ... maks. RETRY_MAX_S), supaya error yang menetap (disk
+    penuh, mount baca-saja) tidak menjadi loop yang menghabiskan CPU. Thread penulis tidak pernah berhenti karena error sink. Blok yang masih gagal saat
+    close() dibuang dan dihitung di counters['dropped_rows'].
+
+    Sink cukup punya write(batches, fsync) dan close(); batches = [(system_id, blok)].
+    Karena commit yang gagal diulang utuh, sink yang membuka ulang setelah close() harus
+    membuang sisa commit yang gagal di tengah jalan (CsvSink dan ColumnarSink memangkas
+    file ke ukuran commit terakhir yang berhasil, SqliteSink memakai transaksi).
+    """
+    def __init__(self, sink, flush_interval_ms=1000, flush_rows=500, fsync=False):
+        self.sink = sink
+        self.flush_interval = max(0, flush_interval_ms) / 1000.0
+        self.flush_rows = max(1, int(flush_rows))
+        self.fsync = bool(fsync)
+
+        self._pending = []       # [(system_id, blok)]
+        self._pending_rows = 0
+        self._flush_requested = 0
+        self._attempted = 0      # nomor permintaan flush terakhir yang sudah dicoba
+        self._flushed = 0        # nomor permintaan flush terakhir yang commit-nya berhasil
+        self._retry_at = 0.0     # commit berikutnya tidak sebelum waktu ini (setelah gagal)
+        self._retry_delay = 0.0
+        self._closing = False
+        self._cond = threading.Condition()
+        self.counters = {'rows_written': 0, 'commits': 0, 'write_errors': 0, 'dropped_rows': 0}
+        self.last_error = None
+
+        self._thread = threading.Thread(target=self._run, name="LogWriter", daemon=True)
+        self._thread.start()
+
+    # ---------------- dipanggil dari thread mana pun ----------------
+    def append(self, system_id, block):
+        count = sample_block.length(block)
+        if not count:
+            return
+        with self._cond:
+            was_empty = not self._pending
+            self._pending.append((system_id, block))
+            self._pending_rows += count
+            if was_empty or self._pending_rows >= self.flush_rows:
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Menulis semua yang menunggu sekarang juga (tanpa menunggu jeda coba-ulang) dan
+        menunggu sampai selesai. False bila timeout atau commit gagal (lihat last_error)."""
+        with self._cond:
+            self._flush_requested += 1
+            ticket = self._flush_requested
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: self._attempted >= ticket or not self._thread.is_alive(), timeout)
+            return self._flushed >= ticket
+
+    def close(self, timeout=10.0):
+        """Commit terakhir lalu menutup file. Dipanggil dari closeEvent / saat daemon berhenti."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    @classmethod
+    def from_settings(cls, sink, options):
+        """Membuat LogWriter dari settings['storage']."""
+        return cls(sink,
+                   flush_interval_ms=options.get('flush_interval_ms', 1000),
+                   flush_rows=options.get('flush_rows', 500),
+                   fsync=options.get('fsync', False))
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.counters)
+            stats['pending_rows'] = self._pending_rows
+            return stats
+
+    # ---------------- thread penulis ----------------
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = None
+                while True:
+                    now = time.monotonic()
+                    if self._pending:
+                        # setelah commit gagal, baris yang menumpuk pun menunggu jeda coba-ulang
+                        deadline = max(deadline or now + self.flush_interval, self._retry_at)
+                    if (self._closing or self._flush_requested > self._attempted
+                            or (now >= self._retry_at and self._pending_rows >= self.flush_rows)
+                            or (deadline is not None and now >= deadline)):
+                        break
+                    self._cond.wait(None if deadline is None else deadline - now)
+                batches, self._pending = self._pending, []
+                rows, self._pending_rows = self._pending_rows, 0
+                ticket, closing = self._flush_requested, self._closing
+
+            committed = self._commit(batches, rows) if batches else True
+
+            with self._cond:
+                self._attempted = ticket
+                if committed:
+                    self._flushed = ticket
+                self._cond.notify_all()
+            if closing:
+                break
+        try:
+            self.sink.close()
+        except Exception as e:
+            self.last_error = e
+            print(f"⚠️ Gagal menutup log: {e}")
+
+    def _commit(self, batches, rows):
+        try:
+            self.sink.write(batches, self.fsync)
+        except Exception as e:
+            self.last_error = e
+            self.counters['write_errors'] += 1
+            print(f"⚠️ Gagal menulis log: {e}")
+            try:
+                self.sink.close()  # dibuka ulang (dan sisa commit ini dipangkas) pada percobaan berikutnya
+            except Exception:
+                pass
+            with self._cond:
+                if self._closing:
+                    self.counters['dropped_rows'] += rows
+                    print(f"⚠️ {rows} baris log dibuang saat menutup")
+                else:
+                    self._pending[:0] = batches
+                    self._pending_rows += rows
+                    self._retry_delay = min(RETRY_MAX_S, self._retry_delay * 2 or RETRY_INITIAL_S)
+                    self._retry_at = time.monotonic() + self._retry_delay
+            return False
+        self.counters['rows_written'] += rows
+        self.counters['commits'] += 1
+        self._retry_delay, self._retry_at = 0.0, 0.0
+        return True
@@ -56,6 +56,7 @@ def build_stylesheet(palette):
     QLabel#cardTitle {{ font-size: 13px; color: {palette['text_secondary']}; font-weight: normal; }}
     QLabel#cardIcon  {{ font-size: 15px; }}
     QLabel#cardValue {{ font-size: 26px; font-weight: bold; color: {palette['text']}; }}
+    QLabel#cardStats {{ font-size: 11px; color: {palette['text_secondary']}; }}
 
     /* --- Sistem Tab --- */
     QTabWidget::pane {{ border-top: 3px solid {palette['accent']}; }}
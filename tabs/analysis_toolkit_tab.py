@@ -1,23 +1,50 @@
 # file: tabs/analysis_toolkit_tab.py
 
-import pandas as pd
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
 import numpy as np
 import pywt
 import pyqtgraph as pg
-from PyQt5.QtCore import QDate
+from PyQt5.QtCore import QDate, Qt
+from PyQt5.QtGui import QColor
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel,
     QCalendarWidget, QComboBox, QPushButton, QMessageBox,
-    QGroupBox, QSpinBox
+    QGroupBox, QSpinBox, QCheckBox, QTableWidget, QTableWidgetItem
 )
+from storage.query import query
+from analysis import filters, spectral, lag
+from analysis.align import align, sampling_step
+from jobs import JobRunner
+from custom_widgets import JobProgressWidget
+
+ANALYSIS_CACHE_ENTRIES = 16
+
+# pilihan fungsi -> (nama di analysis.filters, label parameter); FFT saja = tanpa filter
+FILTER_FUNCTIONS = {
+    "Moving Average": ('moving_average', "Ukuran Window:"),
+    "EWMA": ('ewma', "Span:"),
+    "Median Bergerak": ('rolling_median', "Ukuran Window:"),
+    "Savitzky-Golay": ('savitzky_golay', "Ukuran Window:"),
+    "Desimasi": ('decimate', "Faktor:"),
+}
+FILTER_LABELS = {name: label for label, (name, _) in FILTER_FUNCTIONS.items()}
+LAG_CONFIDENCE = 0.95  # sel matriks lag di bawah keyakinan ini digambar redup
 
 
 class AnalysisToolkitTab(QWidget):
     """Tab untuk analisis data historis dengan fungsi matematika."""
-    def __init__(self, data_file=None):
+    def __init__(self, store=None, systems=("Lisimeter_1", "Lisimeter_2"), calibration_history=None):
         super().__init__()
-        self.data_file = data_file
-        self.df = None
+        self.store = store  # pembaca dari storage.backends.open_reader()
+        self.calibration_history = calibration_history  # log berisi nilai mentah
+        self.systems = list(systems)
+        self.jobs = JobRunner(self)  # analisis berjalan di thread latar
+        self.cache = AnalysisCache()  # hasil analisis per (sistem, parameter, rentang, fungsi, data)
+        self.has_result = False
+        self.chain = []  # rangkaian filter [(nama, window), ...]; kosong = fungsi terpilih saja
         self.initUI()
 
     def initUI(self):
@@ -31,12 +58,13 @@ class AnalysisToolkitTab(QWidget):
         # 1. Pemilihan Data
         control_layout.addWidget(QLabel("<b>1. Pilih Data Sumber</b>"))
         self.system_selector = QComboBox()
-        self.system_selector.addItems(["Lisimeter_1", "Lisimeter_2"])
-        self.param_selector = QComboBox()
-        self.param_selector.addItems([
+        self.system_selector.addItems(self.systems)
+        self.parameters = [
             'temperature', 'humidity', 'moisture', 'ph', 'ec',
             'cps', 'activity', 'nitrogen', 'phosphorus', 'potassium', 'energy'
-        ])
+        ]
+        self.param_selector = QComboBox()
+        self.param_selector.addItems(self.parameters)
 
         form_layout_1 = QGridLayout()
         form_layout_1.addWidget(QLabel("Sistem:"), 0, 0)
@@ -50,15 +78,22 @@ class AnalysisToolkitTab(QWidget):
         self.calendar = QCalendarWidget()
         self.calendar.setMaximumDate(QDate.currentDate())
         control_layout.addWidget(self.calendar)
+        self.days_box = QSpinBox(self, value=1, minimum=1, maximum=366, suffix=" hari")
+        days_layout = QHBoxLayout()
+        days_layout.addWidget(QLabel("Panjang rentang (mulai tanggal terpilih):"))
+        days_layout.addWidget(self.days_box)
+        control_layout.addLayout(days_layout)
 
         # 3. Pemilihan Fungsi Analisis
         control_layout.addWidget(QLabel("<b>3. Pilih Fungsi Analisis</b>"))
         self.func_selector = QComboBox()
-        self.func_selector.addItems(["Moving Average", "Fast Fourier Transform (FFT)"])
+        self.func_selector.addItems(list(FILTER_FUNCTIONS) + ["Fast Fourier Transform (FFT)"])
         self.func_selector.currentTextChanged.connect(self.toggle_param_box)
+        self.func_selector.currentTextChanged.connect(self.refresh_function)
 
         self.param_box_label = QLabel("Ukuran Window:")
         self.param_box = QSpinBox(self, value=10, minimum=2, maximum=200, suffix=" sampel")
+        self.param_box.valueChanged.connect(self.refresh_function)
 
         func_layout = QHBoxLayout()
         func_layout.addWidget(self.func_selector)
@@ -66,101 +101,204 @@ class AnalysisToolkitTab(QWidget):
         func_layout.addWidget(self.param_box)
         control_layout.addLayout(func_layout)
 
+        chain_layout = QHBoxLayout()
+        self.chain_add_btn = QPushButton("➕ Tambah ke Rantai")
+        self.chain_add_btn.clicked.connect(self.add_to_chain)
+        self.chain_clear_btn = QPushButton("Kosongkan")
+        self.chain_clear_btn.clicked.connect(self.clear_chain)
+        chain_layout.addWidget(self.chain_add_btn)
+        chain_layout.addWidget(self.chain_clear_btn)
+        control_layout.addLayout(chain_layout)
+        self.chain_label = QLabel()
+        self.chain_label.setWordWrap(True)
+        control_layout.addWidget(self.chain_label)
+
         # 4. Tombol Aksi
         self.run_btn = QPushButton("🚀 Jalankan Analisis")
         self.run_btn.setFixedHeight(40)
         self.run_btn.clicked.connect(self.run_analysis)
         control_layout.addWidget(self.run_btn)
+        control_layout.addWidget(JobProgressWidget(self.jobs))
+        self.info_label = QLabel()
+        self.info_label.setWordWrap(True)
+        control_layout.addWidget(self.info_label)
+
+        # 5. Korelasi silang: lag seri terpilih (A) terhadap seri B, atau matriks semua parameter
+        control_layout.addWidget(QLabel("<b>5. Korelasi Silang (Lag)</b>"))
+        self.lag_system = QComboBox()
+        self.lag_system.addItems(self.systems)
+        if len(self.systems) > 1:
+            self.lag_system.setCurrentIndex(1)
+        self.lag_param = QComboBox()
+        self.lag_param.addItems(self.parameters)
+        self.lag_box = QSpinBox(self, minimum=1, maximum=10080, value=360, suffix=" menit")
+        self.lag_differences = QCheckBox("Korelasikan perubahan (selisih orde-1)")
+        self.lag_differences.setChecked(True)
+        lag_form = QGridLayout()
+        lag_form.addWidget(QLabel("Terhadap:"), 0, 0)
+        lag_form.addWidget(self.lag_system, 0, 1)
+        lag_form.addWidget(self.lag_param, 0, 2)
+        lag_form.addWidget(QLabel("Lag maks:"), 1, 0)
+        lag_form.addWidget(self.lag_box, 1, 1, 1, 2)
+        control_layout.addLayout(lag_form)
+        control_layout.addWidget(self.lag_differences)
+        lag_buttons = QHBoxLayout()
+        self.lag_btn = QPushButton("⏱ Hitung Lag")
+        self.lag_btn.clicked.connect(lambda: self.run_lags(matrix=False))
+        self.lag_matrix_btn = QPushButton("▦ Matriks Lag")
+        self.lag_matrix_btn.clicked.connect(lambda: self.run_lags(matrix=True))
+        lag_buttons.addWidget(self.lag_btn)
+        lag_buttons.addWidget(self.lag_matrix_btn)
+        control_layout.addLayout(lag_buttons)
+        self.lag_label = QLabel()
+        self.lag_label.setWordWrap(True)
+        control_layout.addWidget(self.lag_label)
         control_layout.addStretch()
 
         # --- Area Grafik di Kanan ---
         plot_layout = QVBoxLayout()
         self.plot_original = pg.PlotWidget(title="Sinyal Asli")
-        self.plot_fft = pg.PlotWidget(title="Fast Fourier Transform (FFT)")
+        self.plot_fft = pg.PlotWidget(title="Spektrum")
         self.plot_autocorr = pg.PlotWidget(title="Autocorrelation")
         self.plot_denoised = pg.PlotWidget(title="Denoised (Wavelet)")
+        self.plot_xcorr = pg.PlotWidget(title="Korelasi Silang")
+        self.plot_xcorr.setLabel('bottom', "Lag (menit)")
 
-        self.plot_original.addLegend()
-        self.plot_fft.addLegend()
-        self.plot_autocorr.addLegend()
-        self.plot_denoised.addLegend()
+        for plot in (self.plot_original, self.plot_fft, self.plot_autocorr, self.plot_denoised, self.plot_xcorr):
+            plot.addLegend()
+            # rentang panjang: gambar hanya bagian yang terlihat, diringkas per piksel
+            plot.setClipToView(True)
+            plot.setDownsampling(auto=True, mode='peak')
 
         plot_layout.addWidget(self.plot_original)
         plot_layout.addWidget(self.plot_fft)
         plot_layout.addWidget(self.plot_autocorr)
         plot_layout.addWidget(self.plot_denoised)
+        plot_layout.addWidget(self.plot_xcorr)
+
+        # Matriks lag (baris = parameter sistem A, kolom = parameter sistem B); klik sel
+        # untuk menggambar korelasi silang pasangan itu
+        self.lag_table = QTableWidget()
+        self.lag_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.lag_table.cellClicked.connect(self.show_lag_pair)
+        self.lag_table.hide()
+        plot_layout.addWidget(self.lag_table)
+        self.lag_result = None
 
         main_layout.addWidget(control_panel)
         main_layout.addLayout(plot_layout)
 
         self.toggle_param_box(self.func_selector.currentText())
+        self.update_chain_label()
 
     def toggle_param_box(self, text):
-        is_ma = "Moving Average" in text
-        self.param_box.setVisible(is_ma)
-        self.param_box_label.setVisible(is_ma)
+        is_filter = text in FILTER_FUNCTIONS
+        self.param_box.setVisible(is_filter)
+        self.param_box_label.setVisible(is_filter)
+        self.chain_add_btn.setEnabled(is_filter)
+        if is_filter:
+            self.param_box_label.setText(FILTER_FUNCTIONS[text][1])
+
+    def current_step(self):
+        """Filter dari pilihan fungsi sekarang sebagai (nama, window), atau None untuk FFT."""
+        function = self.func_selector.currentText()
+        if function not in FILTER_FUNCTIONS:
+            return None
+        return FILTER_FUNCTIONS[function][0], self.param_box.value()
+
+    def add_to_chain(self):
+        step = self.current_step()
+        if step is not None:
+            self.chain.append(step)
+            self.update_chain_label()
+            self.refresh_function()
+
+    def clear_chain(self):
+        if self.chain:
+            self.chain = []
+            self.update_chain_label()
+            self.refresh_function()
+
+    def update_chain_label(self):
+        self.chain_label.setText(f"Rantai: {describe_steps(self.chain)}" if self.chain
+                                 else "Rantai kosong: hanya fungsi terpilih yang diterapkan.")
+
+    def refresh_function(self, *_):
+        # ganti filter/rantai setelah ada hasil: spektrum dkk. diambil dari cache
+        if self.has_result:
+            self.run_analysis()
+
+    def analysis_request(self):
+        """Pilihan panel kontrol -> (sistem, parameter, awal, akhir, langkah filter).
+        Rantai yang sudah disusun menang atas fungsi terpilih."""
+        start = datetime.datetime.combine(self.calendar.selectedDate().toPyDate(), datetime.time())
+        end = start + datetime.timedelta(days=self.days_box.value())
+        step = self.current_step()
+        steps = tuple(self.chain) if self.chain else ((step,) if step is not None else ())
+        return (self.system_selector.currentText(), self.param_selector.currentText(),
+                start, end, steps)
 
     def run_analysis(self):
-        """Menjalankan analisis data."""
-        if self.data_file is None:
+        """Menjalankan analisis di thread latar; hasilnya digambar oleh show_analysis()."""
+        if self.store is None:
             QMessageBox.warning(self, "Data Error", "Data file tidak ditemukan.")
             return
 
-        try:
-            self.df = pd.read_csv(self.data_file, parse_dates=['timestamp'])
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Gagal membaca file: {e}")
-            return
-
-        param = self.param_selector.currentText()
-        if param not in self.df.columns:
-            QMessageBox.warning(self, "Parameter Error", f"Kolom '{param}' tidak ada di file data.")
-            return
+        request = self.analysis_request()
+        store, calibration_history, cache = self.store, self.calibration_history, self.cache
+        self.jobs.submit(
+            lambda job: compute_analysis(job, store, *request, calibration_history=calibration_history, cache=cache),
+            self.show_analysis, self.on_analysis_error, f"Menganalisis {request[1]} {request[0]}..."
+        )
 
-        data = self.df.dropna(subset=[param])
-        ts = data['timestamp'].astype('int64') / 1e9
-        signal = data[param].to_numpy()
-        n = len(signal)
+    def on_analysis_error(self, message):
+        QMessageBox.critical(self, "Error", f"Gagal menjalankan analisis: {message}")
 
+    def show_analysis(self, result):
+        """Menggambar hasil compute_analysis() (dipanggil di thread GUI)."""
         # Bersihkan plot sebelum menggambar ulang
         self.plot_original.clear()
         self.plot_fft.clear()
         self.plot_autocorr.clear()
         self.plot_denoised.clear()
+        if result is None:
+            self.has_result = False
+            self.info_label.setText("")
+            QMessageBox.information(self, "Info", "Tidak ada data untuk dianalisis pada sistem dan rentang ini.")
+            return
+        self.has_result = True
+        self.info_label.setText(f"{len(result['signal'])} sampel"
+                                + (" (hasil dari cache)" if result['cached'] else ""))
 
-        # --- 1. Sinyal Asli ---
+        ts = result['ts']
         self.plot_original.plot(
-            ts, signal,
+            ts, result['signal'],
             pen=pg.mkPen('#9CA3AF', width=2),
             name="Sinyal Asli"
         )
-
-        # --- 2. FFT ---
-        fft_vals = np.fft.fft(signal)
-        fft_freqs = np.fft.fftfreq(n, d=np.median(np.diff(ts)))
+        if result['filtered'] is not None:
+            filtered_ts, filtered = result['filtered']
+            self.plot_original.plot(
+                filtered_ts, filtered,
+                pen=pg.mkPen('#38BDF8', width=2),
+                name=describe_steps(result['steps'])
+            )
+        # Welch PSD (sampling rata) atau Lomb-Scargle (ada celah), lihat analysis.spectral
+        welch = result['spectrum_method'] == 'welch'
+        self.plot_fft.setTitle("Spektrum (Welch PSD)" if welch else "Spektrum (Lomb-Scargle, data bercelah)")
+        self.plot_fft.setLogMode(y=welch)
         self.plot_fft.plot(
-            fft_freqs[:n // 2],
-            np.abs(fft_vals[:n // 2]),
+            result['frequencies'][1:] if welch else result['frequencies'],
+            result['power'][1:] if welch else result['power'],
             pen=pg.mkPen('#F59E0B', width=2),
-            name="FFT"
+            name="PSD" if welch else "Lomb-Scargle"
         )
-
-        # --- 3. Autocorrelation ---
-        autocorr = np.correlate(signal - np.mean(signal), signal - np.mean(signal), mode='full')
-        lags = np.arange(-n + 1, n)
         self.plot_autocorr.plot(
-            lags, autocorr,
+            result['lags'], result['autocorr'],
             pen=pg.mkPen('#10B981', width=2),
             name="Autocorrelation"
         )
-
-        # --- 4. Denoising (Wavelet) ---
-        coeffs = pywt.wavedec(signal, 'db4', level=4)
-        sigma = np.median(np.abs(coeffs[-1])) / 0.6745
-        uthresh = sigma * np.sqrt(2 * np.log(len(signal)))
-        coeffs[1:] = [pywt.threshold(c, value=uthresh, mode='soft') for c in coeffs[1:]]
-        denoised = pywt.waverec(coeffs, 'db4')
-
+        denoised = result['denoised']
         min_len = min(len(ts), len(denoised))
         self.plot_denoised.plot(
             ts[:min_len],
@@ -168,3 +306,264 @@ class AnalysisToolkitTab(QWidget):
             pen='b',
             name="Denoised"
         )
+
+
+    def lag_request(self, matrix):
+        """(baris, kolom, awal, akhir, lag maks detik, selisih) untuk compute_lags().
+        Matriks: semua parameter sistem terpilih x semua parameter sistem pembanding."""
+        start, end = self.analysis_request()[2:4]
+        system_a, system_b = self.system_selector.currentText(), self.lag_system.currentText()
+        if matrix:
+            rows = [(system_a, name) for name in self.parameters]
+            columns = [(system_b, name) for name in self.parameters]
+        else:
+            rows = [(system_a, self.param_selector.currentText())]
+            columns = [(system_b, self.lag_param.currentText())]
+        return rows, columns, start, end, self.lag_box.value() * 60.0, self.lag_differences.isChecked()
+
+    def run_lags(self, matrix=False):
+        """Estimasi lag di thread latar; hasilnya ditampilkan oleh show_lags()."""
+        if self.store is None:
+            QMessageBox.warning(self, "Data Error", "Data file tidak ditemukan.")
+            return
+        request = self.lag_request(matrix)
+        if not matrix and request[0] == request[1]:
+            QMessageBox.information(self, "Info", "Pilih seri pembanding yang berbeda dari seri sumber.")
+            return
+        store, calibration_history = self.store, self.calibration_history
+        self.jobs.submit(
+            lambda job: compute_lags(job, store, *request, calibration_history=calibration_history),
+            self.show_lags, self.on_analysis_error, "Menghitung korelasi silang..."
+        )
+
+    def show_lags(self, result):
+        """Menampilkan hasil compute_lags(): kurva untuk satu pasangan, tabel untuk matriks."""
+        self.lag_result = result
+        self.plot_xcorr.clear()
+        if result is None:
+            self.lag_table.hide()
+            self.lag_label.setText("")
+            QMessageBox.information(self, "Info", "Tidak ada data untuk kedua seri pada rentang ini.")
+            return
+        rows, columns = result['rows'], result['columns']
+        if len(rows) == 1 and len(columns) == 1:
+            self.lag_table.hide()
+        else:
+            self.fill_lag_table(result)
+        # kurva pasangan parameter terpilih (untuk matriks: baris/kolom yang sesuai bila ada)
+        row = next((i for i, (_, name) in enumerate(rows) if name == self.param_selector.currentText()), 0)
+        column = next((j for j, (_, name) in enumerate(columns) if name == self.lag_param.currentText()), 0)
+        self.show_lag_pair(row, column)
+
+    def fill_lag_table(self, result):
+        rows, columns = result['rows'], result['columns']
+        self.lag_table.setRowCount(len(rows))
+        self.lag_table.setColumnCount(len(columns))
+        self.lag_table.setVerticalHeaderLabels([f"{s}: {p}" for s, p in rows])
+        self.lag_table.setHorizontalHeaderLabels([f"{s}: {p}" for s, p in columns])
+        for i in range(len(rows)):
+            for j in range(len(columns)):
+                r, confidence = result['r'][i, j], result['confidence'][i, j]
+                if np.isnan(r):
+                    item = QTableWidgetItem("-")
+                elif result['edge'][i, j]:
+                    # puncak di ujung jendela: lag sebenarnya di luar jendela atau tidak ada
+                    item = QTableWidgetItem(f"tepi\nr = {r:.2f}")
+                    item.setToolTip("Puncak di tepi jendela lag, bukan estimasi lag")
+                    item.setForeground(QColor('#6B7280'))
+                else:
+                    item = QTableWidgetItem(f"{format_lag(result['lag_s'][i, j])}\nr = {r:.2f}")
+                    item.setToolTip(f"keyakinan {confidence:.0%}, {int(result['pairs'][i, j])} pasangan")
+                    if confidence >= LAG_CONFIDENCE:
+                        color = QColor('#38BDF8' if r > 0 else '#F43F5E')
+                        color.setAlpha(int(40 + 160 * abs(r)))
+                        item.setBackground(color)
+                    else:
+                        item.setForeground(QColor('#6B7280'))
+                item.setTextAlignment(Qt.AlignCenter)
+                self.lag_table.setItem(i, j, item)
+        self.lag_table.resizeColumnsToContents()
+        self.lag_table.resizeRowsToContents()
+        self.lag_table.show()
+
+    def show_lag_pair(self, row, column):
+        result = self.lag_result
+        if result is None:
+            return
+        (system_a, param_a), (system_b, param_b) = result['rows'][row], result['columns'][column]
+        self.plot_xcorr.clear()
+        self.plot_xcorr.setTitle(f"Korelasi Silang {param_a} ({system_a}) → {param_b} ({system_b})")
+        ccf = result['ccf'][row, column]
+        self.plot_xcorr.plot(result['lags_s'] / 60.0, ccf, pen=pg.mkPen('#A78BFA', width=2),
+                             name="r(lag)", connect='finite')
+        r = result['r'][row, column]
+        if np.isnan(r):
+            self.lag_label.setText("Korelasi tidak terdefinisi (data kosong atau konstan).")
+            return
+        lag_s = result['lag_s'][row, column]
+        if result['edge'][row, column]:
+            self.lag_label.setText(
+                f"Puncak di tepi jendela lag (±{format_lag(result['lags_s'][-1])}, r = {r:.2f}): "
+                f"bukan estimasi lag. Perbesar lag maks atau gunakan selisih orde-1."
+            )
+            return
+        self.plot_xcorr.addItem(pg.InfiniteLine(lag_s / 60.0, angle=90, movable=False,
+                                                pen=pg.mkPen('#F59E0B', style=Qt.DashLine)))
+        if abs(lag_s) < result['step'] / 2:
+            relation = "berubah bersamaan"
+        elif lag_s > 0:
+            relation = f"{param_b} ({system_b}) tertinggal {format_lag(lag_s)}"
+        else:
+            relation = f"{param_a} ({system_a}) tertinggal {format_lag(-lag_s)}"
+        self.lag_label.setText(
+            f"Puncak: {relation}, r = {r:.2f}, keyakinan {result['confidence'][row, column]:.0%} "
+            f"(grid {result['step']:g} s, cakupan {result['coverage'][row, column]:.0%})"
+        )
+
+
+class AnalysisCache:
+    """LRU hasil analisis, dipakai bersama oleh job latar (aman antar thread).
+
+    Kunci selalu memuat sidik jari data (hash timestamp + nilai terkalibrasi), jadi
+    data baru di rentang itu atau perubahan kalibrasi otomatis menghasilkan kunci baru.
+    """
+    def __init__(self, max_entries=ANALYSIS_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def fingerprint(*arrays):
+    digest = hashlib.blake2b(digest_size=16)
+    for values in arrays:
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def describe_steps(steps):
+    return " → ".join(f"{FILTER_LABELS.get(name, name)} ({window})" for name, window in steps)
+
+
+def format_lag(seconds):
+    seconds = abs(float(seconds))
+    if seconds < 120:
+        return f"{seconds:.0f} s"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f} mnt"
+    return f"{seconds / 3600:.1f} jam"
+
+
+def compute_lags(job, store, rows, columns, start, end, max_lag_s, differences=True,
+                 calibration_history=None):
+    """Lag semua pasangan rows x columns [(sistem, parameter), ...] di [start, end) dalam satu
+    lintasan korelasi silang (analysis.lag). Seri disejajarkan dulu ke grid bersama
+    (analysis.align); grid tidak lebih halus dari jendela lag / lag.MAX_LAG_BINS.
+    Mengembalikan dict hasil lag.estimate_lags() plus rows/columns dan coverage (fraksi bin
+    grid yang terisi kedua seri, per pasangan), atau None bila salah satu sistem tidak punya data."""
+    keys = list(dict.fromkeys(list(rows) + list(columns)))
+    systems = list(dict.fromkeys(system_id for system_id, _ in keys))
+    parameters = list(dict.fromkeys(name for _, name in keys))
+    result = query(store, systems, parameters, start, end, calibration_history=calibration_history)
+    if any(system_id not in result.series for system_id in systems):
+        return None
+    series = {(system_id, name): (result.series[system_id]['timestamp'].astype(np.int64) / 1000.0,
+                                  result.series[system_id][name])
+              for system_id, name in keys}
+    job.check()
+
+    job.progress(30, "Menyejajarkan seri...")
+    step = lag.grid_step(max(sampling_step(t) for t, _ in series.values()), max_lag_s)
+    aligned = align(series, step=step)
+    if len(aligned) < 3:
+        return None
+    job.progress(50, "Korelasi silang...")
+    estimate = lag.estimate_lags(aligned, rows, columns, max_lag_s, differences, job.check)
+    bins = len(aligned) - 1 if differences else len(aligned)
+    return dict(estimate, rows=list(rows), columns=list(columns), coverage=estimate['pairs'] / bins)
+
+
+def compute_analysis(job, store, system_id, param, start, end, steps=(),
+                     calibration_history=None, cache=None):
+    """Bagian berat analisis untuk satu sistem di [start, end): FFT, autokorelasi, wavelet,
+    dan rangkaian filter steps [(nama, window), ...] dari analysis.filters. Dijalankan di
+    thread latar lewat jobs.JobRunner. Mengembalikan dict array untuk plot, atau None bila
+    tidak ada data."""
+    result = query(store, [system_id], [param], start, end, calibration_history=calibration_history)
+    block = result.series.get(system_id)
+    if block is None:
+        return None
+    valid = ~np.isnan(block[param])
+    ts = block['timestamp'][valid].astype(np.int64) / 1000.0
+    signal = block[param][valid].astype(np.float64)
+    n = len(signal)
+    if n < 2:
+        return None
+    job.check()
+
+    key = (system_id, param, start, end, fingerprint(ts, signal))
+    base = cache.get(key) if cache is not None else None
+    cached = base is not None
+    if base is None:
+        base = _compute_spectra(job, ts, signal)
+        if cache is not None:
+            cache.put(key, base)
+
+    filtered = None
+    steps = tuple(steps)
+    if steps:
+        filter_key = key + steps
+        filtered = cache.get(filter_key) if cache is not None else None
+        if filtered is None:
+            cached = False
+            job.progress(90, "Menerapkan filter...")
+            filtered = filters.apply_chain(ts, signal, steps, job.check)
+            if cache is not None:
+                cache.put(filter_key, filtered)
+        if not len(filtered[1]):
+            filtered = None  # data lebih pendek dari jendela filter
+    return dict(base, ts=ts, signal=signal, filtered=filtered, steps=steps, cached=cached)
+
+
+def _compute_spectra(job, ts, signal):
+    n = len(signal)
+    result = {}
+
+    # --- 2. Spektrum ---
+    job.progress(25, "Menghitung spektrum...")
+    method, frequencies, power = spectral.spectrum(ts, signal)
+    result['spectrum_method'] = method
+    result['frequencies'] = frequencies
+    result['power'] = power
+
+    # --- 3. Autocorrelation (FFT, lag sampai n/2) ---
+    job.progress(50, "Menghitung autokorelasi...")
+    result['autocorr'] = spectral.autocorrelation(signal, max_lag=n // 2)
+    result['lags'] = np.arange(len(result['autocorr']))
+
+    # --- 4. Denoising (Wavelet) ---
+    job.progress(75, "Denoising wavelet...")
+    coeffs = pywt.wavedec(signal, 'db4', level=4)
+    sigma = np.median(np.abs(coeffs[-1])) / 0.6745
+    uthresh = sigma * np.sqrt(2 * np.log(len(signal)))
+    coeffs[1:] = [pywt.threshold(c, value=uthresh, mode='soft') for c in coeffs[1:]]
+    result['denoised'] = pywt.waverec(coeffs, 'db4')
+    job.check()
+    return result
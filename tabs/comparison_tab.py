@@ -6,15 +6,38 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import QDate, Qt
 import pyqtgraph as pg
-import pandas as pd
 import numpy as np
 import datetime
+from storage.query import query
+from analysis.align import align_query
+from jobs import JobRunner
+from custom_widgets import JobProgressWidget
+
+# Warna garis per sistem (berulang jika sistemnya lebih banyak)
+SYSTEM_COLORS = ['#38BDF8', '#F43F5E', '#34D399', '#FBBF24', '#A78BFA', '#FB923C', '#F472B6', '#2DD4BF']
+DERIVED_COLOR = '#E2E8F0'
+
+# Seri turunan A vs B, dihitung dari seri yang sudah disejajarkan (analysis.align):
+# label -> (metode AlignedSeries, judul plot)
+DERIVED_SERIES = {
+    "Tidak ada": None,
+    "Selisih (A − B)": ('difference', "Selisih {a} − {b}"),
+    "Rasio (A / B)": ('ratio', "Rasio {a} / {b}"),
+}
+ALIGN_METHODS = {
+    "Rata-rata per bin": 'mean',
+    "Sampel terdekat": 'nearest',
+}
 
 class ComparisonTab(QWidget):
-    def __init__(self, data_file):
+    def __init__(self, store, systems=("Lisimeter_1", "Lisimeter_2"), calibration_history=None):
         super().__init__()
-        self.data_file = data_file
+        self.store = store  # pembaca dari storage.backends.open_reader()
+        self.calibration_history = calibration_history  # log berisi nilai mentah
+        self.systems = list(systems)
         self.plots = []  # <-- penting: siapkan sebelum koneksi event
+        self.last_result = None  # (param, QueryResult) terakhir, untuk seri turunan tanpa query ulang
+        self.jobs = JobRunner(self)  # pembacaan data berjalan di thread latar
         self.initUI()
 
     def initUI(self):
@@ -41,10 +64,36 @@ class ComparisonTab(QWidget):
         control_layout.addWidget(QLabel("Tanggal Selesai:"))
         control_layout.addWidget(self.calendar_end)
 
+        control_layout.addWidget(QLabel("<b>3. Seri Turunan (opsional):</b>"))
+        self.system_a = QComboBox()
+        self.system_b = QComboBox()
+        self.system_a.addItems(self.systems)
+        self.system_b.addItems(self.systems)
+        if len(self.systems) > 1:
+            self.system_b.setCurrentIndex(1)
+        pair_layout = QHBoxLayout()
+        pair_layout.addWidget(QLabel("A:"))
+        pair_layout.addWidget(self.system_a)
+        pair_layout.addWidget(QLabel("B:"))
+        pair_layout.addWidget(self.system_b)
+        control_layout.addLayout(pair_layout)
+        self.derived_selector = QComboBox()
+        self.derived_selector.addItems(list(DERIVED_SERIES))
+        control_layout.addWidget(self.derived_selector)
+        self.method_selector = QComboBox()
+        self.method_selector.addItems(list(ALIGN_METHODS))
+        control_layout.addWidget(self.method_selector)
+        self.derived_info = QLabel("")
+        self.derived_info.setWordWrap(True)
+        control_layout.addWidget(self.derived_info)
+        for combo in (self.system_a, self.system_b, self.derived_selector, self.method_selector):
+            combo.currentIndexChanged.connect(self.update_derived)
+
         self.compare_btn = QPushButton("🚀 Proses & Bandingkan")
         self.compare_btn.setFixedHeight(50)
         self.compare_btn.clicked.connect(self.update_comparison)
         control_layout.addWidget(self.compare_btn)
+        control_layout.addWidget(JobProgressWidget(self.jobs))
         control_layout.addStretch()
 
         # --- Plot ---
@@ -71,29 +120,50 @@ class ComparisonTab(QWidget):
             slot=self.mouseMoved
         )
 
+        # Plot seri turunan di bawah plot utama, sumbu waktu terkunci ke plot utama
+        self.derived_plot = pg.PlotWidget()
+        self.derived_plot.setBackground(None)
+        self.derived_plot.setAxisItems({'bottom': pg.DateAxisItem(orientation='bottom')})
+        self.derived_plot.setXLink(self.plot_widget)
+        self.derived_plot.setClipToView(True)
+        self.derived_plot.setDownsampling(auto=True, mode='peak')
+        self.derived_plot.hide()
+
+        plot_layout = QVBoxLayout()
+        plot_layout.addWidget(self.plot_widget, 3)
+        plot_layout.addWidget(self.derived_plot, 1)
+
         layout.addLayout(control_layout, 1)
-        layout.addWidget(self.plot_widget, 3)
+        layout.addLayout(plot_layout, 3)
 
     def update_comparison(self):
-        # Baca data
-        try:
-            df = pd.read_csv(self.data_file, parse_dates=['timestamp'])
-        except FileNotFoundError:
-            QMessageBox.warning(self, "Error", "File data log belum ditemukan.")
-            return
-
         start_date = self.calendar_start.selectedDate().toPyDate()
         end_date = self.calendar_end.selectedDate().toPyDate()
         param = self.param_selector.currentText()
 
-        filtered_df = df[(df['timestamp'].dt.date >= start_date) &
-                         (df['timestamp'].dt.date <= end_date)]
-        if filtered_df.empty:
+        # Baca hanya sistem, rentang hari, dan parameter yang diplot. Rentang panjang
+        # otomatis memakai tier rollup (kira-kira satu titik per piksel lebar plot).
+        # Kalibrasi juga hanya untuk baris dan parameter yang diplot
+        store, systems, calibration_history = self.store, list(self.systems), self.calibration_history
+        max_points = max(self.plot_widget.width(), 200)
+        self.jobs.submit(
+            lambda job: query(
+                store, systems, [param],
+                start=start_date, end=end_date + datetime.timedelta(days=1),
+                max_points=max_points, calibration_history=calibration_history
+            ),
+            lambda result: self.show_comparison(param, result),
+            lambda message: QMessageBox.warning(self, "Error", f"Gagal membaca data log: {message}"),
+            f"Memuat {param}..."
+        )
+
+    def show_comparison(self, param, result):
+        """Menggambar hasil query (dipanggil di thread GUI setelah job selesai)."""
+        if result.empty:
             QMessageBox.information(self, "Info", "Tidak ada data pada rentang tanggal ini.")
             return
-
-        data_sys1 = filtered_df[filtered_df['system_id'] == 'Lisimeter_1']
-        data_sys2 = filtered_df[filtered_df['system_id'] == 'Lisimeter_2']
+        tier = result.tier
+        self.last_result = (param, result)
 
         # Bersihkan plot, lalu tambahkan kembali crosshair & label
         self.plot_widget.clear()
@@ -103,33 +173,73 @@ class ComparisonTab(QWidget):
         # pastikan label tetap di layout plot setelah clear
         self.plot_widget.getPlotItem().layout.addItem(self.label, 0, 1)
 
-        self.plot_widget.setTitle(f"Perbandingan {param.capitalize()}",
-                                  color="#ecf0f1", size="18pt")
+        title = f"Perbandingan {param.capitalize()}"
+        if tier != 'raw':
+            title += f" (rata-rata {tier}, area = min-maks)"
+        self.plot_widget.setTitle(title, color="#ecf0f1", size="18pt")
 
         self.plots = []  # reset daftar data untuk crosshair
 
-        # Plot Lisimeter 1
-        if not data_sys1.empty:
-            ts1 = (data_sys1['timestamp'].astype('int64') // 10**9).to_numpy()
-            y1 = data_sys1[param].to_numpy()
-            p1 = self.plot_widget.plot(ts1, y1,
-                                       pen=pg.mkPen('#38BDF8', width=2),
-                                       name="Lisimeter 1")
+        # Satu garis per sistem
+        for idx, system_id in enumerate(self.systems):
+            block = result.series.get(system_id)
+            if block is None:
+                continue
+            ts = block['timestamp'].astype(np.int64) / 1000.0
+            y = block[param]
+            name = system_id.replace('_', ' ')
+            color = SYSTEM_COLORS[idx % len(SYSTEM_COLORS)]
+            if tier != 'raw':
+                # rentang min-maks per bucket, supaya puncak singkat tetap terlihat
+                low = self.plot_widget.plot(ts, block[f'{param}_min'], pen=None)
+                high = self.plot_widget.plot(ts, block[f'{param}_max'], pen=None)
+                band = pg.mkColor(color)
+                band.setAlpha(60)
+                self.plot_widget.addItem(pg.FillBetweenItem(low, high, brush=band))
+            item = self.plot_widget.plot(ts, y, pen=pg.mkPen(color, width=2), name=name)
             # simpan info untuk crosshair/tooltip
             self.plots.append({
-                'x': ts1, 'y': y1, 'name': 'Lisimeter 1', 'color': '#38BDF8', 'item': p1
+                'x': ts, 'y': y, 'name': name, 'color': color, 'item': item
             })
+        self.update_derived()
+
+    def update_derived(self, *_):
+        """Menyejajarkan sistem A dan B ke grid waktu bersama lalu menggambar selisih/rasio.
+        Memakai hasil query terakhir (tanpa membaca ulang); hasil query sudah dibatasi
+        kira-kira satu titik per piksel, jadi cukup dihitung di thread GUI."""
+        self.plots = [d for d in self.plots if not d.get('derived')]
+        self.derived_plot.clear()
+        derived = DERIVED_SERIES[self.derived_selector.currentText()]
+        if derived is None or self.last_result is None:
+            self.derived_plot.hide()
+            self.derived_info.setText("")
+            return
+        param, result = self.last_result
+        a, b = self.system_a.currentText(), self.system_b.currentText()
+        if a == b or a not in result.series or b not in result.series:
+            self.derived_plot.hide()
+            self.derived_info.setText("Pilih dua sistem berbeda yang punya data.")
+            return
 
-        # Plot Lisimeter 2
-        if not data_sys2.empty:
-            ts2 = (data_sys2['timestamp'].astype('int64') // 10**9).to_numpy()
-            y2 = data_sys2[param].to_numpy()
-            p2 = self.plot_widget.plot(ts2, y2,
-                                       pen=pg.mkPen('#F43F5E', width=2),
-                                       name="Lisimeter 2")
-            self.plots.append({
-                'x': ts2, 'y': y2, 'name': 'Lisimeter 2', 'color': '#F43F5E', 'item': p2
-            })
+        method = ALIGN_METHODS[self.method_selector.currentText()]
+        aligned = align_query(result, param, [a, b], method=method)
+        kind, title = derived
+        values = getattr(aligned, kind)(a, b)
+        label = title.format(a=a.replace('_', ' '), b=b.replace('_', ' '))
+
+        # connect='finite': celah (bin kosong di salah satu sistem) tidak disambung garis
+        item = self.derived_plot.plot(aligned.time, values, pen=pg.mkPen(DERIVED_COLOR, width=1.5),
+                                      connect='finite')
+        self.derived_plot.setTitle(label, color="#ecf0f1", size="12pt")
+        self.derived_plot.show()
+        self.plots.append({
+            'x': aligned.time, 'y': values, 'name': label, 'color': DERIVED_COLOR,
+            'item': item, 'derived': True
+        })
+        self.derived_info.setText(
+            f"Grid {aligned.step:g} s, {len(aligned)} titik, cakupan {aligned.coverage(a, b):.0%}, "
+            f"korelasi r = {aligned.correlation(a, b):.3f}"
+        )
 
     def mouseMoved(self, evt):
         # evt dari SignalProxy berupa tuple (QPointF,)
@@ -1,17 +1,26 @@
 # file: tabs/datalog_tab.py
 
-import pandas as pd
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QLabel,
                              QTableWidget, QPushButton, QComboBox, QFileDialog,
                              QTableWidgetItem, QHeaderView, QDateTimeEdit, QMessageBox)
 from PyQt5.QtCore import QDateTime
+from datetime import timedelta
+import sample_block
+from storage.query import query
+from jobs import JobRunner
+from custom_widgets import JobProgressWidget
 
 class DataLogTab(QWidget):
     """Tab untuk menampilkan semua data historis dan mengekspornya."""
-    def __init__(self, data_file):
+    def __init__(self, store, systems=("Lisimeter_1", "Lisimeter_2"), calibration_history=None):
         super().__init__()
-        self.data_file = data_file
-        self.df = pd.DataFrame()
+        self.store = store  # pembaca dari storage.backends.open_reader()
+        self.calibration_history = calibration_history  # log berisi nilai mentah
+        self.systems = list(systems)
+        # baca/format tabel dan ekspor berjalan di thread latar (runner terpisah,
+        # supaya muat ulang tabel tidak membatalkan ekspor yang sedang berjalan)
+        self.jobs = JobRunner(self)
+        self.export_jobs = JobRunner(self)
         self.initUI()
     
     def initUI(self):
@@ -19,7 +28,7 @@ class DataLogTab(QWidget):
         
         control_panel = QHBoxLayout()
         self.filter_combo = QComboBox()
-        self.filter_combo.addItems(["Tampilkan Semua", "Lisimeter_1", "Lisimeter_2"])
+        self.filter_combo.addItems(["Tampilkan Semua"] + self.systems)
         self.filter_combo.currentTextChanged.connect(self.load_data)
         
         refresh_btn = QPushButton("🔄 Muat Ulang Data")
@@ -28,6 +37,7 @@ class DataLogTab(QWidget):
         control_panel.addWidget(QLabel("Filter:"))
         control_panel.addWidget(self.filter_combo)
         control_panel.addWidget(refresh_btn)
+        control_panel.addWidget(JobProgressWidget(self.jobs))
         control_panel.addStretch()
         
         self.table = QTableWidget()
@@ -57,6 +67,7 @@ class DataLogTab(QWidget):
         export_layout.addWidget(QLabel("Format:"))
         export_layout.addWidget(self.format_combo)
         export_layout.addWidget(export_btn)
+        export_layout.addWidget(JobProgressWidget(self.export_jobs))
         
         main_layout.addLayout(control_panel)
         main_layout.addWidget(self.table)
@@ -65,35 +76,46 @@ class DataLogTab(QWidget):
         self.load_data()
 
     def load_data(self):
-        """Memuat data dari file CSV ke dalam tabel, menerapkan filter."""
+        """Memuat 2000 baris terakhir dari penyimpanan log ke dalam tabel, menerapkan filter."""
+        filter_text = self.filter_combo.currentText()
+        systems = [filter_text] if filter_text in self.systems else None
+        store, calibration_history = self.store, self.calibration_history
+        self.jobs.submit(lambda job: table_text(store, systems, calibration_history),
+                         self.fill_table, lambda message: self.table.clear(), "Memuat data log...")
+
+    def fill_table(self, text):
+        """Mengisi tabel dari hasil table_text() (di thread GUI)."""
+        columns = list(text)
+        rows = len(text[columns[0]]) if columns else 0
+        self.table.setUpdatesEnabled(False)
         try:
-            self.df = pd.read_csv(self.data_file, parse_dates=['timestamp'])
-            filter_text = self.filter_combo.currentText()
-            
-            if "Lisimeter" in filter_text:
-                display_df = self.df[self.df['system_id'] == filter_text].tail(2000)
-            else:
-                display_df = self.df.tail(2000)
-            
-            self.table.setRowCount(len(display_df))
-            self.table.setColumnCount(len(display_df.columns))
-            self.table.setHorizontalHeaderLabels(display_df.columns)
-            
-            for i, row in enumerate(display_df.itertuples(index=False)):
-                for j, val in enumerate(row):
-                    self.table.setItem(i, j, QTableWidgetItem(str(val)))
-        except FileNotFoundError:
-            self.table.clear()
+            self.table.setRowCount(rows)
+            self.table.setColumnCount(len(columns))
+            self.table.setHorizontalHeaderLabels(columns)
+            for j, values in enumerate(text.values()):
+                for i, val in enumerate(values):
+                    self.table.setItem(i, j, QTableWidgetItem(val))
+        finally:
+            self.table.setUpdatesEnabled(True)
 
     def export_data(self):
         """Mengekspor data berdasarkan rentang waktu dan format."""
-        if self.df.empty: return
         start_dt = self.start_dt_edit.dateTime().toPyDateTime()
         end_dt = self.end_dt_edit.dateTime().toPyDateTime()
+        store, calibration_history = self.store, self.calibration_history
         
-        export_df = self.df[(self.df['timestamp'] >= start_dt) & (self.df['timestamp'] <= end_dt)]
-        
-        if export_df.empty:
+        # rentang inklusif sampai end_dt (timestamp log beresolusi detik)
+        self.export_jobs.submit(
+            lambda job: query(store, start=start_dt, end=end_dt + timedelta(seconds=1),
+                              calibration_history=calibration_history),
+            lambda result: self.save_export(result, start_dt, end_dt),
+            lambda message: QMessageBox.critical(self, "Error", f"Gagal membaca data log: {message}"),
+            "Membaca data ekspor..."
+        )
+
+    def save_export(self, result, start_dt, end_dt):
+        """Meminta nama file lalu menulis ekspor di thread latar."""
+        if result.empty:
             QMessageBox.information(self, "Info", "Tidak ada data pada rentang waktu ini.")
             return
             
@@ -103,13 +125,28 @@ class DataLogTab(QWidget):
             
         default_name = f"export_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}{suffix}"
         filename, _ = QFileDialog.getSaveFileName(self, "Simpan File", default_name, file_filter)
+        if not filename:
+            return
         
-        if filename:
-            try:
-                if suffix == ".xlsx":
-                    export_df.to_excel(filename, index=False)
-                else:
-                    export_df.to_csv(filename, index=False)
-                QMessageBox.information(self, "Sukses", f"Data berhasil diekspor ke {filename}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Gagal mengekspor: {e}")
\ No newline at end of file
+        def write(job):
+            export_df = result.frame()
+            job.check()
+            if suffix == ".xlsx":
+                export_df.to_excel(filename, index=False)
+            else:
+                export_df.to_csv(filename, index=False)
+            return filename
+        self.export_jobs.submit(
+            write,
+            lambda name: QMessageBox.information(self, "Sukses", f"Data berhasil diekspor ke {name}"),
+            lambda message: QMessageBox.critical(self, "Error", f"Gagal mengekspor: {message}"),
+            "Menulis file ekspor..."
+        )
+
+
+def table_text(store, systems=None, calibration_history=None, tail=2000):
+    """Baris terakhir log sebagai {kolom: list string} siap ditampilkan (thread latar)."""
+    block = query(store, systems, tail=tail, calibration_history=calibration_history).merged(tail=tail)
+    block['timestamp'] = sample_block.format_timestamps(block['timestamp'])
+    # astype(str) memformat float32 dengan digit terpendek (25.39, bukan 25.389999...)
+    return {name: values.astype(str).tolist() for name, values in block.items()}
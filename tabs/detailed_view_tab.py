@@ -1,23 +1,29 @@
 # file: tabs/detailed_view_tab.py
 
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QComboBox, QSplitter, QGridLayout
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QComboBox, QSplitter, QGridLayout, QLabel
 from PyQt5.QtCore import Qt
 import pyqtgraph as pg
 from collections import deque
 import numpy as np
+from custom_widgets import format_live_stats
 
 
 class DetailedViewTab(QWidget):
-    def __init__(self):
+    def __init__(self, systems=("Lisimeter_1", "Lisimeter_2"), live_stats=None):
         super().__init__()
+        self.live_stats = live_stats  # analysis.online.LiveStats, diperbarui MainWindow
         main_layout = QVBoxLayout(self)
 
         # --- selector sistem ---
         self.system_selector = QComboBox()
-        self.system_selector.addItems(["Lisimeter_1", "Lisimeter_2"])
+        self.system_selector.addItems(list(systems))
         self.system_selector.currentTextChanged.connect(self.reset_all_graphs)
         main_layout.addWidget(self.system_selector)
 
+        # statistik live parameter yang sedang di plot utama
+        self.stats_label = QLabel("Klik salah satu grafik kecil untuk statistik live parameternya.")
+        main_layout.addWidget(self.stats_label)
+
         # --- splitter (sparklines kiri, main plot kanan) ---
         splitter = QSplitter(Qt.Horizontal)
         main_layout.addWidget(splitter)
@@ -102,6 +108,19 @@ class DetailedViewTab(QWidget):
 
         self.main_curve = self.main_plot.plot(data_x, data_y, pen=pg.mkPen('#A78BFA', width=3))
         self.main_plot.plot(data_x, data_y, fillLevel=0, fillBrush=(56, 189, 248, 80))
+        self.update_stats_label()
+
+    def update_stats_label(self):
+        if self.current_param is None or self.live_stats is None:
+            return
+        stats = self.live_stats.get(self.system_selector.currentText(), self.current_param)
+        if stats is None or not stats.count:
+            self.stats_label.setText(f"{self.current_param}: belum ada data live.")
+            return
+        self.stats_label.setText(
+            f"{self.current_param}: {format_live_stats(stats)} | "
+            f"rata-rata sesi {stats.mean:.2f} ± {stats.std:.2f} ({stats.count} sampel)"
+        )
 
     def mouse_moved(self, event):
         pos = event[0]
@@ -122,12 +141,15 @@ class DetailedViewTab(QWidget):
             self.label.setPos(closest_x, closest_y)
             self.highlight_point.setData([closest_x], [closest_y])
 
-    def update_data(self, system_id, data):
+    def update_data(self, system_id, block):
+        """Menambahkan satu blok sampel; setiap sparkline digambar ulang sekali per blok."""
         if system_id == self.system_selector.currentText():
             for param, series in self.data_series.items():
-                if param in data:
-                    series.append(data[param])
+                values = block.get(param)
+                if values is not None and len(values):
+                    series.extend(values[-series.maxlen:].tolist())
                     self.sparklines[param]['curve'].setData(list(series))
+            self.update_stats_label()
 
     def reset_all_graphs(self):
         for param in self.parameters:
@@ -136,3 +158,4 @@ class DetailedViewTab(QWidget):
         self.main_plot.clear()
         self.current_param = None
         self.main_curve = None
+        self.stats_label.setText("Klik salah satu grafik kecil untuk statistik live parameternya.")
@@ -4,21 +4,19 @@ from PyQt5.QtWidgets import QWidget, QGridLayout, QGroupBox
 from custom_widgets import OverviewCard # Pastikan Anda punya OverviewCard di custom_widgets.py
 
 class OverviewTab(QWidget):
-    def __init__(self):
+    def __init__(self, systems=("Lisimeter_1", "Lisimeter_2"), live_stats=None):
         super().__init__()
+        self.live_stats = live_stats  # analysis.online.LiveStats, diperbarui MainWindow
         main_layout = QGridLayout(self)
         main_layout.setSpacing(20)
 
-        sys1_box = QGroupBox("Lisimeter 1")
-        sys2_box = QGroupBox("Lisimeter 2")
-        
-        main_layout.addWidget(sys1_box, 0, 0)
-        main_layout.addWidget(sys2_box, 0, 1)
-
-        self.cards = {
-            'Lisimeter_1': self.create_cards_for_system(sys1_box),
-            'Lisimeter_2': self.create_cards_for_system(sys2_box)
-        }
+        # Satu grup kartu per sistem, 2 grup per baris
+        self.cards = {}
+        for idx, system_id in enumerate(systems):
+            box = QGroupBox(system_id.replace('_', ' '))
+            row, col = divmod(idx, 2)
+            main_layout.addWidget(box, row, col)
+            self.cards[system_id] = self.create_cards_for_system(box)
 
     def create_cards_for_system(self, parent_box):
         """Membuat dan menata kartu hibrida di dalam grupnya."""
@@ -44,13 +42,18 @@ class OverviewTab(QWidget):
         
         return cards
 
-    def update_data(self, system_id, data, thresholds):
-        """Memperbarui nilai dan status visual semua kartu."""
-        target_cards = self.cards[system_id]
+    def update_data(self, system_id, block, thresholds, anomalies=()):
+        """Memperbarui nilai dan status visual semua kartu dari satu blok sampel.
+        anomalies: parameter yang sedang beralarm di detektor anomali (minimal 'warning')."""
+        target_cards = self.cards.get(system_id)
+        if target_cards is None:
+            return
         
         for param, card_widget in target_cards.items():
-            if param in data:
-                value = data[param]
+            values = block.get(param)
+            if values is not None and len(values):
+                # status mengikuti nilai terakhir di blok
+                value = float(values[-1])
                 status = "normal"
                 
                 if param == 'temperature':
@@ -62,6 +65,9 @@ class OverviewTab(QWidget):
                 elif param == 'cps':
                     if value > thresholds.get('cps_danger', 9999): status = "danger"
                     elif value > thresholds.get('cps_warn', 9999): status = "warning"
+                if status == "normal" and param in anomalies:
+                    status = "warning"
 
                 card_widget.set_status(status)
-                card_widget.update_data(value)
\ No newline at end of file
+                stats = self.live_stats.get(system_id, param) if self.live_stats is not None else None
+                card_widget.update_data(values, stats)
\ No newline at end of file
@@ -4,10 +4,14 @@ from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QGroupBox, QGridLayout, QLabel,
     QComboBox, QPushButton, QMessageBox, QDoubleSpinBox,
     QSpinBox, QTableWidget, QHeaderView, QTableWidgetItem,
-    QDialog, QCalendarWidget, QDialogButtonBox
+    QDialog, QCalendarWidget, QDialogButtonBox, QDateTimeEdit, QHBoxLayout
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QDateTime
 from datetime import datetime
+from calibration import CompiledCalibration, MODELS, TIME_FORMAT, add_calibration_version
+
+# Kolom tabel kalibrasi
+COL_PARAM, COL_MODEL, COL_M, COL_C, COL_ADVANCED, COL_DATE = range(6)
 
 class SettingsTab(QWidget):
     def __init__(self, main_app):
@@ -69,13 +73,37 @@ class SettingsTab(QWidget):
         cal_box = QGroupBox("Manajemen Kalibrasi Sensor")
         cal_layout = QVBoxLayout(cal_box)
         self.cal_table = QTableWidget()
-        self.cal_table.setColumnCount(4)
-        self.cal_table.setHorizontalHeaderLabels(["Parameter", "Faktor Pengali (m)", "Faktor Penambah (c)", "Tgl Kalibrasi"])
+        self.cal_table.setColumnCount(6)
+        self.cal_table.setHorizontalHeaderLabels([
+            "Parameter", "Model", "Faktor Pengali (m)", "Faktor Penambah (c)",
+            "Koefisien / Titik", "Tgl Kalibrasi"
+        ])
         self.cal_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.cal_table.cellDoubleClicked.connect(self.edit_calibration_date)
         cal_layout.addWidget(QLabel("Klik dua kali pada tanggal untuk mengubahnya."))
+        cal_layout.addWidget(QLabel(
+            "Model linear memakai m dan c. Polynomial: koefisien a0, a1, a2, ... "
+            "(a0 + a1·x + a2·x²). Piecewise: titik raw:nilai, mis. 4:4.01, 7:7.00, 10:10.02."
+        ))
         cal_layout.addWidget(self.cal_table)
 
+        # Perubahan koefisien disimpan sebagai versi baru; data log lama ikut
+        # dihitung ulang saat ditampilkan, file log tidak ditulis ulang
+        version_layout = QHBoxLayout()
+        self.valid_from_edit = QDateTimeEdit(calendarPopup=True)
+        self.valid_from_edit.setDisplayFormat("yyyy-MM-dd HH:mm:ss")
+        self.valid_from_edit.setToolTip("Jika tidak diubah, versi baru berlaku sejak saat disimpan.")
+        # hanya nilai yang diubah pengguna yang dipakai; selain itu 'sekarang' saat menyimpan,
+        # supaya tab yang dibuka lama tidak mengkalibrasi ulang data yang sudah tercatat
+        self.valid_from_edited = False
+        self.valid_from_edit.dateTimeChanged.connect(self._valid_from_changed)
+        self.version_label = QLabel()
+        version_layout.addWidget(QLabel("Koefisien baru berlaku sejak:"))
+        version_layout.addWidget(self.valid_from_edit)
+        version_layout.addWidget(self.version_label)
+        version_layout.addStretch()
+        cal_layout.addLayout(version_layout)
+
         # Tombol simpan
         apply_btn = QPushButton("Simpan & Terapkan Semua Pengaturan")
         apply_btn.clicked.connect(self.save_all_settings)
@@ -116,17 +144,33 @@ class SettingsTab(QWidget):
         for row, (param, values) in enumerate(cal_data.items()):
             param_item = QTableWidgetItem(param.replace('_', ' ').capitalize())
             param_item.setFlags(param_item.flags() & ~Qt.ItemIsEditable)
-            self.cal_table.setItem(row, 0, param_item)
+            self.cal_table.setItem(row, COL_PARAM, param_item)
+
+            model_combo = QComboBox()
+            model_combo.addItems(MODELS)
+            model_combo.setCurrentText(values.get('type', 'linear'))
+            self.cal_table.setCellWidget(row, COL_MODEL, model_combo)
 
             m_item = QTableWidgetItem(str(values.get('m', 1.0)))
-            self.cal_table.setItem(row, 1, m_item)
+            self.cal_table.setItem(row, COL_M, m_item)
 
             c_item = QTableWidgetItem(str(values.get('c', 0.0)))
-            self.cal_table.setItem(row, 2, c_item)
+            self.cal_table.setItem(row, COL_C, c_item)
+
+            advanced_item = QTableWidgetItem(self._format_advanced(values))
+            self.cal_table.setItem(row, COL_ADVANCED, advanced_item)
 
             date_item = QTableWidgetItem(str(values.get('last_calibrated', 'N/A')))
             date_item.setFlags(date_item.flags() & ~Qt.ItemIsEditable)
-            self.cal_table.setItem(row, 3, date_item)
+            self.cal_table.setItem(row, COL_DATE, date_item)
+
+        history = settings.get('calibration_history') or []
+        self.valid_from_edit.setDateTime(QDateTime.currentDateTime())
+        self.valid_from_edited = False
+        self.version_label.setText(f"({len(history)} versi kalibrasi tersimpan)")
+
+    def _valid_from_changed(self, _):
+        self.valid_from_edited = True
 
     # ------------- SAVE -------------
     def save_all_settings(self):
@@ -154,22 +198,26 @@ class SettingsTab(QWidget):
             # Validasi hubungan Warning/Danger
             self._validate_thresholds(thresholds)
 
-            # Pastikan dict calibration ada
+            # Pastikan dict calibration ada (disalin per entri: jika validasi gagal,
+            # pengaturan yang sedang dipakai tidak ikut berubah)
             calibration = settings_to_save.get('calibration')
             if not isinstance(calibration, dict):
                 calibration = {}
-                settings_to_save['calibration'] = calibration
+            calibration = {param: dict(values) for param, values in calibration.items()}
+            settings_to_save['calibration'] = calibration
 
             # Ambil data tabel kalibrasi
             for row in range(self.cal_table.rowCount()):
-                item_param = self.cal_table.item(row, 0)
+                item_param = self.cal_table.item(row, COL_PARAM)
                 if not item_param:
                     continue
                 param = item_param.text().lower().replace(' ', '_')
 
-                m_item = self.cal_table.item(row, 1)
-                c_item = self.cal_table.item(row, 2)
-                d_item = self.cal_table.item(row, 3)
+                m_item = self.cal_table.item(row, COL_M)
+                c_item = self.cal_table.item(row, COL_C)
+                d_item = self.cal_table.item(row, COL_DATE)
+                a_item = self.cal_table.item(row, COL_ADVANCED)
+                model = self.cal_table.cellWidget(row, COL_MODEL).currentText()
 
                 # Tangani sel kosong/invalid
                 try:
@@ -186,15 +234,61 @@ class SettingsTab(QWidget):
                 calibration[param]['m'] = m_val
                 calibration[param]['c'] = c_val
                 calibration[param]['last_calibrated'] = date_val
+                self._store_advanced(calibration[param], model, a_item.text() if a_item else "")
+
+            # Validasi semua model sebelum disimpan (melempar ValueError jika salah)
+            CompiledCalibration(calibration)
+
+            # Koefisien berubah -> versi kalibrasi baru (tanggal kalibrasi saja tidak dihitung)
+            old_calibration = (self.config_manager.settings or {}).get('calibration') or {}
+            if self._coefficients(calibration) != self._coefficients(old_calibration):
+                if self.valid_from_edited:
+                    valid_from = self.valid_from_edit.dateTime().toPyDateTime().strftime(TIME_FORMAT)
+                else:
+                    valid_from = datetime.now().strftime(TIME_FORMAT)
+                add_calibration_version(settings_to_save, calibration, valid_from)
 
             # Kirim ke MainWindow (menyimpan + menerapkan)
             self.main_app.update_settings(settings_to_save)
+            self.load_settings_to_ui()
             QMessageBox.information(self, "Sukses", "Semua pengaturan berhasil disimpan dan diterapkan.")
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Terjadi kesalahan saat menyimpan: {e}")
 
     # ------------- UTIL -------------
+    @staticmethod
+    def _coefficients(calibration):
+        return {param: {k: v for k, v in values.items() if k != 'last_calibrated'}
+                for param, values in calibration.items()}
+
+    @staticmethod
+    def _format_advanced(values):
+        """Entri kalibrasi -> teks kolom 'Koefisien / Titik'."""
+        if values.get('type') == 'polynomial':
+            return ", ".join(str(a) for a in values.get('coefficients', []))
+        if values.get('type') == 'piecewise':
+            return ", ".join(f"{x}:{y}" for x, y in values.get('points', []))
+        return ""
+
+    @staticmethod
+    def _store_advanced(entry, model, text):
+        """Teks kolom 'Koefisien / Titik' -> entri kalibrasi sesuai model."""
+        entry.pop('coefficients', None)
+        entry.pop('points', None)
+        if model == 'linear':
+            entry.pop('type', None)  # format lama: tanpa 'type' berarti linear
+            return
+        entry['type'] = model
+        parts = [p.strip() for p in text.split(',') if p.strip()]
+        try:
+            if model == 'polynomial':
+                entry['coefficients'] = [float(p) for p in parts]
+            else:
+                entry['points'] = [[float(x), float(y)] for x, y in (p.split(':') for p in parts)]
+        except ValueError:
+            raise ValueError(f"Koefisien/titik kalibrasi '{text}' tidak valid untuk model {model}.")
+
     def _validate_thresholds(self, t: dict):
         """Pastikan urutan Warning/Danger sesuai aturan label UI."""
         required = ['temp_warn', 'temp_danger', 'moisture_warn', 'moisture_danger', 'cps_warn', 'cps_danger']
@@ -214,7 +308,7 @@ class SettingsTab(QWidget):
 
     # ------------- Dialog tanggal kalibrasi -------------
     def edit_calibration_date(self, row, column):
-        if column != 3:
+        if column != COL_DATE:
             return
         dialog = QDialog(self)
         dialog.setWindowTitle("Pilih Tanggal Kalibrasi")